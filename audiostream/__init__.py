@@ -0,0 +1,23 @@
+"""Capture, buffering and encoding building blocks for Audio to Stream"""
+
+from .capture import CaptureSource, SyntheticSource
+from .engine import DestinationStats, StreamEngine, StreamError, StreamStats
+from .levels import LevelMeter
+from .ringbuffer import AudioRingBuffer, PipeWriter
+from .settings import Destination, StreamSettings, load_settings, save_settings
+
+__all__ = [
+    'AudioRingBuffer',
+    'CaptureSource',
+    'Destination',
+    'DestinationStats',
+    'LevelMeter',
+    'PipeWriter',
+    'StreamEngine',
+    'StreamError',
+    'StreamSettings',
+    'StreamStats',
+    'SyntheticSource',
+    'load_settings',
+    'save_settings',
+]
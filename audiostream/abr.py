@@ -0,0 +1,151 @@
+"""Adaptive bitrate: step the encoder bitrate down while the output path backs up, and up once it recovers
+
+A BitrateController samples the engine's transport signals once per interval:
+
+    progress stall     no progress report from the encoder for STALL_SECONDS
+    encoder speed      media time encoded per wall-clock second since the last
+                       sample; below SLOW_SPEED the output is not keeping up
+    pipe backpressure  audio queued in the ring beyond BACKLOG_RATIO of buffer_ms
+
+The FFmpeg command line and libav do not expose libsrt's sender statistics,
+so SRT congestion shows up through these same signals: once SRT's send
+buffer is full the muxer's writes block, encoding slows down and the ring
+fills.
+
+DOWN_AFTER congested samples in a row step one bitrate down; UP_AFTER seconds
+without congestion step one back up. A step up that congests again within
+that wait doubles it (up to UP_AFTER_MAX), so a path that cannot carry the
+higher rate is not probed every half minute. Each step restarts the encoder
+(StreamEngine.set_bitrate) while the ring keeps the captured audio.
+"""
+import threading
+import time
+
+from .encoders import parse_bitrate
+from .settings import BITRATES
+
+STALL_SECONDS = 1.0                # No progress for this long counts as congestion
+SLOW_SPEED = 0.9                   # Encoded media seconds per wall second
+BACKLOG_RATIO = 0.5                # Share of buffer_ms queued in the ring
+DOWN_AFTER = 2                     # Congested samples in a row before stepping down
+UP_AFTER = 30.0                    # Seconds without congestion before stepping up
+UP_AFTER_MAX = 300.0
+
+
+def bitrate_ladder(min_bitrate, max_bitrate, bitrates=BITRATES):
+    """Bitrates from min_bitrate up to max_bitrate (the top rung), lowest first"""
+    low, high = parse_bitrate(min_bitrate), parse_bitrate(max_bitrate)
+    rungs = [b for b in bitrates if low <= parse_bitrate(b) < high]
+    return sorted(rungs, key=parse_bitrate) + [max_bitrate]
+
+
+class BitrateController:
+    """Moves a streaming StreamEngine along a bitrate ladder from its transport signals
+
+    Starts at the top of the ladder (the configured bitrate). update() holds
+    the decision logic and can be fed samples directly; start() runs it on a
+    thread that samples the engine every interval seconds.
+    """
+
+    def __init__(self, engine, ladder, interval=1.0, down_after=DOWN_AFTER, up_after=UP_AFTER):
+        self.engine = engine
+        self.ladder = list(ladder)
+        self.interval = interval
+        self.down_after = down_after
+        self.base_up_after = up_after
+        self.up_after = up_after
+        self.level = len(self.ladder) - 1
+        self.switches = 0
+        self._congested = 0
+        self._healthy_since = None
+        self._last_up = None
+        self._last_progress = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def bitrate(self):
+        return self.ladder[self.level]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True, name="BitrateController")
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(2.0)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            engine = self.engine
+            if not engine.is_streaming or engine.reconnecting:
+                # An outage is the reconnect supervisor's business, not a bitrate problem
+                self._congested = 0
+                self._healthy_since = None
+                self._last_progress = None
+                continue
+            reading = self.sample()
+            if reading is not None:
+                self.update(*reading)
+
+    def sample(self, now=None):
+        """(congested, reason) from the engine's current state; None while the encoder is starting"""
+        engine = self.engine
+        now = now or time.monotonic()
+        progress = engine.progress
+        if not engine.ffmpeg_connected:
+            return None
+        stalled = now - progress.received_at
+        if stalled > STALL_SECONDS:
+            return True, f"no encoder progress for {stalled:.1f}s"
+        ring = engine.ring
+        if ring is not None:
+            backlog_ms = ring.latency_ms(engine.sample_rate)
+            if backlog_ms > engine.settings.buffer_ms * BACKLOG_RATIO:
+                return True, f"{backlog_ms:.0f} ms queued for the encoder"
+        last, self._last_progress = self._last_progress, progress
+        # FFmpeg's own speed is averaged since the encoder started; compare consecutive reports instead
+        if (last is not None and progress.received_at > last.received_at
+                and progress.out_time_us >= last.out_time_us):
+            speed = (progress.out_time_us - last.out_time_us) / 1e6 / (progress.received_at - last.received_at)
+            if speed < SLOW_SPEED:
+                return True, f"encoding at {speed:.2f}x real time"
+        return False, ''
+
+    def update(self, congested, reason='', now=None):
+        """Apply one reading; returns the new bitrate if it switched, else None"""
+        now = now or time.monotonic()
+        if congested:
+            self._healthy_since = None
+            self._congested += 1
+            if self._last_up is not None and now - self._last_up < self.up_after:
+                # The last step up did not hold: wait longer before the next one
+                self.up_after = min(self.up_after * 2, UP_AFTER_MAX)
+                self._last_up = None
+            if self._congested >= self.down_after and self.level > 0:
+                return self._switch(self.level - 1, reason)
+            return None
+
+        self._congested = 0
+        if self._last_up is not None and now - self._last_up >= self.up_after:
+            self.up_after = self.base_up_after  # The higher rate held
+            self._last_up = None
+        if self._healthy_since is None:
+            self._healthy_since = now
+        elif now - self._healthy_since >= self.up_after and self.level < len(self.ladder) - 1:
+            quiet = now - self._healthy_since
+            if self._switch(self.level + 1, f"no congestion for {quiet:.0f}s"):
+                self._last_up = now
+                return self.bitrate
+        return None
+
+    def _switch(self, level, reason):
+        self._congested = 0
+        self._healthy_since = None
+        self._last_progress = None
+        if self._stop.is_set() or not self.engine.set_bitrate(self.ladder[level], reason):
+            return None
+        self.level = level
+        self.switches += 1
+        return self.bitrate
@@ -0,0 +1,304 @@
+import threading
+import time
+import weakref
+from time import perf_counter
+from types import SimpleNamespace
+
+import numpy as np
+
+# Serialises opening streams with PortAudio's re-initialisation (devices.py), which would invalidate them
+portaudio_lock = threading.RLock()
+rescanning = threading.Event()     # Set by devices.py while it re-initialises PortAudio (under portaudio_lock)
+_open_streams = 0
+
+
+class RescanInProgress(RuntimeError):
+    """PortAudio is being re-initialised; the device can be opened once the re-scan is done"""
+
+
+def _acquire_portaudio(wait):
+    """Take portaudio_lock; without wait, give up (False) instead of waiting out a re-scan"""
+    if wait:
+        return portaudio_lock.acquire()
+    while not portaudio_lock.acquire(timeout=0.05):
+        if rescanning.is_set():
+            return False
+    return True
+
+
+def list_input_devices():
+    """Return [(device_id, name)] for every device with input channels"""
+    import sounddevice as sd
+    with portaudio_lock:
+        devices = sd.query_devices()
+    return [(idx, dev['name']) for idx, dev in enumerate(devices) if dev['max_input_channels'] > 0]
+
+
+def open_stream_count():
+    """PortAudio streams opened by open_input_stream() and not closed yet"""
+    return _open_streams
+
+
+class PortAudioInput:
+    """sounddevice.InputStream wrapper that keeps open_stream_count() up to date"""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._closed = False
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+    def close(self):
+        global _open_streams
+        try:
+            self._stream.close()
+        finally:
+            with portaudio_lock:
+                if not self._closed:
+                    self._closed = True
+                    _open_streams -= 1
+
+
+def input_device_name(device):
+    """'<name> (<host API>)' of a PortAudio device id, the key for per-device tuning; None if unknown"""
+    if device is None:
+        return None
+    try:
+        import sounddevice as sd
+        with portaudio_lock:
+            info = sd.query_devices(device)
+            return f"{info['name']} ({sd.query_hostapis(info['hostapi'])['name']})"
+    except Exception:
+        return None
+
+
+def open_input_stream(device, sample_rate, channels, callback, blocksize=0, latency=None):
+    """Open (but do not start) a PortAudio input stream delivering float32 blocks
+
+    blocksize 0 lets the host API pick (and vary) the block size; latency is
+    'low', 'high', seconds, or None for PortAudio's default.
+    """
+    global _open_streams
+    import sounddevice as sd
+    with portaudio_lock:
+        stream = sd.InputStream(
+            device=device,
+            channels=channels,
+            samplerate=sample_rate,
+            dtype='float32',
+            callback=callback,
+            blocksize=blocksize,
+            latency=latency
+        )
+        _open_streams += 1
+    return PortAudioInput(stream)
+
+
+class SyntheticStatus:
+    """Stand-in for sounddevice.CallbackFlags; always reports no xruns"""
+    input_overflow = False
+    input_underflow = False
+
+    def __bool__(self):
+        return False
+
+
+class SyntheticSource:
+    """Fake input stream that drives a callback with generated audio
+
+    Has the same start/stop/close surface as sounddevice.InputStream so the
+    engine can run without a sound card (tests, benchmarks, headless smoke runs).
+    speed is a multiple of real time; 0 runs as fast as the callback allows.
+    """
+
+    def __init__(self, sample_rate, channels, callback, signal='sine', frequency=440.0,
+                 amplitude=0.5, blocksize=512, speed=1.0, seed=0):
+        self.samplerate = sample_rate
+        self.channels = channels
+        self.callback = callback
+        self.signal = signal
+        self.frequency = frequency
+        self.amplitude = amplitude
+        self.blocksize = blocksize
+        self.latency = blocksize / sample_rate  # Like InputStream.latency: one block of buffering
+        self.speed = speed
+        self._rng = np.random.default_rng(seed)
+        self._block = np.zeros((blocksize, channels), dtype=np.float32)
+        self._ramp = np.arange(blocksize, dtype=np.float64)
+        self._phase = 0.0
+        self._thread = None
+        self._running = threading.Event()
+        self.frames_generated = 0
+        self.active = False
+
+    def _fill(self):
+        if self.signal == 'silence':
+            self._block.fill(0.0)
+        elif self.signal == 'noise':
+            self._block[:] = self._rng.uniform(-self.amplitude, self.amplitude, self._block.shape)
+        else:
+            step = 2.0 * np.pi * self.frequency / self.samplerate
+            wave = np.sin(self._phase + self._ramp * step) * self.amplitude
+            self._block[:] = wave[:, None]
+            self._phase = (self._phase + self.blocksize * step) % (2.0 * np.pi)
+
+    def _run(self):
+        status = SyntheticStatus()
+        block_time = self.blocksize / self.samplerate
+        start = time.monotonic()
+        blocks = 0
+        while self._running.is_set():
+            self._fill()
+            now = time.monotonic()
+            time_info = SimpleNamespace(inputBufferAdcTime=now, currentTime=now, outputBufferDacTime=0.0)
+            self.callback(self._block, self.blocksize, time_info, status)
+            blocks += 1
+            self.frames_generated += self.blocksize
+            if self.speed > 0:
+                # Pace against the start time so sleep jitter does not accumulate
+                delay = start + blocks * block_time / self.speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+
+    def start(self):
+        if self._thread:
+            return
+        self._running.set()
+        self.active = True
+        self._thread = threading.Thread(target=self._run, daemon=True, name="SyntheticSource")
+        self._thread.start()
+
+    def stop(self):
+        self._running.clear()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(1.0)
+        self._thread = None
+        self.active = False
+
+    def close(self):
+        self.stop()
+
+
+class CaptureSource:
+    """One long-lived input stream fanned out to subscriber callbacks
+
+    The device is opened once; meters, the encoder feed and recorders attach
+    with subscribe() and detach with unsubscribe() while it keeps running, so
+    switching between monitoring and streaming never reopens the hardware.
+    Subscribers are kept in a tuple that is replaced (never mutated) on
+    change, so the audio callback iterates it without locking or allocating.
+
+    A source whose callbacks stop (the device was unplugged) is found by
+    stalled() and closed with mark_lost() by the device watcher (devices.py).
+    A re-scan closes PortAudio sources and starts them again on the device's
+    new id; opens counts the starts, so an owner can tell there was a gap.
+    """
+    _open_sources = weakref.WeakSet()
+
+    def __init__(self, device, sample_rate, channels, source_factory=open_input_stream, blocksize=0,
+                 latency=None):
+        self.device = device
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.blocksize = blocksize
+        self.latency = latency
+        self.source_factory = source_factory
+        self.stream = None
+        self.lost = False              # Closed by mark_lost() after its callbacks stopped
+        self.opens = 0                 # Successful start()s
+        self.last_callback = None      # perf_counter() of the latest callback (or of start)
+        self._subscribers = ()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open_sources(cls):
+        """Every CaptureSource currently started"""
+        return list(cls._open_sources)
+
+    def matches(self, device, sample_rate, channels, blocksize=0, latency=None):
+        """True if this source already captures device with these parameters"""
+        return ((self.device, self.sample_rate, self.channels, self.blocksize, self.latency)
+                == (device, sample_rate, channels, blocksize, latency))
+
+    @property
+    def active(self):
+        return self.stream is not None
+
+    @property
+    def portaudio(self):
+        """True if the stream is a PortAudio one, which a re-scan invalidates"""
+        return isinstance(self.stream, PortAudioInput)
+
+    @property
+    def input_latency(self):
+        """Input latency in seconds reported by the host API, None if unknown"""
+        return getattr(self.stream, 'latency', None)
+
+    def start(self, wait=True):
+        """Open and start the device (no-op if already running)
+
+        The device is opened under portaudio_lock, so a re-scan cannot start
+        half-way. Without wait, raises RescanInProgress rather than waiting
+        for a re-scan to finish (which can take seconds).
+        """
+        if not _acquire_portaudio(wait):
+            raise RescanInProgress("Audio devices are being re-scanned")
+        try:
+            with self._lock:
+                if self.stream is None:
+                    stream = self.source_factory(self.device, self.sample_rate, self.channels, self._dispatch,
+                                                 blocksize=self.blocksize, latency=self.latency)
+                    self.last_callback = perf_counter()
+                    self.lost = False
+                    try:
+                        stream.start()
+                    except Exception:
+                        stream.close()
+                        raise
+                    self.stream = stream
+                    self.opens += 1
+                    CaptureSource._open_sources.add(self)
+        finally:
+            portaudio_lock.release()
+        return self
+
+    def close(self):
+        """Stop and close the device; subscribers stay registered"""
+        with self._lock:
+            stream, self.stream = self.stream, None
+            CaptureSource._open_sources.discard(self)
+        if stream:
+            try:
+                stream.stop()
+            finally:
+                stream.close()
+
+    def stalled(self, timeout):
+        """True if the device is open but has not called back for timeout seconds"""
+        last = self.last_callback
+        return self.stream is not None and last is not None and perf_counter() - last > timeout
+
+    def mark_lost(self):
+        """Close a device that stopped delivering audio; lost tells its owner to re-bind it"""
+        self.lost = True
+        try:
+            self.close()
+        except Exception as e:
+            print(f"Error closing lost audio device {self.device}: {e}")
+
+    def subscribe(self, callback):
+        """Attach callback(indata, frames, time, status); returns callback"""
+        with self._lock:
+            if callback not in self._subscribers:
+                self._subscribers = self._subscribers + (callback,)
+        return callback
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._subscribers = tuple(cb for cb in self._subscribers if cb != callback)
+
+    def _dispatch(self, indata, frames, time_info, status):
+        self.last_callback = perf_counter()
+        for callback in self._subscribers:
+            callback(indata, frames, time_info, status)
@@ -0,0 +1,318 @@
+"""Command line / daemon mode: runs a StreamEngine without importing tkinter"""
+import argparse
+import os
+import signal
+import threading
+import time
+
+from .capture import SyntheticSource, input_device_name, open_input_stream
+from .codecs import CODEC_PROFILES
+from .devices import DeviceRegistry
+from .history import StatsHistory
+from .metrics import default_registry, start_exporters
+from .sessions import SessionManager
+from .settings import (ENCODER_BACKENDS, GAP_POLICIES, PCM_FORMATS, RECORD_FORMATS, Destination,
+                       default_config_path, load_sessions, load_settings, parse_sample_rate, save_capture_tuning)
+from .tuning import TUNE_LATENCY, tune_capture
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='AudioToStream',
+        description="Capture audio and stream it over SRT. Starts the GUI unless --headless is given.")
+    parser.add_argument('--headless', action='store_true',
+                        help="run without a window until interrupted (service/daemon mode)")
+    parser.add_argument('--config', default=None,
+                        help="settings.ini to read (default: next to the application)")
+    parser.add_argument('--list-devices', action='store_true',
+                        help="print the audio input devices with their settings.ini index and key, then exit")
+    parser.add_argument('--sessions', action='store_true',
+                        help="run every [Session <name>] section of settings.ini concurrently")
+    parser.add_argument('--device', type=int, help="audio_device index, as in settings.ini")
+    parser.add_argument('--bitrate', help="encoder bitrate, e.g. 192k")
+    parser.add_argument('--adaptive-bitrate', action='store_true',
+                        help="step the bitrate down while the output path is congested, and back up")
+    parser.add_argument('--min-bitrate', help="lowest bitrate for --adaptive-bitrate (default 64k)")
+    parser.add_argument('--codec', choices=CODEC_PROFILES,
+                        help="output codec: aac (AAC-LC, default), opus (48 kHz) or pcm (SMPTE 302M, 48 kHz)")
+    parser.add_argument('--sample-rate', help="sample rate, e.g. 48000 or 48.0kHz")
+    parser.add_argument('--url', help="stream URL, e.g. srt://host:9000")
+    parser.add_argument('--add-url', action='append', default=[], metavar='URL',
+                        help="additional destination fed by the same encode (repeatable)")
+    parser.add_argument('--buffer-ms', type=int, help="ring buffer depth in milliseconds")
+    parser.add_argument('--blocksize', type=int, help="frames per audio callback (0: host API default)")
+    parser.add_argument('--latency', help="device latency: low, high or seconds")
+    parser.add_argument('--autotune', action='store_true',
+                        help="open the device with its tuned blocksize/latency from settings.ini")
+    parser.add_argument('--tune-capture', action='store_true',
+                        help="probe blocksizes on the device, store the lowest stable one in settings.ini, then exit")
+    parser.add_argument('--encoder', choices=ENCODER_BACKENDS,
+                        help="encode in an FFmpeg subprocess (default) or in-process with PyAV")
+    parser.add_argument('--transport-format', choices=PCM_FORMATS,
+                        help="raw PCM format on the pipe to FFmpeg (default f32le)")
+    parser.add_argument('--no-drift-correction', action='store_true',
+                        help="measure the capture clock drift but do not resample by it")
+    parser.add_argument('--gain', type=float, metavar='DB', help="apply gain before encoding (enables the DSP chain)")
+    parser.add_argument('--highpass', type=float, metavar='HZ',
+                        help="DC/high-pass filter cutoff, 0 = off (enables the DSP chain)")
+    parser.add_argument('--limiter', type=float, metavar='DBFS',
+                        help="look-ahead peak limiter ceiling (enables the DSP chain)")
+    parser.add_argument('--silence-gate', nargs='?', type=float, const=0.0, metavar='DBFS',
+                        help="send digital silence while the peak level stays below DBFS "
+                             "(default: silence_threshold_db, -60)")
+    parser.add_argument('--reconnect', action='store_true',
+                        help="restart the encoder with backoff after an output failure instead of stopping")
+    parser.add_argument('--gap-policy', choices=GAP_POLICIES,
+                        help="audio captured while reconnecting: replay it or drop it")
+    parser.add_argument('--warm-standby', action='store_true',
+                        help="keep a pre-spawned FFmpeg ready for restarts and reconnects")
+    parser.add_argument('--record', nargs='?', const='ts', choices=RECORD_FORMATS,
+                        help="keep a local copy in rotating segments: the encoded stream (ts, default) or WAV (pcm)")
+    parser.add_argument('--record-dir', metavar='DIR', help="recording directory (default: recordings/)")
+    parser.add_argument('--segment-seconds', type=float,
+                        help="start a new recording segment after this many seconds (0: no time limit)")
+    parser.add_argument('--segment-mb', type=float,
+                        help="start a new recording segment at this size in MB (0: no size limit)")
+    parser.add_argument('--synthetic', choices=('sine', 'noise', 'silence'),
+                        help="use a generated test signal instead of a sound card")
+    parser.add_argument('--duration', type=float, default=0,
+                        help="stop after this many seconds (default: run until interrupted)")
+    parser.add_argument('--metrics-port', type=int,
+                        help="serve Prometheus metrics on http://127.0.0.1:PORT/metrics")
+    parser.add_argument('--metrics-jsonl', metavar='PATH', help="append JSON metrics snapshots to PATH")
+    parser.add_argument('--metrics-interval', type=float, help="seconds between JSON metrics snapshots")
+    parser.add_argument('--stats-interval', type=float, default=5.0,
+                        help="seconds between printed stats lines (0 disables)")
+    parser.add_argument('--history', metavar='PATH',
+                        help="keep per-second stats history and write it to PATH (.csv or .json) on exit; "
+                             "with --sessions each session gets its own file")
+    return parser
+
+
+def settings_from_args(args):
+    """Load settings.ini and apply command line overrides"""
+    settings = load_settings(args.config or default_config_path())
+    if args.device is not None:
+        settings.audio_device = args.device
+        settings.audio_device_key = ''
+    if args.bitrate:
+        settings.bitrate = args.bitrate
+    if args.adaptive_bitrate:
+        settings.adaptive_bitrate = True
+    if args.min_bitrate:
+        settings.adaptive_min_bitrate = args.min_bitrate
+    if args.codec:
+        settings.codec = args.codec
+    if args.sample_rate:
+        settings.sample_rate = parse_sample_rate(args.sample_rate)
+    encode_rate = settings.encode_rate()
+    if encode_rate != settings.sample_rate:
+        label = settings.codec_profile().label
+        if args.sample_rate:
+            print(f"{label} encodes at {encode_rate} Hz; resampling from {settings.sample_rate} Hz")
+        else:
+            # Capture at the codec's rate rather than resampling
+            print(f"{label} encodes at {encode_rate} Hz; capturing at {encode_rate} Hz")
+            settings.sample_rate = encode_rate
+    if args.url:
+        settings.stream_url = args.url
+    if args.buffer_ms:
+        settings.buffer_ms = max(args.buffer_ms, 20)
+    if args.encoder:
+        settings.encoder_backend = args.encoder
+    if args.transport_format:
+        settings.transport_format = args.transport_format
+    if args.blocksize is not None:
+        settings.capture_blocksize = max(args.blocksize, 0)
+    if args.latency:
+        settings.capture_latency = args.latency
+    if args.autotune:
+        settings.capture_autotune = True
+    if args.no_drift_correction:
+        settings.drift_correction = False
+    if args.gain is not None:
+        settings.dsp, settings.dsp_gain_db = True, args.gain
+    if args.highpass is not None:
+        settings.dsp, settings.dsp_highpass_hz = True, max(args.highpass, 0.0)
+    if args.limiter is not None:
+        settings.dsp, settings.dsp_limiter, settings.dsp_limiter_ceiling_db = True, True, min(args.limiter, 0.0)
+    if args.silence_gate is not None:
+        settings.silence_gate = True
+        if args.silence_gate < 0:
+            settings.silence_threshold_db = args.silence_gate
+    if args.reconnect:
+        settings.auto_reconnect = True
+    if args.warm_standby:
+        settings.warm_standby = True
+    if args.gap_policy:
+        settings.gap_policy = args.gap_policy
+    if args.record:
+        settings.record = True
+        settings.record_format = args.record
+    if args.record_dir:
+        settings.record_dir = args.record_dir
+    if args.segment_seconds is not None:
+        settings.record_segment_seconds = max(args.segment_seconds, 0.0)
+    if args.segment_mb is not None:
+        settings.record_segment_mb = max(args.segment_mb, 0.0)
+    for url in args.add_url:
+        settings.extra_destinations.append(Destination(url))
+    if args.metrics_port is not None:
+        settings.metrics_port = args.metrics_port
+    if args.metrics_jsonl:
+        settings.metrics_jsonl = args.metrics_jsonl
+    if args.metrics_interval:
+        settings.metrics_interval = args.metrics_interval
+    return settings
+
+
+def synthetic_factory(signal_name):
+    """Source factory for StreamEngine that ignores the device and generates audio"""
+    def factory(device, sample_rate, channels, callback, blocksize=0, latency=None):
+        return SyntheticSource(sample_rate, channels, callback, signal=signal_name, blocksize=blocksize or 512)
+    return factory
+
+
+def run_tune(args, settings):
+    """Probe the configured device and store its lowest stable blocksize; returns exit code"""
+    if args.synthetic:
+        device, name, factory = None, None, synthetic_factory(args.synthetic)
+    else:
+        try:
+            registry = DeviceRegistry()
+            registry.refresh()
+            device = registry.resolve(settings.audio_device_key, settings.audio_device).index
+        except Exception as e:
+            print(f"Error: {e}")
+            return 2
+        name, factory = input_device_name(device), open_input_stream
+    print(f"Tuning {name or 'synthetic source'} at {settings.sample_rate} Hz")
+    best, _ = tune_capture(device, settings.sample_rate, settings.channels, source_factory=factory,
+                           on_result=lambda result: print(f"  {result.summary()}"))
+    if best is None:
+        print("No stable blocksize found; leaving the device at its defaults")
+        return 1
+    print(f"Lowest stable blocksize: {best.blocksize} frames ({best.period_ms:.1f} ms)")
+    if name:
+        save_capture_tuning(settings, name, best.blocksize, TUNE_LATENCY, args.config or default_config_path())
+        print("Stored in settings.ini; used when capture_autotune = true (or with --autotune)")
+    return 0
+
+
+def run_headless(args):
+    """Run one stream until interrupted, disconnected or --duration elapses; returns exit code"""
+    if args.list_devices:
+        registry = DeviceRegistry()
+        registry.refresh()
+        for index, device in enumerate(registry.devices):
+            print(f"{index}: [{device.index}] {device.name}  (audio_device_key = {device.key})")
+        return 0
+
+    base = settings_from_args(args)
+    if args.tune_capture:
+        return run_tune(args, base)
+    if args.sessions:
+        sessions = load_sessions(args.config or default_config_path())
+        if not sessions:
+            print("Error: no [Session <name>] sections found in settings")
+            return 2
+    else:
+        sessions = {'main': base}
+
+    # Real devices are resolved by key and watched, so an unplugged device is re-opened when it returns
+    registry = None if args.synthetic else DeviceRegistry()
+    if registry:
+        registry.refresh()
+    manager = SessionManager(source_factory=synthetic_factory(args.synthetic) if args.synthetic
+                             else open_input_stream, device_registry=registry)
+    for name, settings in sessions.items():
+        try:
+            device = None if args.synthetic else registry.resolve(settings.audio_device_key,
+                                                                  settings.audio_device).index
+        except Exception as e:
+            print(f"Error: {e}")
+            return 2
+        manager.add(name, settings, device)
+
+    done = threading.Event()
+    result = {'code': 0}
+    prefix = len(sessions) > 1
+
+    def on_event(name, event, message):
+        print(f"[{name}] {message}" if prefix else message)
+        # Exit once every session has dropped
+        if event == 'disconnected' and not manager.active():
+            result['code'] = 1
+            done.set()
+
+    manager.add_listener(on_event)
+
+    def on_signal(signum, frame):
+        done.set()
+
+    signal.signal(signal.SIGINT, on_signal)
+    if hasattr(signal, 'SIGTERM'):
+        signal.signal(signal.SIGTERM, on_signal)
+
+    # Exporters are process-wide; configured from [Settings] and the command line
+    exporters = start_exporters(default_registry, base.metrics_port, base.metrics_jsonl,
+                                base.metrics_interval)
+
+    errors = manager.start_all()
+    for name, error in errors.items():
+        print(f"Error starting stream{f' {name}' if prefix else ''}: {error}")
+    if len(errors) == len(sessions):
+        manager.close()
+        for exporter in exporters:
+            exporter.stop()
+        return 2
+    if registry:
+        registry.start()
+
+    deadline = time.monotonic() + args.duration if args.duration > 0 else None
+    next_stats = time.monotonic() + args.stats_interval
+    histories = {name: StatsHistory() for name in sessions} if args.history else {}
+    next_sample = time.monotonic() + 1.0
+    try:
+        while not done.is_set():
+            done.wait(0.2)
+            now = time.monotonic()
+            if deadline and now >= deadline:
+                break
+            if histories and now >= next_sample:
+                sample_history(manager, histories)
+                next_sample += 1.0
+            if args.stats_interval > 0 and now >= next_stats:
+                for name, stats in manager.stats().items():
+                    print(f"[{name}] {stats.summary()}" if prefix else stats.summary())
+                next_stats = now + args.stats_interval
+    finally:
+        if registry:
+            registry.stop()
+        manager.close()
+        for exporter in exporters:
+            exporter.stop()
+        for name, history in histories.items():
+            path = history_path(args.history, name if prefix else None)
+            try:
+                history.export(path)
+                print(f"Stats history written to {path}")
+            except OSError as e:
+                print(f"Error writing stats history: {e}")
+    return result['code']
+
+
+def sample_history(manager, histories):
+    """Add each session's stats and levels since the previous sample to its StatsHistory"""
+    for name, engine in list(manager.sessions.items()):
+        peaks, levels = engine.level_meter.snapshot()
+        rms = (sum(level * level for level in levels) / len(levels)) ** 0.5
+        histories[name].add_stats(engine.stats(), max(peaks), rms)
+
+
+def history_path(path, session=None):
+    """--history path, with the session name before the extension when there are several"""
+    if not session:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}-{session}{ext}"
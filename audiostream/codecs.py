@@ -0,0 +1,88 @@
+"""Output codec profiles: encoder options, frame duration and sample-rate limits per codec
+
+Each profile carries only the options that are valid for its encoder, for
+both backends: FFmpeg command-line arguments and the libav encoder name and
+options used with PyAV. The frame and encoder delay put a floor under the
+end-to-end latency that no buffering setting can remove:
+
+    AAC-LC  1024-sample frames plus 1024 samples of priming (~43 ms at 48 kHz)
+    Opus    10 ms frames plus 2.5 ms lookahead (restricted low-delay mode), 48 kHz only
+    PCM     SMPTE 302M in MPEG-TS: uncompressed, no frame delay, 48 kHz and an even channel count
+
+When the capture rate is not one the codec accepts, the encoder resamples to
+encode_rate(); the GUI only offers native rates so that does not happen there.
+"""
+from dataclasses import dataclass, field
+
+
+@dataclass(frozen=True)
+class CodecProfile:
+    """How one codec is encoded and what it constrains"""
+    name: str                          # settings.ini value
+    label: str                         # Shown in the GUI
+    ffmpeg_args: tuple                 # Encoder arguments for the FFmpeg command (bitrate is added separately)
+    frame_samples: int                 # Samples per codec frame at the encode rate; 0 = per input packet
+    delay_samples: int                 # Encoder delay (priming/lookahead) at the encode rate
+    sample_rates: tuple = ()           # Rates the encoder accepts; empty = any
+    channels: tuple = (1, 2)           # Channel counts the encoder accepts
+    uses_bitrate: bool = True
+    pyav_encoder: str = None           # libav encoder for the pyav backend; None if PyAV lacks it
+    pyav_options: dict = field(default_factory=dict)
+
+    def encode_rate(self, sample_rate):
+        """Rate the codec encodes at for a capture rate: the same rate if accepted, else the nearest one"""
+        if not self.sample_rates or sample_rate in self.sample_rates:
+            return sample_rate
+        return min(self.sample_rates, key=lambda rate: (abs(rate - sample_rate), -rate))
+
+    def native_rates(self, rates):
+        """The given capture rates the codec encodes without resampling"""
+        return [rate for rate in rates if self.encode_rate(rate) == rate]
+
+    def frame_ms(self, sample_rate):
+        return self.frame_samples / self.encode_rate(sample_rate) * 1000
+
+    def latency_ms(self, sample_rate):
+        """Frame plus encoder delay: the codec's own share of the end-to-end latency"""
+        return (self.frame_samples + self.delay_samples) / self.encode_rate(sample_rate) * 1000
+
+
+CODEC_PROFILES = {
+    'aac': CodecProfile(
+        name='aac',
+        label='AAC-LC',
+        ffmpeg_args=('-c:a', 'aac', '-profile:a', 'aac_low', '-cutoff', '18000'),
+        frame_samples=1024,
+        delay_samples=1024,
+        # ADTS (AAC in MPEG-TS) has no sample rate index above 96 kHz
+        sample_rates=(96000, 88200, 64000, 48000, 44100, 32000, 24000, 22050, 16000, 12000, 11025, 8000),
+        pyav_encoder='aac',
+        pyav_options={'profile': 'aac_low', 'cutoff': '18000'},
+    ),
+    'opus': CodecProfile(
+        name='opus',
+        label='Opus',
+        ffmpeg_args=('-c:a', 'libopus', '-application', 'lowdelay', '-frame_duration', '10'),
+        frame_samples=480,
+        delay_samples=120,
+        sample_rates=(48000,),
+        pyav_encoder='libopus',
+        pyav_options={'application': 'lowdelay', 'frame_duration': '10'},
+    ),
+    'pcm': CodecProfile(
+        name='pcm',
+        label='PCM (302M)',
+        # s302m is flagged experimental in FFmpeg; s32 input makes it carry 24-bit samples
+        ffmpeg_args=('-c:a', 's302m', '-strict', 'experimental', '-sample_fmt', 's32'),
+        frame_samples=0,
+        delay_samples=0,
+        sample_rates=(48000,),
+        channels=(2, 4, 6, 8),
+        uses_bitrate=False,
+    ),
+}
+
+
+def get_codec_profile(name):
+    """Profile for a settings codec name; AAC for unknown names"""
+    return CODEC_PROFILES.get(name, CODEC_PROFILES['aac'])
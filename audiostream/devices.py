@@ -0,0 +1,244 @@
+"""Input device registry: cached enumeration, stable device keys and a hot-plug watcher
+
+Enumerating PortAudio devices is slow on hosts with many WASAPI or ASIO
+endpoints, and the PortAudio id of a device changes whenever hardware is
+added or removed. A DeviceRegistry enumerates on a background thread and
+keeps the result, so the UI never waits for it, and names each device by a
+key made of its host API, name and input channel count, which is what
+settings.ini stores.
+
+PortAudio only sees hardware changes after it is re-initialised, which is
+slow and invalidates every open stream, so the watcher does not re-scan on
+a timer. Every interval it only checks the open sources: a device that is
+unplugged stops calling back and is closed as lost (see
+CaptureSource.mark_lost). That, or an owner still waiting for a device
+(wait_for), is what triggers a re-scan. A re-scan closes the PortAudio
+streams that are still working, re-initialises, and starts them again on
+their devices' new ids, so other sessions keep capturing across it after a
+short gap. Listeners receive each refresh's (added, removed) devices, which
+is when a StreamEngine re-binds a lost device.
+"""
+import threading
+from dataclasses import dataclass
+
+from .capture import CaptureSource, open_stream_count, portaudio_lock, rescanning
+
+HOTPLUG_INTERVAL = 3.0             # Seconds between watcher passes
+STALL_SECONDS = 3.0                # A device that has not called back for this long is lost
+
+
+@dataclass(frozen=True)
+class InputDevice:
+    """One input device as enumerated; index is only valid until the next re-scan"""
+    key: str                           # '<host API>|<name>|<channels>', '#n' appended for identical devices
+    index: int                         # PortAudio device id
+    name: str
+    hostapi: str
+    channels: int                      # Input channels
+
+    @property
+    def label(self):
+        """'<name> (<host API>)', as input_device_name() (the key for per-device tuning)"""
+        return f"{self.name} ({self.hostapi})"
+
+
+def device_key(hostapi, name, channels):
+    return f"{hostapi}|{name}|{channels}"
+
+
+def query_input_devices(rescan=False):
+    """Enumerate the input devices; rescan re-initialises PortAudio first to pick up hardware changes
+
+    The re-initialisation invalidates open streams: DeviceRegistry.refresh
+    closes them first and holds portaudio_lock, which opening a stream also
+    takes.
+    """
+    import sounddevice as sd
+    with portaudio_lock:
+        if rescan:
+            sd._terminate()
+            sd._initialize()
+        hostapis = [api['name'] for api in sd.query_hostapis()]
+        infos = list(sd.query_devices())
+    devices = []
+    seen = {}
+    for index, info in enumerate(infos):
+        channels = info['max_input_channels']
+        if channels <= 0:
+            continue
+        hostapi = hostapis[info['hostapi']]
+        key = device_key(hostapi, info['name'], channels)
+        seen[key] = seen.get(key, 0) + 1
+        if seen[key] > 1:
+            key = f"{key}#{seen[key]}"  # Two identical USB interfaces, in enumeration order
+        devices.append(InputDevice(key, index, info['name'], hostapi, channels))
+    return devices
+
+
+class DeviceRegistry:
+    """Cached input device list, refreshed in the background and watched for hot-plug
+
+    devices is replaced (never mutated) on each refresh, so any thread can
+    read it; ready is set once the first enumeration has finished.
+    Listeners are called as listener(added, removed) after every refresh,
+    from the thread that ran it. With interval None, start() enumerates once
+    and does not watch; refresh() still re-scans on request.
+
+    Owners call wait_for(key) for a device they could not open; the watcher
+    re-scans every interval while any key is waited for. The keys are
+    cleared by each refresh, before the listeners are called, so a listener
+    that still cannot open its device asks again.
+    """
+
+    def __init__(self, query=query_input_devices, interval=HOTPLUG_INTERVAL, stall_seconds=STALL_SECONDS):
+        self.query = query
+        self.interval = interval
+        self.stall_seconds = stall_seconds
+        self.devices = []
+        self.ready = threading.Event()
+        self._listeners = []
+        self._waiting = set()          # Keys of devices owners are waiting for
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def start(self):
+        """Enumerate in the background (unless already done), then watch every interval (if any)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True, name="DeviceWatcher")
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(2.0)
+        self._thread = None
+
+    def wait_for(self, key):
+        """Re-scan every interval until the next refresh that finds key (see the class docstring)"""
+        self._waiting.add(key)
+
+    def refresh(self, rescan=False):
+        """Enumerate now and notify listeners; returns (added, removed)
+
+        rescan re-initialises PortAudio to see hardware changes. Open
+        PortAudio sources are closed around it and started again on their
+        devices' new ids; one whose device is gone is marked lost. Streams
+        opened outside a CaptureSource (the capture tuner's) cannot be
+        re-opened, so the re-initialisation is skipped while there are any.
+        """
+        with self._refresh_lock:
+            suspended = []
+            if rescan:
+                rescanning.set()       # Openers that must not wait give up instead (CaptureSource.start)
+            try:
+                with portaudio_lock:
+                    if rescan:
+                        sources = [source for source in CaptureSource.open_sources() if source.portaudio]
+                        rescan = open_stream_count() == len(sources)
+                    if rescan:
+                        suspended = self._suspend_sources(sources)
+                    try:
+                        devices = self.query(rescan=rescan)
+                    except Exception as e:
+                        print(f"Error listing audio devices: {e}")
+                        devices = self.devices
+            finally:
+                rescanning.clear()
+            known = {device.key for device in self.devices}
+            keys = {device.key for device in devices}
+            added = [device for device in devices if device.key not in known]
+            removed = [device for device in self.devices if device.key not in keys]
+            self.devices = devices
+            if rescan:
+                self._waiting.clear()
+            self.ready.set()
+            self._resume_sources(suspended)
+        for listener in list(self._listeners):
+            try:
+                listener(added, removed)
+            except Exception as e:
+                print(f"Error in device listener: {e}")
+        return added, removed
+
+    def refresh_async(self, rescan=False):
+        """refresh() on a worker thread"""
+        threading.Thread(target=self.refresh, args=(rescan,), daemon=True, name="DeviceRefresh").start()
+
+    def find(self, key):
+        """The device with this key, None if it is not present"""
+        for device in self.devices:
+            if device.key == key:
+                return device
+        return None
+
+    def get(self, index):
+        """The device with this PortAudio id, None if unknown"""
+        for device in self.devices:
+            if device.index == index:
+                return device
+        return None
+
+    def resolve(self, key='', position=0):
+        """The device for a settings.ini audio_device_key, else its audio_device (position in the list)"""
+        devices = self.devices
+        if not devices:
+            raise RuntimeError("No audio input devices found")
+        if key:
+            device = self.find(key)
+            if device is not None:
+                return device
+            print(f"Audio device '{key}' not found, using device {position}")
+        if not 0 <= position < len(devices):
+            raise RuntimeError(f"Audio device {position} out of range (0-{len(devices) - 1})")
+        return devices[position]
+
+    def _suspend_sources(self, sources):
+        """Close PortAudio sources ahead of a re-scan; returns [(source, key)] to resume"""
+        suspended = []
+        for source in sources:
+            device = self.get(source.device)
+            if device is None:
+                source.mark_lost()     # Cannot be found again after the re-scan
+                continue
+            source.close()
+            suspended.append((source, device.key))
+        return suspended
+
+    def _resume_sources(self, suspended):
+        """Start the sources _suspend_sources closed on their devices' new ids"""
+        for source, key in suspended:
+            device = self.find(key)
+            if device is None:
+                print(f"Audio device {key} is gone after the re-scan")
+                source.lost = True
+                continue
+            source.device = device.index
+            try:
+                source.start()
+            except Exception as e:
+                print(f"Error re-opening audio device {device.label}: {e}")
+                source.lost = True
+
+    def _run(self):
+        if not self.ready.is_set():
+            self.refresh()
+        if self.interval is None:
+            return
+        while not self._stop.wait(self.interval):
+            lost = False
+            for source in CaptureSource.open_sources():
+                if source.stalled(self.stall_seconds):
+                    print(f"Audio device {source.device} stopped delivering audio")
+                    source.mark_lost()
+                    lost = True
+            if lost or self._waiting:
+                self.refresh(rescan=True)
@@ -0,0 +1,216 @@
+"""Clock drift between the sound card and the host, and its compensation
+
+The encoder timestamps audio by counting samples at the nominal rate, while
+the stream is sent (and SRT paces it) by the host's clock. A sound card whose
+crystal runs 50 ppm fast delivers 0.18 s of extra audio per hour, which ends
+up as latency creeping up in the receiver's buffer (or as underruns, for a
+slow card).
+
+DriftEstimator measures the capture rate against the host's monotonic clock:
+every callback records when its first frame was captured (perf_counter,
+corrected by PortAudio's ADC timestamp for the callback's own lateness), and
+a least-squares line through up to WINDOW_SECONDS of those points gives the
+rate in ppm.
+
+DriftCorrector runs on the pipe writer thread and resamples each batch by
+the measured drift plus a small term that keeps the offset between the
+stream's timeline and the capture clock at its starting value, so buffered
+latency stays where it started. The correction moves in steps of at most
+SLEW_PPM_PER_SECOND, far below audible pitch change, and the resampler is
+a vectorized 4-point Hermite interpolator over preallocated buffers.
+"""
+from collections import deque
+from time import perf_counter
+
+import numpy as np
+
+POINT_INTERVAL = 0.5               # Seconds between points of the rate fit
+WINDOW_SECONDS = 300.0             # Longest span the rate is fitted over
+MIN_WINDOW_SECONDS = 20.0          # Shortest span before a rate is reported
+MAX_ADC_DELAY = 1.0                # Larger ADC-to-callback delays are bogus time info and ignored
+
+MAX_CORRECTION_PPM = 1000.0        # Consumer sound cards are within ~100 ppm; beyond this something else is wrong
+SLEW_PPM_PER_SECOND = 20.0         # Largest change of the correction per second of audio (300 ppm = 0.5 cent)
+OFFSET_GAIN_PPM_PER_MS = 2.0       # Extra correction per ms of timeline offset
+MAX_OFFSET_PPM = 50.0
+OFFSET_SMOOTHING_SECONDS = 10.0    # Averages callback jitter out of the offset
+
+
+class DriftEstimator:
+    """Effective capture rate against the host's monotonic clock, as ppm of the nominal rate
+
+    observe() runs on the capture thread and only stores a timestamp;
+    update() does the fit and runs on the pipe writer thread. ppm is None
+    until MIN_WINDOW_SECONDS of capture without input overflows have been seen.
+    """
+
+    def __init__(self, sample_rate, window=WINDOW_SECONDS, min_window=MIN_WINDOW_SECONDS):
+        self.sample_rate = sample_rate
+        self.window = window
+        self.min_window = min_window
+        self.ppm = None
+        self.epoch = 0                 # Bumped by reset(); the corrector restarts its timeline on a change
+        self._frames = 0
+        self._latest = None            # (capture time of a block's first frame, frames before it)
+        self._points = deque()
+        self._discontinuity = False
+
+    def observe(self, frames, time_info=None, status=None):
+        """Record one capture callback (capture thread)"""
+        captured = perf_counter()
+        if time_info is not None and time_info.inputBufferAdcTime:
+            # Both on PortAudio's clock, so the difference is valid whatever that clock's base
+            delay = time_info.currentTime - time_info.inputBufferAdcTime
+            if 0.0 <= delay < MAX_ADC_DELAY:
+                captured -= delay
+        if status and status.input_overflow:
+            self._discontinuity = True  # Frames were lost: the count no longer follows the clock
+        self._latest = (captured, self._frames)
+        self._frames += frames
+
+    def reset(self):
+        """Start the fit over after a gap in capture (the device was re-opened)"""
+        self._latest = None
+        self._discontinuity = True
+        self.epoch += 1
+
+    def update(self):
+        """Add the latest callback to the fit if POINT_INTERVAL has passed; returns ppm"""
+        latest = self._latest
+        if latest is None:
+            return self.ppm
+        points = self._points
+        if self._discontinuity:
+            self._discontinuity = False
+            points.clear()
+        if points and latest[0] - points[-1][0] < POINT_INTERVAL:
+            return self.ppm
+        points.append(latest)
+        while latest[0] - points[0][0] > self.window:
+            points.popleft()
+        if latest[0] - points[0][0] >= self.min_window:
+            times, frames = np.array(points).T
+            slope = np.polyfit(times - times[0], frames - frames[0], 1)[0]
+            self.ppm = (slope / self.sample_rate - 1.0) * 1e6
+        return self.ppm
+
+
+class DriftCorrector:
+    """Resamples pipe writer batches so the stream follows the host clock instead of the sound card's
+
+    process() returns the frames to send: self.out holds them when
+    resampling, else the batch is passed through untouched (resample=False
+    only measures). The resampler delays the audio by two frames.
+    """
+
+    def __init__(self, estimator, channels, batch_frames, resample=True):
+        self.estimator = estimator
+        self.sample_rate = estimator.sample_rate
+        self.resample = resample
+        self.ppm = 0.0                 # Correction applied: input frames consumed per output frame - 1, in ppm
+        self.offset = 0.0              # Seconds the stream's timeline is behind the capture clock (smoothed)
+        self._anchor = None            # Capture time the stream's timeline starts at
+        self._out_frames = 0           # Frames sent since the anchor
+        self._dropped = None           # Ring drops at the anchor; a change re-anchors
+        self._epoch = estimator.epoch  # Likewise the estimator's epoch
+
+        size = self.max_output(batch_frames)
+        self.out = np.zeros((size, channels), dtype=np.float32)
+        self.out_view = memoryview(self.out).cast('B')
+        self._history = np.zeros((3, channels), dtype=np.float32)  # Last input frames of the previous batch
+        self._xs = np.zeros((batch_frames + 3, channels), dtype=np.float32)  # History + batch
+        self._pos = 1.0                # Next output position in _xs
+        self._steps = np.arange(size, dtype=np.float64)
+        self._positions = np.zeros(size, dtype=np.float64)
+        self._index = np.zeros(size, dtype=np.intp)
+        self._frac = np.zeros((size, 1), dtype=np.float32)
+        self._taps = np.zeros((4, size, channels), dtype=np.float32)
+        self._work = np.zeros((size, channels), dtype=np.float32)
+
+    @staticmethod
+    def max_output(batch_frames):
+        """Most frames process() can return for a batch (converters must hold this many)"""
+        return int(batch_frames * (1 + MAX_CORRECTION_PPM * 1e-6)) + 3
+
+    def process(self, batch, frames, captured_at=None, dropped=0):
+        """Correct batch[:frames]; returns (array, frames) to send
+
+        captured_at is the host time (perf_counter) the last frame of the
+        batch was captured, and dropped the ring's dropped-frame count.
+        """
+        self._update_correction(frames, captured_at, dropped)
+        if not self.resample:
+            self._out_frames += frames
+            return batch, frames
+        count = self._interpolate(batch, frames, 1.0 + self.ppm * 1e-6)
+        self._out_frames += count
+        return self.out, count
+
+    def _update_correction(self, frames, captured_at, dropped):
+        rate = self.sample_rate
+        drift = self.estimator.update() or 0.0
+        if captured_at is not None:
+            epoch = self.estimator.epoch
+            if self._anchor is None or dropped != self._dropped or epoch != self._epoch:
+                # Start (or restart after lost audio) the timeline at this batch
+                self._anchor = captured_at - (self._out_frames + frames) / rate
+                self._dropped = dropped
+                self._epoch = epoch
+                self.offset = 0.0
+            else:
+                offset = (captured_at - self._anchor) - (self._out_frames + frames) / rate
+                weight = min(frames / rate / OFFSET_SMOOTHING_SECONDS, 1.0)
+                self.offset += (offset - self.offset) * weight
+        if not self.resample:
+            return
+        # Behind (positive offset) means too few output frames: consume fewer input frames per output frame
+        pull = min(max(-self.offset * 1000 * OFFSET_GAIN_PPM_PER_MS, -MAX_OFFSET_PPM), MAX_OFFSET_PPM)
+        target = min(max(drift + pull, -MAX_CORRECTION_PPM), MAX_CORRECTION_PPM)
+        step = SLEW_PPM_PER_SECOND * frames / rate
+        self.ppm = min(max(target, self.ppm - step), self.ppm + step)
+
+    def _interpolate(self, batch, frames, step):
+        """4-point Hermite resampling of batch[:frames] by step input frames per output frame"""
+        xs = self._xs[:frames + 3]
+        xs[:3] = self._history
+        xs[3:] = batch[:frames]
+        # Output positions p need xs[floor(p) - 1 .. floor(p) + 2]
+        end = frames + 1
+        count = max(int(np.ceil((end - self._pos) / step)), 0)
+        positions = self._positions[:count]
+        np.multiply(self._steps[:count], step, out=positions)
+        positions += self._pos
+        index = self._index[:count]
+        np.copyto(index, positions, casting='unsafe')  # floor, positions are positive
+        frac = self._frac[:count]
+        np.subtract(positions, index, out=frac[:, 0], casting='unsafe')
+        index -= 1                     # Of p0; p1..p3 are taken from xs shifted by 1..3, so no index arrays
+        p0, p1, p2, p3 = (taps[:count] for taps in self._taps)
+        # mode='clip' writes straight into out (the default 'raise' buffers it); index is always in range
+        for shift, taps in enumerate((p0, p1, p2, p3)):
+            np.take(xs[shift:], index, axis=0, out=taps, mode='clip')
+
+        # p1 + f/2 * (p2 - p0 + f * (2p0 - 5p1 + 4p2 - p3 + f * (3(p1 - p2) + p3 - p0))), innermost first
+        out, work = self.out[:count], self._work[:count]
+        np.subtract(p1, p2, out=out)
+        out *= 3
+        out += p3
+        out -= p0
+        out *= frac
+        np.multiply(p0, 2, out=work)
+        out += work
+        np.multiply(p1, 5, out=work)
+        out -= work
+        np.multiply(p2, 4, out=work)
+        out += work
+        out -= p3
+        out *= frac
+        out += p2
+        out -= p0
+        out *= frac
+        out *= 0.5
+        out += p1
+
+        self._pos = (positions[-1] + step if count else self._pos) - frames
+        self._history[:] = xs[frames:frames + 3]
+        return count
@@ -0,0 +1,212 @@
+"""In-process DSP ahead of the encoder: DC/high-pass filter, gain and a look-ahead peak limiter
+
+A DspChain runs on the pipe writer thread, on each batch read from the ring
+and before the silence gate, drift correction and PCM conversion, so the
+capture callback stays a plain copy and the encoder sees the processed
+audio without any FFmpeg filter. Every stage works in place on the batch
+with buffers allocated once for the largest batch, and keeps the state a
+filter needs between batches. The chain's output can feed a second
+LevelMeter, so the UI can meter after the DSP as well as before it.
+
+Both recursive stages are evaluated in closed form instead of a Python loop
+per sample: the high-pass as a scaled cumulative sum, the limiter's release
+as a running minimum in the log domain.
+"""
+from time import perf_counter
+
+import numpy as np
+
+HIGHPASS_CHUNK = 512               # Frames per closed-form step (bounds a**-n in the cumulative sum)
+HIGHPASS_MAX_SCALE = 1e6           # Largest a**-n in a step; higher cutoffs take shorter steps
+LOOKAHEAD_SECONDS = 0.005          # Limiter look-ahead, which is also the delay it adds
+RELEASE_DB_PER_SECOND = 40.0       # Limiter gain recovery after a peak
+
+DSP_STAGES = ('highpass', 'gain', 'limiter')  # Stage names, in chain order
+
+
+class HighPass:
+    """First-order high-pass y[n] = a * (y[n-1] + x[n] - x[n-1]), removing DC and rumble below cutoff
+
+    The recursion unrolls to y[n] = a**(n+1) * (y[-1] + sum(a**-k * (x[k] - x[k-1]))),
+    a cumulative sum evaluated in float64 per chunk of up to HIGHPASS_CHUNK frames.
+    a**-k grows by e**(2 pi cutoff / sample_rate) per frame, so the chunk is
+    shortened to keep it under HIGHPASS_MAX_SCALE: 512 frames overflow to inf
+    above about 0.22 of the sample rate.
+    """
+    name = 'highpass'
+
+    def __init__(self, sample_rate, channels, max_frames, cutoff):
+        self.cutoff = cutoff
+        self.seconds = 0.0
+        omega = 2.0 * np.pi * cutoff / sample_rate
+        a = np.exp(-omega)
+        self.chunk = max(min(HIGHPASS_CHUNK, int(max_frames), int(np.log(HIGHPASS_MAX_SCALE) / omega) + 1), 1)
+        k = np.arange(self.chunk, dtype=np.float64)
+        self._grow = (a ** (k + 1))[:, None]
+        self._shrink = (a ** -k)[:, None]
+        self._work = np.zeros((self.chunk, channels), dtype=np.float64)
+        self._x_prev = np.zeros(channels, dtype=np.float64)
+        self._y_prev = np.zeros(channels, dtype=np.float64)
+
+    def process(self, block):
+        for start in range(0, len(block), self.chunk):
+            x = block[start:start + self.chunk]
+            frames = len(x)
+            work = self._work[:frames]
+            np.subtract(x[0], self._x_prev, out=work[0])
+            np.subtract(x[1:], x[:-1], out=work[1:])
+            self._x_prev[:] = x[-1]
+            work *= self._shrink[:frames]
+            np.cumsum(work, axis=0, out=work)
+            work += self._y_prev
+            work *= self._grow[:frames]
+            self._y_prev[:] = work[-1]
+            np.copyto(x, work, casting='same_kind')
+
+
+class Gain:
+    """Fixed gain in dB"""
+    name = 'gain'
+
+    def __init__(self, db):
+        self.db = db
+        self.seconds = 0.0
+        self._factor = np.float32(10 ** (db / 20))
+
+    def process(self, block):
+        block *= self._factor
+
+
+class Limiter:
+    """Look-ahead peak limiter: output samples stay within ceiling_db
+
+    Each frame needs gain ceiling / peak (over channels). The gain curve is
+    the sliding minimum of that over the look-ahead, released at
+    RELEASE_DB_PER_SECOND, then averaged over the look-ahead: the average
+    ramps the gain down smoothly ahead of a peak and is still no higher than
+    any frame's needed gain. The audio is delayed by the look-ahead to meet
+    its gain. gain is the lowest gain applied to the latest block.
+    """
+    name = 'limiter'
+
+    def __init__(self, sample_rate, channels, max_frames, ceiling_db=-1.0, lookahead=LOOKAHEAD_SECONDS,
+                 release=RELEASE_DB_PER_SECOND):
+        self.ceiling = 10 ** (ceiling_db / 20)
+        self.lookahead = max(int(lookahead * sample_rate), 1)
+        self.gain = 1.0
+        self.seconds = 0.0
+        max_frames = max(int(max_frames), 1)
+        span = self.lookahead + max_frames
+        self._release = release / 20 * np.log(10) / sample_rate   # ln(gain) recovered per frame
+        self._ramp = np.arange(max_frames, dtype=np.float64) * self._release
+        self._log_gain = 0.0
+        self._audio = np.zeros((span, channels), dtype=np.float32)   # Look-ahead of delayed audio + block
+        self._needed = np.ones(span, dtype=np.float64)               # Needed gain, same layout
+        self._envelope = np.ones(span, dtype=np.float64)             # Released gain, last look-ahead - 1 + block
+        self._sums = np.zeros(span + 1, dtype=np.float64)
+        self._mins = np.zeros(span, dtype=np.float64)
+        self._abs = np.zeros((max_frames, channels), dtype=np.float32)
+        self._peak = np.zeros(max_frames, dtype=np.float32)
+        self._scratch = np.zeros(max_frames, dtype=np.float64)
+        self._curve = np.zeros(max_frames, dtype=np.float64)
+
+    def process(self, block):
+        frames, ahead = len(block), self.lookahead
+        audio = self._audio[:ahead + frames]
+        audio[ahead:] = block
+
+        # Gain each frame needs to stay under the ceiling
+        absolute, peak = self._abs[:frames], self._peak[:frames]
+        np.abs(block, out=absolute)
+        np.max(absolute, axis=1, out=peak)
+        np.maximum(peak, self.ceiling, out=peak)
+        needed = self._needed[:ahead + frames]
+        np.divide(self.ceiling, peak, out=needed[ahead:])
+
+        # Lowest needed gain within the look-ahead of each frame, released in the log domain:
+        # env[n] = min(mins[n], env[n-1] * r)  <=>  log env[n] = n*ln r + min over k <= n of (log mins[k] - k*ln r)
+        mins = self._scratch[:frames]
+        _sliding_min(needed, ahead + 1, mins, self._mins)
+        ramp = self._ramp[:frames]
+        np.log(mins, out=mins)
+        mins -= ramp
+        np.minimum.accumulate(mins, out=mins)
+        mins += ramp
+        released = self._curve[:frames]
+        np.add(ramp, self._log_gain + self._release, out=released)
+        np.minimum(mins, released, out=mins)
+        self._log_gain = float(mins[-1])
+        envelope = self._envelope[:ahead - 1 + frames]
+        np.exp(mins, out=envelope[ahead - 1:])
+
+        # Average over the look-ahead, then apply to the delayed audio
+        sums = self._sums[:ahead + frames]
+        np.cumsum(envelope, out=sums[1:])
+        curve = self._curve[:frames]
+        np.subtract(sums[ahead:ahead + frames], sums[:frames], out=curve)
+        curve /= ahead
+        np.multiply(audio[:frames], curve[:, None], out=block)
+        self.gain = float(curve.min())
+
+        # Carry the look-ahead over (copyto handles the overlap when frames < look-ahead)
+        np.copyto(audio[:ahead], audio[frames:frames + ahead])
+        np.copyto(needed[:ahead], needed[frames:frames + ahead])
+        np.copyto(envelope[:ahead - 1], envelope[frames:frames + ahead - 1])
+
+
+def _sliding_min(values, width, out, scratch):
+    """out[i] = min(values[i:i + width]) for len(out) values, by doubling spans (no per-sample loop)"""
+    length = len(values)
+    work = scratch[:length]
+    np.copyto(work, values)
+    span = 1
+    while span * 2 <= width:
+        # work[i] becomes the minimum of values[i:i + 2 * span]
+        np.minimum(work[:length - span], work[span:length], out=work[:length - span])
+        length -= span
+        span *= 2
+    count = len(out)
+    np.minimum(work[:count], work[width - span:width - span + count], out=out)
+
+
+class DspChain:
+    """Stages applied in order to each pipe writer batch, timed per stage
+
+    Each stage's seconds adds up the time spent in it; meter, if given, is a
+    LevelMeter updated with the processed audio.
+    """
+
+    def __init__(self, stages, meter=None):
+        self.stages = list(stages)
+        self.meter = meter
+
+    def stage(self, name):
+        for stage in self.stages:
+            if stage.name == name:
+                return stage
+        return None
+
+    def process(self, batch, frames):
+        """Process batch[:frames] in place"""
+        block = batch[:frames]
+        if frames:
+            for stage in self.stages:
+                started = perf_counter()
+                stage.process(block)
+                stage.seconds += perf_counter() - started
+            if self.meter is not None:
+                self.meter.update(block)
+
+
+def build_dsp_chain(settings, sample_rate, max_frames, meter=None):
+    """DspChain for settings (high-pass, gain, limiter as enabled), None without settings.dsp"""
+    if not settings.dsp:
+        return None
+    stages = []
+    if settings.dsp_highpass_hz > 0:
+        stages.append(HighPass(sample_rate, settings.channels, max_frames, settings.dsp_highpass_hz))
+    if settings.dsp_gain_db:
+        stages.append(Gain(settings.dsp_gain_db))
+    if settings.dsp_limiter:
+        stages.append(Limiter(sample_rate, settings.channels, max_frames, settings.dsp_limiter_ceiling_db))
+    return DspChain(stages, meter)
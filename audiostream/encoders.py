@@ -0,0 +1,293 @@
+"""Encoder backends: what turns the PCM drained from the ring into a muxed stream
+
+StreamEngine drives every backend through the same small surface:
+
+    encoder.start(on_progress, on_error_line, on_exit)
+    encoder.input             file-like object the PipeWriter writes PCM to
+    encoder.transport_format  PCM format input expects (see pcm.TRANSPORT_FORMATS)
+    encoder.poll()            None while running, else an exit code
+    encoder.wait(timeout)     like poll(), waiting up to timeout seconds for an exit
+    encoder.stop()
+
+The callbacks receive the encoder first, so reports from an encoder that has
+since been replaced can be told apart: on_progress(encoder, FFmpegProgress),
+on_error_line(encoder, text) and on_exit(encoder). They run on the encoder's
+worker threads or on the pipe writer thread.
+"""
+import subprocess
+import threading
+import time
+
+import numpy as np
+
+from .ffmpeg import build_ffmpeg_command, build_tee_output, spawn_ffmpeg, terminate_ffmpeg
+from .progress import FFmpegProgress, LineSplitter, ProgressParser
+
+# How often the in-process encoder reports progress (matches -stats_period)
+PROGRESS_INTERVAL = 0.1
+
+# Channel count -> libav channel layout
+CHANNEL_LAYOUTS = {1: 'mono', 2: 'stereo'}
+
+# Muxer options of the FFmpeg command line (-mpegts_flags, -flush_packets, -muxdelay, -muxpreload)
+MPEGTS_OPTIONS = {
+    'mpegts_flags': 'initial_discontinuity',
+    'flush_packets': '1',
+    'muxdelay': '0',
+    'muxpreload': '0',
+}
+
+
+def parse_bitrate(value):
+    """'192k' -> 192000 bits/s"""
+    value = str(value).strip().lower()
+    scale = 1
+    if value.endswith('k'):
+        value, scale = value[:-1], 1000
+    elif value.endswith('m'):
+        value, scale = value[:-1], 1000000
+    return int(float(value) * scale)
+
+
+def create_encoder(settings, ffmpeg_exe=None, record_url=None):
+    """Encoder for settings.encoder_backend; record_url adds a tee slave for the recording (recorder.TSTap)"""
+    if settings.encoder_backend == 'pyav':
+        return PyAVEncoder(settings, record_url)
+    return SubprocessEncoder(settings, ffmpeg_exe, record_url)
+
+
+class SubprocessEncoder:
+    """FFmpeg child process fed through its stdin pipe
+
+    Progress is parsed from FFmpeg's -progress output on stdout and errors
+    arrive as stderr lines; the process exiting (stdout closing) is reported
+    through on_exit once the last stderr line has been delivered.
+    """
+    name = 'ffmpeg'
+
+    def __init__(self, settings, ffmpeg_exe=None, record_url=None):
+        self.command = build_ffmpeg_command(settings, ffmpeg_exe, record_url)
+        self.transport_format = settings.transport_format
+        self.proc = None
+        self.input = None
+        self.stderr_thread = None
+        self.progress_thread = None
+
+    def adopt(self, proc):
+        """Use an already spawned FFmpeg running self.command (warm standby)"""
+        self.proc = proc
+
+    def start(self, on_progress, on_error_line, on_exit):
+        if self.proc is None:
+            self.proc = spawn_ffmpeg(self.command)
+        proc = self.proc
+        self.input = proc.stdin
+
+        # stderr carries errors only; progress arrives on stdout
+        self.stderr_thread = threading.Thread(target=self._read_stderr, args=(on_error_line,), daemon=True)
+        self.stderr_thread.start()
+        self.progress_thread = threading.Thread(target=self._read_progress, args=(on_progress, on_exit),
+                                                daemon=True)
+        self.progress_thread.start()
+
+        if proc.poll() is not None:
+            raise RuntimeError(f"FFmpeg failed to start (exit code {proc.returncode})")
+
+    def poll(self):
+        return self.proc.poll() if self.proc else None
+
+    def wait(self, timeout=None):
+        try:
+            return self.proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return None
+
+    def stop(self):
+        if self.proc:
+            terminate_ffmpeg(self.proc)
+
+    def _read_stderr(self, on_error_line):
+        """Deliver FFmpeg stderr (warnings and errors only) line by line"""
+        splitter = LineSplitter()
+        proc = self.proc
+        try:
+            while proc.stderr:
+                chunk = proc.stderr.read(4096)
+                if not chunk:
+                    break
+                for line in splitter.feed(chunk):
+                    on_error_line(self, line)
+        except Exception as e:
+            print(f"Error in monitor thread: {e}")
+
+    def _read_progress(self, on_progress, on_exit):
+        """Parse FFmpeg's -progress key=value blocks from stdout until it exits"""
+        parser = ProgressParser()
+        proc = self.proc
+        try:
+            while proc.stdout:
+                chunk = proc.stdout.read(4096)
+                if not chunk:
+                    break
+                for snapshot in parser.feed(chunk):
+                    on_progress(self, snapshot)
+        except Exception as e:
+            print(f"Error in progress thread: {e}")
+
+        # stdout closes when FFmpeg exits
+        self.stderr_thread.join(1.0)  # Let the last error line arrive first
+        on_exit(self)
+
+
+class PyAVEncoder:
+    """In-process libav encoder (PyAV): no FFmpeg process and no pipe
+
+    The PipeWriter writes its float32 batches straight to input (this object);
+    each write becomes one audio frame that is encoded and muxed to MPEG-TS on
+    the writer thread. The output is opened on the first write, so as with
+    FFmpeg a slow SRT handshake is absorbed by the ring. Progress snapshots are
+    built from the muxed packets, and a libav error fails the write with
+    OSError after reporting it through on_error_line and on_exit.
+
+    Several destinations use the tee muxer as the FFmpeg backend does, but
+    libav does not report a single failed slave here, only the whole output.
+    SRT needs a PyAV linked against an FFmpeg with libsrt (PyPI wheels are not).
+    """
+    name = 'pyav'
+    command = None                     # Nothing to pre-spawn
+    transport_format = 'f32le'         # Frames are built from the ring's float32 directly
+
+    def __init__(self, settings, record_url=None):
+        try:
+            import av
+        except ImportError:
+            raise RuntimeError("The pyav encoder backend needs PyAV (pip install av)") from None
+        self.profile = settings.codec_profile()
+        if not self.profile.pyav_encoder:
+            raise RuntimeError(f"{self.profile.label} is not available with the pyav encoder backend")
+        self._av = av
+        self.settings = settings
+        self.record_url = record_url
+        self.channels = settings.channels
+        self.sample_rate = settings.sample_rate
+        self.input = self
+        self._container = None
+        self._stream = None
+        self._lock = threading.Lock()
+        self._stopping = False
+        self._exit_code = None
+        self._callbacks = None
+        self._pts = 0                  # Samples submitted to the encoder
+        self._muxed_us = 0             # Media time of the last muxed packet
+        self._muxed_bytes = 0
+        self._started_at = None
+        self._next_progress = 0.0
+
+    def start(self, on_progress, on_error_line, on_exit):
+        self._callbacks = (on_progress, on_error_line, on_exit)
+
+    def poll(self):
+        return self._exit_code
+
+    def wait(self, timeout=None):
+        # Failures are recorded before write() raises, so there is nothing to wait for
+        return self._exit_code
+
+    def stop(self):
+        self._stopping = True
+        if self._lock.acquire(timeout=2.0):
+            try:
+                self._close()
+            finally:
+                self._lock.release()
+        # Otherwise the writer is still inside libav (e.g. an SRT handshake); write() closes on return
+
+    def write(self, data):
+        """Encode and mux one batch of interleaved float32 PCM; returns the bytes consumed"""
+        with self._lock:
+            if self._stopping:
+                raise ValueError("encoder stopped")
+            try:
+                if self._container is None:
+                    self._open()
+                samples = np.frombuffer(data, dtype=np.float32)
+                frame = self._av.AudioFrame.from_ndarray(samples.reshape(1, -1), format='flt',
+                                                         layout=CHANNEL_LAYOUTS[self.channels])
+                frame.sample_rate = self.sample_rate
+                frame.pts = self._pts
+                self._pts += len(samples) // self.channels
+                self._mux(self._stream.encode(frame))
+            except Exception as e:
+                self._report_failure(e)
+                raise OSError(str(e)) from e
+            finally:
+                if self._stopping:
+                    self._close()
+        return len(data)
+
+    def _open(self):
+        settings = self.settings
+        destinations = settings.destinations()
+        if len(destinations) > 1 or self.record_url:
+            container = self._av.open(build_tee_output(destinations, self.record_url), mode='w', format='tee')
+        else:
+            container = self._av.open(destinations[0].output_url(), mode='w', format='mpegts',
+                                      container_options=MPEGTS_OPTIONS)
+        # Frames carry the capture rate; libav resamples when the codec encodes at another one
+        profile = self.profile
+        stream = container.add_stream(profile.pyav_encoder, rate=settings.encode_rate())
+        if profile.uses_bitrate:
+            stream.bit_rate = parse_bitrate(settings.bitrate)
+        stream.layout = CHANNEL_LAYOUTS[self.channels]
+        stream.codec_context.options = dict(profile.pyav_options)
+        self._container, self._stream = container, stream
+        self._started_at = time.monotonic()
+
+    def _mux(self, packets):
+        for packet in packets:
+            self._container.mux(packet)
+            self._muxed_bytes += packet.size
+            if packet.pts is not None:
+                self._muxed_us = max(self._muxed_us, int(packet.pts * packet.time_base * 1_000_000))
+        now = time.monotonic()
+        if self._muxed_bytes and now >= self._next_progress:
+            # The first packet is reported at once, then every PROGRESS_INTERVAL
+            self._next_progress = now + PROGRESS_INTERVAL
+            self._callbacks[0](self, self._progress(now))
+
+    def _progress(self, now):
+        media_seconds = self._muxed_us / 1e6
+        wall = now - self._started_at
+        return FFmpegProgress(
+            out_time_us=self._muxed_us,
+            total_size=self._muxed_bytes,
+            bitrate_kbps=self._muxed_bytes * 8 / media_seconds / 1000 if media_seconds > 0 else None,
+            speed=media_seconds / wall if wall > 0 else None,
+            received_at=now,
+        )
+
+    def _report_failure(self, error):
+        self._exit_code = 1
+        _, on_error_line, on_exit = self._callbacks
+        on_error_line(self, str(error))
+        on_exit(self)
+
+    def _close(self):
+        """Flush the encoder and close the output (called with the lock held)"""
+        container = self._container
+        if container is None:
+            return
+        failed = self._exit_code is not None  # Already reported; the output is gone
+        if not failed:
+            try:
+                self._mux(self._stream.encode(None))
+            except Exception as e:
+                print(f"Error flushing encoder: {e}")
+        self._container = None
+        try:
+            container.close()
+        except Exception as e:
+            if not failed:
+                print(f"Error closing encoder output: {e}")
+        if not failed:
+            self._exit_code = 0
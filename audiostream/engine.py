@@ -0,0 +1,1097 @@
+import math
+import threading
+import time
+from time import perf_counter
+from dataclasses import dataclass, field, replace
+
+from .abr import BitrateController, bitrate_ladder
+from .capture import CaptureSource, RescanInProgress, input_device_name, open_input_stream
+from .drift import DriftCorrector, DriftEstimator
+from .dsp import DSP_STAGES, build_dsp_chain
+from .encoders import create_encoder, parse_bitrate
+from .ffmpeg import (FATAL_ERRORS, FATAL_FANOUT_ERRORS, FIFO_OPEN_FAILED_RE, SLAVE_FAILED_RE, build_ffmpeg_command,
+                     spawn_ffmpeg, terminate_ffmpeg)
+from .gate import SilenceGate
+from .levels import LevelMeter
+from .metrics import LATENCY_BUCKETS, OUTAGE_BUCKETS, default_registry
+from .pcm import PcmConverter
+from .progress import FFmpegProgress
+from .recorder import SegmentRecorder, TSTap, WavRecorder
+from .ringbuffer import AudioRingBuffer, PipeWriter
+
+
+# After a reconnect, how long to wait for FFmpeg to report output before trusting it
+RECONNECT_CONFIRM_SECONDS = 15.0
+
+# Time from start() (or a reconnect attempt) to FFmpeg's first muxed packet
+FIRST_PACKET_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0, 10.0)
+
+
+class StreamError(Exception):
+    """Raised when a stream cannot be started"""
+
+
+def format_bytes(bytes_val):
+    """Format bytes into human-readable string"""
+    if bytes_val < 1024:
+        return f"{bytes_val} B"
+    elif bytes_val < 1024 * 1024:
+        return f"{bytes_val / 1024:.1f} KB"
+    elif bytes_val < 1024 * 1024 * 1024:
+        return f"{bytes_val / (1024 * 1024):.1f} MB"
+    else:
+        return f"{bytes_val / (1024 * 1024 * 1024):.2f} GB"
+
+
+@dataclass
+class DestinationStats:
+    """State of one output of the encode"""
+    url: str
+    state: str = 'active'             # active, failed
+    error: str = ''
+    active_seconds: float = 0.0       # Time the destination was receiving data
+
+
+@dataclass
+class StreamStats:
+    """Point-in-time snapshot of a StreamEngine"""
+    state: str = 'idle'               # idle, monitoring, streaming, reconnecting
+    connected: bool = False
+    bytes_sent: int = 0               # Raw PCM written to FFmpeg
+    encoded_size: int = 0             # Encoded bytes reported by FFmpeg
+    output_bitrate: str = "0kbits/s"
+    ffmpeg_time: str = "00:00:00"
+    speed: float = None               # Encoder speed (x real time), None until reported
+    target_bitrate: str = ''
+    uptime: float = 0.0
+    buffer_ms: float = 0.0
+    overflows: int = 0
+    underflows: int = 0
+    dropped_frames: int = 0
+    destinations: list = field(default_factory=list)
+    reconnects: int = 0               # Successful encoder restarts since start
+    reconnect_attempt: int = 0        # Attempt number of the reconnect in progress
+    outage_seconds: float = 0.0       # Current outage so far, else the last one
+    total_outage_seconds: float = 0.0
+    gap_dropped_frames: int = 0       # Audio captured during outages that was never sent
+    first_packet_ms: float = None     # Time to first packet of the current encoder, None until ready
+    bitrate_switches: int = 0         # Adaptive bitrate changes since start
+    recording: bool = False
+    record_path: str = ''             # Segment being written, '' until the first write
+    record_bytes: int = 0             # Written to disk since start
+    record_dropped_bytes: int = 0     # Not recorded because the disk fell behind (or failed)
+    drift_ppm: float = None           # Capture clock against the host clock, None until measured
+    drift_correction_ppm: float = 0.0 # Resampling currently applied against it
+    device_lost: bool = False         # Capture device gone, waiting for it to come back
+    limiter_gain_db: float = None     # Gain the DSP limiter applies now (0 = not limiting), None without one
+    gated: bool = False               # Silence gate closed: the encoder is sent zeros
+    gated_seconds: float = 0.0        # Audio sent as zeros since start
+    gate_bytes_saved: int = 0         # Encoded bytes saved against the target bitrate, None if unknown
+
+    def summary(self):
+        """One-line status text shown in the GUI and printed by the CLI"""
+        # Use encoded size from FFmpeg if available, otherwise raw input
+        display_size = self.encoded_size if self.encoded_size > 0 else self.bytes_sent
+
+        # Use FFmpeg's bitrate if available, otherwise show selected bitrate
+        if self.output_bitrate and self.output_bitrate != "0kbits/s":
+            bitrate_str = self.output_bitrate
+        else:
+            bitrate_str = f"{self.target_bitrate}/s (target)"
+
+        if self.device_lost:
+            connection_status = "Audio device lost"
+        elif self.state == 'reconnecting':
+            connection_status = f"Reconnecting (attempt {self.reconnect_attempt}, {self.outage_seconds:.0f}s)"
+        else:
+            connection_status = "Connected" if self.connected else "Connecting..."
+        text = (f"Status: {connection_status} | Sent: {format_bytes(display_size)} | "
+                f"Time: {self.ffmpeg_time} | Bitrate: {bitrate_str}")
+        if self.speed is not None:
+            text += f" | Speed: {self.speed:.2f}x"
+        if self.state in ('streaming', 'reconnecting'):
+            text += f" | Buf: {self.buffer_ms:.0f}ms O/U: {self.overflows}/{self.underflows}"
+        if self.drift_ppm is not None:
+            text += f" | Drift: {self.drift_ppm:+.1f}ppm"
+        if self.limiter_gain_db is not None and self.limiter_gain_db < -0.05:
+            text += f" | Limit: {self.limiter_gain_db:.1f}dB"
+        if self.gated_seconds:
+            text += f" | {'Gated' if self.gated else 'Gate'}: {self.gated_seconds:.0f}s"
+            if self.gate_bytes_saved is not None:
+                text += f" ({format_bytes(self.gate_bytes_saved)} saved)"
+        if self.bitrate_switches:
+            text += f" | Target: {self.target_bitrate} ({self.bitrate_switches} switches)"
+        if self.recording:
+            text += f" | Rec: {format_bytes(self.record_bytes)}"
+            if self.record_dropped_bytes:
+                text += f" ({format_bytes(self.record_dropped_bytes)} dropped)"
+        if self.reconnects:
+            text += f" | Reconnects: {self.reconnects} (last {self.outage_seconds:.1f}s)"
+        if len(self.destinations) > 1:
+            active = sum(1 for d in self.destinations if d.state == 'active')
+            text += f" | Out: {active}/{len(self.destinations)}"
+        return text
+
+
+class StreamEngine:
+    """UI-independent capture -> FFmpeg -> SRT pipeline
+
+    Listeners registered with add_listener() receive (event, message) for
+    'monitoring', 'started', 'stopped', 'disconnected' and 'destination_failed'
+    (one output of a multi-destination stream dropped out). Events raised
+    by a failure are delivered from a worker thread; UIs must marshal them.
+
+    With settings.auto_reconnect, an output failure emits 'reconnecting'
+    instead of 'disconnected': the device keeps capturing into the ring while
+    FFmpeg is restarted with exponential backoff, and 'reconnected' follows
+    once the new encoder is producing output.
+
+    start() returns as soon as FFmpeg is spawned and the device is open;
+    'ready' follows when FFmpeg reports its first muxed packet, carrying the
+    time to first packet. With settings.warm_standby an FFmpeg for the current
+    settings is kept pre-spawned so starts and reconnects skip process startup.
+
+    With settings.adaptive_bitrate a BitrateController (see abr.py) moves the
+    encoder between adaptive_min_bitrate and settings.bitrate as the output
+    path congests and recovers; each change emits 'bitrate_changed' once the
+    restarted encoder produces output.
+
+    With settings.record a copy of the stream is kept in rotating segment
+    files (see recorder.py): the encoded MPEG-TS through one more tee slave,
+    or the PCM the pipe writer sends. Disk writes are queued off the stream's
+    threads and dropped, not waited for, when the disk falls behind.
+
+    Capture callbacks are timed against the host clock (see drift.py), and
+    with settings.drift_correction the pipe writer resamples by the measured
+    drift so that latency does not creep over long streams.
+
+    With settings.dsp the pipe writer runs a DSP chain (high-pass, gain,
+    look-ahead limiter; see dsp.py) on each batch first, and output_meter
+    meters its result next to level_meter's capture levels.
+
+    With settings.silence_gate the pipe writer sends digital zeros once the
+    source has been near-silent for a while (see gate.py), which the encoder
+    turns into a fraction of the bitrate, and reports the time gated and the
+    encoded bytes saved.
+
+    The device is opened once as a CaptureSource: the level meter is always
+    subscribed while it is open, and the encoder feed subscribes for the
+    duration of a stream, so start and stop never reopen the hardware.
+    Given a DeviceRegistry (see devices.py), a device that disappears emits
+    'device_lost' and is re-opened by its key when it comes back
+    ('device_restored'), while the stream and its encoder keep running. A
+    device opened while the registry re-scans is not waited for: it is
+    opened by the listener once the re-scan is done.
+
+    The encoder is pluggable (settings.encoder_backend): an FFmpeg subprocess
+    fed through a pipe, or libav in-process through PyAV (see encoders.py).
+
+    Pipeline metrics are registered in metrics (the process-wide registry by
+    default) under labels, e.g. {'session': 'main'}.
+    """
+
+    def __init__(self, settings, source_factory=open_input_stream, ffmpeg_exe=None, metrics=None,
+                 labels=None, devices=None):
+        self.settings = settings
+        self.source_factory = source_factory
+        self.ffmpeg_exe = ffmpeg_exe
+        self.level_meter = LevelMeter(channels=settings.channels)
+        self.output_meter = LevelMeter(channels=settings.channels)  # After the DSP chain, while streaming with one
+        self.metrics = metrics or default_registry
+        self.metric_labels = labels or {'session': 'main'}
+
+        self.encoder = None            # SubprocessEncoder or PyAVEncoder of the current stream
+        self.bitrate = None            # Bitrate of the current stream; differs from settings under adaptive bitrate
+        self.bitrate_controller = None
+        self.recorder = None           # SegmentRecorder of the current stream (settings.record)
+        self.capture = None            # Shared CaptureSource; stays open between streams
+        self.devices = devices         # DeviceRegistry used to re-bind a lost device, if any
+        self.device_key = None         # Registry key of the capture device
+        self.device_lost = False       # The capture device stopped and has not come back yet
+        self._capture_opens = 0        # capture.opens when last seen; a change means a gap in capture
+        self.ring = None
+        self.drift = None              # DriftEstimator of the current stream
+        self.gate = None               # SilenceGate of the current stream (settings.silence_gate)
+        self.dsp = None                # DspChain of the current stream (settings.dsp)
+        self.pipe_writer = None
+        self.destinations = []
+        self.destination_stats = []
+        self.is_streaming = False
+        self.reconnecting = False
+        self.sample_rate = settings.sample_rate
+        self._lock = threading.RLock()
+        self._listeners = []
+        self._reconnect_lock = threading.Lock()
+        self._reconnect_stop = threading.Event()
+        self._encoder_failed = threading.Event()
+        self._ready = threading.Event()
+        self._start_clock = 0.0
+        self._last_ffmpeg_error = ''
+        self._standby = None           # (proc, command) of a pre-spawned FFmpeg
+        self._standby_lock = threading.Lock()
+        self._switch_message = None    # Reported with the first packet after a bitrate change
+        self._ts_tap = None            # TSTap for recording the encoded stream; kept between streams
+        self._tap_lock = threading.Lock()
+        self._tee_output = False       # Current encoder writes through the tee muxer
+        self._reset_stats()
+        self._reset_reconnect_stats()
+        self._register_metrics()
+        if devices is not None:
+            devices.add_listener(self._on_devices_changed)
+
+    def _register_metrics(self):
+        m, labels = self.metrics, self.metric_labels
+        self.m_callback_seconds = m.histogram(
+            'audiostream_callback_duration_seconds', "Time spent feeding the encoder in the audio callback",
+            labels)
+        self.m_pipe_latency = m.histogram(
+            'audiostream_pipe_write_latency_seconds', "Delay from capture callback to FFmpeg pipe write",
+            labels, LATENCY_BUCKETS)
+        self.m_input_overflows = m.counter(
+            'audiostream_input_overflows_total', "PortAudio input overflow flags seen in callbacks", labels)
+        self.m_input_underflows = m.counter(
+            'audiostream_input_underflows_total', "PortAudio input underflow flags seen in callbacks", labels)
+        self.m_capture_bytes = m.counter(
+            'audiostream_capture_bytes_total', "PCM bytes delivered by the capture device", labels)
+        self.m_pipe_bytes = m.counter(
+            'audiostream_pipe_bytes_total', "PCM bytes written to the encoder pipe", labels)
+        self.m_starts = m.counter('audiostream_stream_starts_total', "Streams started", labels)
+        self.m_restarts = m.counter(
+            'audiostream_stream_restarts_total', "Streams started again after the first start", labels)
+        self.m_disconnects = m.counter(
+            'audiostream_stream_disconnects_total', "Streams ended by an FFmpeg or pipe failure", labels)
+        self.m_reconnects = m.counter(
+            'audiostream_reconnects_total', "Encoder restarts that brought the output back", labels)
+        self.m_reconnect_attempts = m.counter(
+            'audiostream_reconnect_attempts_total', "Encoder restarts tried after an output failure", labels)
+        self.m_outage_seconds = m.histogram(
+            'audiostream_outage_seconds', "Time from an output failure to the reconnect", labels, OUTAGE_BUCKETS)
+        self.m_first_packet = m.histogram(
+            'audiostream_time_to_first_packet_seconds', "Time from starting an encoder to its first packet",
+            labels, FIRST_PACKET_BUCKETS)
+        self.m_standby_hits = m.counter(
+            'audiostream_standby_hits_total', "Encoder starts that used a pre-spawned FFmpeg", labels)
+        self.m_gap_dropped = m.counter(
+            'audiostream_gap_dropped_frames_total', "Frames captured during outages that were never sent",
+            labels)
+        self.m_bitrate_switches = m.counter(
+            'audiostream_bitrate_switches_total', "Encoder restarts at a new bitrate by adaptive bitrate", labels)
+        self.m_device_losses = m.counter(
+            'audiostream_device_losses_total', "Times the capture device stopped delivering audio", labels)
+
+        # Read at scrape time from state that already exists
+        m.gauge('audiostream_streaming', "1 while streaming", labels, fn=lambda: int(self.is_streaming))
+        m.gauge('audiostream_reconnecting', "1 while the encoder is being restarted", labels,
+                fn=lambda: int(self.reconnecting))
+        m.gauge('audiostream_capture_device_lost', "1 while the capture device is gone", labels,
+                fn=lambda: int(self.device_lost))
+        m.gauge('audiostream_capture_latency_seconds', "Input latency reported by the capture device", labels,
+                fn=lambda: (self.capture.input_latency or 0.0) if self.capture else 0.0)
+        m.gauge('audiostream_ring_depth_seconds', "Audio queued between callback and pipe writer", labels,
+                fn=lambda: self.ring.latency_ms(self.sample_rate) / 1000 if self.ring else 0.0)
+        m.gauge('audiostream_ring_overflows', "Ring buffer writes that dropped audio (current stream)", labels,
+                fn=lambda: self.ring.overflows if self.ring else 0)
+        m.gauge('audiostream_ring_underflows', "Pipe writer waits that found no audio (current stream)", labels,
+                fn=lambda: self.ring.underflows if self.ring else 0)
+        m.gauge('audiostream_encoder_speed', "FFmpeg encoding speed as a multiple of real time", labels,
+                fn=lambda: self.progress.speed)
+        m.gauge('audiostream_encoded_bytes', "Bytes muxed by FFmpeg (current stream)", labels,
+                fn=lambda: self.progress.total_size)
+        m.gauge('audiostream_target_bitrate_bits', "Encoder bitrate of the current stream", labels,
+                fn=lambda: parse_bitrate(self.bitrate) if self.bitrate else 0)
+        m.gauge('audiostream_clock_drift_ppm', "Capture clock rate against the host clock, in ppm", labels,
+                fn=lambda: (self.drift.ppm or 0.0) if self.drift else 0.0)
+        m.gauge('audiostream_drift_correction_ppm', "Resampling applied to follow the host clock, in ppm",
+                labels, fn=lambda: self._drift_corrector().ppm if self._drift_corrector() else 0.0)
+        m.gauge('audiostream_timeline_offset_seconds', "Stream timeline behind the capture clock (smoothed)",
+                labels, fn=lambda: self._drift_corrector().offset if self._drift_corrector() else 0.0)
+        for stage in DSP_STAGES:
+            m.gauge('audiostream_dsp_stage_seconds', "Time spent in a DSP stage (current stream)",
+                    dict(labels, stage=stage), fn=lambda stage=stage: self._dsp_stage_seconds(stage))
+        m.gauge('audiostream_limiter_gain_db', "Lowest limiter gain in the latest batch (0 = not limiting)", labels,
+                fn=lambda: self._limiter_gain_db())
+        m.gauge('audiostream_silence_gated', "1 while the silence gate sends zeros", labels,
+                fn=lambda: int(self.gate.gated) if self.gate else 0)
+        m.gauge('audiostream_silence_gated_seconds', "Audio sent as zeros by the silence gate (current stream)",
+                labels, fn=lambda: self.gate.gated_seconds if self.gate else 0.0)
+        m.gauge('audiostream_silence_bytes_saved', "Encoded bytes saved by the silence gate (current stream)",
+                labels, fn=lambda: self._gate_bytes_saved())
+        m.gauge('audiostream_record_bytes', "Bytes written to recording segments (current stream)", labels,
+                fn=lambda: self.recorder.bytes_written if self.recorder else 0)
+        m.gauge('audiostream_record_dropped_writes', "Recording writes dropped because the disk fell behind "
+                "or failed (current stream)", labels,
+                fn=lambda: self.recorder.dropped_writes if self.recorder else 0)
+        m.gauge('audiostream_record_dropped_bytes', "Bytes not recorded because the disk fell behind "
+                "or failed (current stream)", labels,
+                fn=lambda: self.recorder.dropped_bytes if self.recorder else 0)
+        m.gauge('audiostream_record_queue_bytes', "Recording data waiting for the disk", labels,
+                fn=lambda: self.recorder.queued_bytes if self.recorder else 0)
+
+    def _reset_stats(self):
+        self.start_time = None
+        self._reset_encoder_stats()
+
+    def _reset_encoder_stats(self):
+        self.ffmpeg_connected = False
+        self.progress = FFmpegProgress()
+        self.time_to_first_packet = None
+
+    def _reset_reconnect_stats(self):
+        self.reconnects = 0
+        self.bitrate_switches = 0
+        self.reconnect_attempt = 0
+        self.outage_started = None
+        self.last_outage = 0.0
+        self.total_outage = 0.0
+        self.gap_dropped_frames = 0
+        self._outage_dropped_base = 0
+        self._bytes_sent_before = 0     # Written by pipe writers of replaced encoders
+
+    # Events
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _emit(self, event, message=''):
+        for listener in list(self._listeners):
+            try:
+                listener(event, message)
+            except Exception as e:
+                print(f"Error in stream listener: {e}")
+
+    # Capture callbacks
+
+    def _count_status(self, status):
+        if status.input_overflow:
+            self.m_input_overflows.inc()
+        if status.input_underflow:
+            self.m_input_underflows.inc()
+
+    def monitor_callback(self, indata, frames, time, status):
+        """Capture subscriber for the VU meters; attached whenever the device is open"""
+        if status:
+            self._count_status(status)
+            print(f"Audio callback status: {status}")
+        self.m_capture_bytes.inc(indata.nbytes)
+
+        # Calculate audio levels for VU meter (reuses scratch buffers)
+        self.level_meter.update(indata)
+
+    def audio_callback(self, indata, frames, time, status):
+        """Capture subscriber that feeds the encoder; attached while streaming"""
+        started = perf_counter()
+
+        # Queue audio for the pipe writer thread (never blocks on FFmpeg)
+        ring = self.ring
+        if ring is not None:
+            ring.write(indata)
+        drift = self.drift
+        if drift is not None:
+            drift.observe(frames, time, status)
+        self.m_callback_seconds.observe(perf_counter() - started)
+
+    def _on_pipe_batch(self, frames, nbytes, latency):
+        """Called from the pipe writer thread after each write"""
+        self.m_pipe_bytes.inc(nbytes)
+        self.m_pipe_latency.observe(latency)
+
+    # Monitoring
+
+    def _device_name(self, device):
+        """input_device_name(device), from the registry's list when there is one (no PortAudio call)"""
+        if self.devices is None:
+            return input_device_name(device)
+        device_info = self.devices.get(device)
+        return device_info.label if device_info else None
+
+    def _open_capture(self, device):
+        """Make self.capture a running source for device, reusing it if it already is one
+
+        With a registry, a re-scan in progress is not waited for: the source
+        is returned unopened (with its subscribers) and _on_devices_changed
+        opens it afterwards.
+        """
+        settings = self.settings
+        # Tuned values are stored per device name, so only look the name up when they are wanted
+        blocksize, latency = settings.capture_options(
+            self._device_name(device) if settings.capture_autotune else None)
+        capture = self.capture
+        if capture and capture.active and capture.matches(device, settings.sample_rate, settings.channels,
+                                                          blocksize, latency):
+            return capture
+        if capture:
+            capture.close()
+            self.level_meter.reset()
+        self.capture = None
+        capture = CaptureSource(device, settings.sample_rate, settings.channels, self.source_factory,
+                                blocksize=blocksize, latency=latency)
+        capture.subscribe(self.monitor_callback)
+        try:
+            capture.start(wait=self.devices is None)
+        except RescanInProgress:
+            pass
+        self.capture = capture
+        self._capture_opens = capture.opens
+        device_info = self.devices.get(device) if self.devices is not None else None
+        self.device_key = device_info.key if device_info else None
+        self.device_lost = False
+        return capture
+
+    def _on_devices_changed(self, added, removed):
+        """DeviceRegistry listener: notice a lost capture device, and re-open it once its key is back
+
+        The ring, drift timeline and encoder are kept, so a stream resumes on
+        the same output when the device returns (under a new PortAudio id).
+        Until it does, the registry is asked to keep re-scanning for it. Also
+        opens a source that _open_capture left unopened during a re-scan.
+        """
+        events = []
+        with self._lock:
+            capture = self.capture
+            if capture is not None and not capture.lost and not capture.active:
+                self._start_deferred(capture)
+            if capture is not None and capture.lost:
+                self.capture = None
+                self.device_lost = True
+                self.level_meter.reset()
+                self.m_device_losses.inc()
+                events.append(('device_lost', f"Audio device lost: {self._device_label()} - "
+                                              f"waiting for it to come back"))
+            elif capture is not None and capture.opens != self._capture_opens:
+                # Closed and re-opened around a re-scan: the drift fit must not span the gap
+                self._capture_opens = capture.opens
+                if self.is_streaming and self.drift is not None:
+                    self.drift.reset()
+            if self.device_lost and self.device_key:
+                device = self.devices.find(self.device_key)
+                capture = None
+                if device is not None:
+                    try:
+                        capture = self._open_capture(device.index)
+                    except Exception:
+                        pass           # The list may predate the device going again
+                if capture is None:
+                    self.devices.wait_for(self.device_key)  # Re-scanned for again next interval
+                else:
+                    if self.is_streaming:
+                        capture.subscribe(self.audio_callback)
+                        if self.drift is not None:
+                            self.drift.reset()
+                    events.append(('device_restored', f"Audio device back: {device.label}"))
+        for event in events:
+            self._emit(*event)
+
+    def _start_deferred(self, capture):
+        """Open a source _open_capture left unopened during a re-scan; marks it lost if that fails"""
+        device = self.devices.find(self.device_key) if self.device_key else None
+        if device is None:
+            capture.lost = True
+            return
+        capture.device = device.index
+        try:
+            capture.start(wait=False)
+        except RescanInProgress:
+            pass                       # Another re-scan started; its refresh calls back again
+        except Exception as e:
+            print(f"Error opening audio device {device.label}: {e}")
+            capture.lost = True
+
+    def _device_label(self):
+        key = self.device_key
+        return key.split('|')[1] if key else "capture device"
+
+    def start_monitor(self, device):
+        """Open the device for level metering (no FFmpeg); keeps it open if already capturing"""
+        with self._lock:
+            if self.is_streaming:
+                return
+            self._open_capture(device)
+        self._emit('monitoring', "Monitoring audio source")
+        self.prepare_standby()
+
+    def stop_monitor(self):
+        """Release the device unless a stream is using it"""
+        with self._lock:
+            if self.is_streaming:
+                return
+            capture, self.capture = self.capture, None
+            self.device_lost = False
+            if capture:
+                capture.close()
+                self.level_meter.reset()
+
+    # Streaming
+
+    def start(self, device):
+        """Spawn FFmpeg and start capturing from device; raises StreamError on failure
+
+        Does not wait for FFmpeg to connect: 'ready' is emitted on the first
+        packet, or 'disconnected' (or 'reconnecting') if FFmpeg fails first.
+        """
+        with self._lock:
+            if self.is_streaming:
+                return
+            self._start_clock = perf_counter()
+
+            settings = self.settings
+            if not settings.stream_url.strip():
+                raise StreamError("Please enter a stream URL")
+            profile = settings.codec_profile()
+            if settings.channels not in profile.channels:
+                raise StreamError(f"{profile.label} needs {', '.join(map(str, profile.channels))} channels, "
+                                  f"not {settings.channels}")
+
+            self._reset_stats()
+            self._reset_reconnect_stats()
+            self._reconnect_stop = threading.Event()  # One per run, so an old supervisor cannot miss stop()
+            self.sample_rate = settings.sample_rate
+            self.bitrate = settings.bitrate
+            try:
+                # Ring buffer decouples the audio callback from FFmpeg's stdin; with
+                # auto-reconnect it also holds the audio captured while FFmpeg is down
+                depth_ms = settings.buffer_ms
+                if settings.auto_reconnect and settings.gap_policy == 'replay':
+                    depth_ms += settings.gap_buffer_ms
+                self.ring = AudioRingBuffer.from_duration(depth_ms, self.sample_rate,
+                                                          channels=settings.channels)
+                self.drift = DriftEstimator(self.sample_rate)
+                self.dsp = build_dsp_chain(settings, self.sample_rate, self._batch_frames(), self.output_meter)
+                if settings.silence_gate and profile.uses_bitrate:
+                    self.gate = SilenceGate(self.sample_rate, settings.silence_threshold_db,
+                                            settings.silence_hold_seconds, settings.silence_hysteresis_db)
+                self._start_recording()
+                self._start_encoder()
+
+                self.start_time = time.time()
+
+                # Attach the encoder feed to the (usually already running) device
+                self._open_capture(device).subscribe(self.audio_callback)
+                self.is_streaming = True
+                if self.m_starts.value:
+                    self.m_restarts.inc()
+                self.m_starts.inc()
+            except Exception as e:
+                self._cleanup()
+                if isinstance(e, StreamError):
+                    raise
+                raise StreamError(str(e)) from e
+            if settings.adaptive_bitrate and profile.uses_bitrate:
+                self.bitrate_controller = BitrateController(
+                    self, bitrate_ladder(settings.adaptive_min_bitrate, settings.bitrate))
+                self.bitrate_controller.start()
+
+        self._emit('started', f"Streaming to {settings.stream_url.strip()}")
+        self.prepare_standby()
+
+    def wait_ready(self, timeout=None):
+        """Block until the current encoder has produced its first packet; True if it has"""
+        return self._ready.wait(timeout)
+
+    def _start_encoder(self):
+        """Start an encoder (adopting the standby FFmpeg if it matches) and a pipe writer draining the ring
+
+        Readiness is not awaited here; the encoder reports its first packet
+        and an early exit through its callbacks.
+        """
+        settings = self._encoder_settings()
+        self.destinations = settings.destinations()
+        self.destination_stats = [DestinationStats(d.url.strip()) for d in self.destinations]
+        ready = self._ready = threading.Event()
+        self._last_ffmpeg_error = ''
+        record_url = self._record_url()
+        self._tee_output = len(self.destinations) > 1 or record_url is not None
+        encoder = create_encoder(settings, self.ffmpeg_exe, record_url)
+        proc = self._take_standby(encoder.command) if encoder.command else None
+        if proc:
+            encoder.adopt(proc)
+            self.m_standby_hits.inc()
+        self.encoder = encoder
+        encoder.start(on_progress=lambda enc, snapshot: self._on_encoder_progress(enc, snapshot, ready),
+                      on_error_line=self._handle_stderr_line,
+                      on_exit=lambda enc: self._on_encoder_exit(enc, ready))
+
+        batch_frames = self._batch_frames()
+        # Measures the drift either way; resamples by it under drift_correction
+        corrector = DriftCorrector(self.drift, settings.channels, batch_frames,
+                                   resample=settings.drift_correction)
+        converter = None
+        if encoder.transport_format != 'f32le':
+            converter = PcmConverter(encoder.transport_format, DriftCorrector.max_output(batch_frames),
+                                     settings.channels, dither=settings.transport_dither)
+        recorder = self.recorder
+        self.pipe_writer = PipeWriter(self.ring, encoder.input, batch_frames=batch_frames,
+                                      on_error=lambda error: self._on_pipe_error(error, encoder),
+                                      on_batch=self._on_pipe_batch, converter=converter,
+                                      tap=recorder.write if isinstance(recorder, WavRecorder) else None,
+                                      corrector=corrector, gate=self.gate, dsp=self.dsp)
+        self.pipe_writer.start()
+
+    def _stop_encoder(self, wait=True):
+        """Stop the pipe writer and the encoder; the device and ring are left running
+
+        With wait=False (bitrate switches) the encoder is stopped in the
+        background, so one stuck on a congested output does not hold up its
+        replacement. A pipe writer still blocked in a write to it by then never
+        reads the ring again: it exits once that write fails.
+        """
+        if self.pipe_writer:
+            self.pipe_writer.stop(timeout=1.0 if wait else 0.2)
+            self._bytes_sent_before += self.pipe_writer.bytes_written
+            self.pipe_writer = None
+
+        # Forget the encoder before stopping it so its exit is not reported as a failure
+        encoder, self.encoder = self.encoder, None
+        if encoder:
+            if wait:
+                encoder.stop()
+            else:
+                threading.Thread(target=encoder.stop, daemon=True, name="EncoderStop").start()
+
+    def _batch_frames(self):
+        return self.sample_rate // 100  # 10 ms per write
+
+    def _drift_corrector(self):
+        writer = self.pipe_writer
+        return writer.corrector if writer else None
+
+    def _dsp_stage_seconds(self, name):
+        stage = self.dsp.stage(name) if self.dsp else None
+        return stage.seconds if stage else 0.0
+
+    def _limiter_gain_db(self):
+        limiter = self.dsp.stage('limiter') if self.dsp else None
+        return 20 * math.log10(limiter.gain) if limiter and limiter.gain > 0 else 0.0
+
+    def _gate_bytes_saved(self):
+        """Bytes saved by the silence gate, None if the encoder does not report its output size"""
+        gate, bitrate = self.gate, self.bitrate
+        return gate.bytes_saved(parse_bitrate(bitrate)) if gate and bitrate else 0
+
+    def _encoder_settings(self):
+        """settings, with the bitrate the current stream runs at if adaptive bitrate changed it"""
+        if not self.bitrate or self.bitrate == self.settings.bitrate:
+            return self.settings
+        return replace(self.settings, bitrate=self.bitrate)
+
+    # Recording
+
+    def _start_recording(self):
+        """Open self.recorder for settings.record (raises OSError if the directory cannot be created)"""
+        settings = self.settings
+        if not settings.record:
+            return
+        options = dict(prefix=self.metric_labels.get('session', 'stream'),
+                       segment_seconds=settings.record_segment_seconds,
+                       segment_bytes=int(settings.record_segment_mb * 1024 * 1024), keep=settings.record_keep)
+        if settings.record_format == 'pcm':
+            self.recorder = WavRecorder(settings.recording_dir(), self.sample_rate, settings.channels,
+                                        **options).start()
+        else:
+            self.recorder = SegmentRecorder(settings.recording_dir(), **options).start()
+            self._record_tap().sink = self.recorder.write
+
+    def _stop_recording(self):
+        if self._ts_tap:
+            self._ts_tap.sink = None
+        recorder, self.recorder = self.recorder, None
+        if recorder:
+            recorder.close()
+
+    def _record_url(self):
+        """Tee slave URL for recording the encoded stream, None unless settings.record_format is 'ts'"""
+        settings = self.settings
+        if not settings.record or settings.record_format != 'ts':
+            return None
+        return self._record_tap().url
+
+    def _record_tap(self):
+        """The TSTap, created on first use; its port stays the same so standby commands still match"""
+        with self._tap_lock:
+            if self._ts_tap is None:
+                self._ts_tap = TSTap()
+            return self._ts_tap
+
+    # Adaptive bitrate
+
+    def set_bitrate(self, bitrate, reason=''):
+        """Restart the encoder at bitrate without stopping the stream; True if it was switched
+
+        The device keeps capturing into the ring during the switch and the new
+        encoder sends that audio first, including a batch the old pipe writer
+        had not finished writing, so nothing is lost; listeners hear a gap of
+        about one encoder start. settings.bitrate is left as configured.
+        """
+        with self._lock:
+            if not self.is_streaming or self.reconnecting or bitrate == self.bitrate:
+                return False
+            previous, self.bitrate = self.bitrate, bitrate
+            self._switch_message = f"Bitrate {previous} -> {bitrate}" + (f" ({reason})" if reason else "")
+            self.m_bitrate_switches.inc()
+            self.bitrate_switches += 1
+            self._stop_encoder(wait=False)
+            self._reset_encoder_stats()
+            self._start_clock = perf_counter()
+            try:
+                self._start_encoder()
+            except Exception as e:
+                self._switch_message = None
+                self._fail(f"FFmpeg failed to start: {e}")
+                return False
+        self.prepare_standby()
+        return True
+
+    # Warm standby
+
+    def prepare_standby(self):
+        """Pre-spawn FFmpeg for the current settings in the background (settings.warm_standby)"""
+        if self.settings.warm_standby and self.settings.encoder_backend == 'ffmpeg':
+            threading.Thread(target=self._spawn_standby, daemon=True, name="StandbyFFmpeg").start()
+
+    def _spawn_standby(self):
+        try:
+            cmd = build_ffmpeg_command(self._encoder_settings(), self.ffmpeg_exe, self._record_url())
+        except Exception as e:
+            print(f"Error preparing standby FFmpeg: {e}")
+            return
+        with self._standby_lock:
+            standby = self._standby
+            if standby and standby[1] == cmd and standby[0].poll() is None:
+                return
+            try:
+                self._standby = (spawn_ffmpeg(cmd), cmd)
+            except Exception as e:
+                self._standby = None
+                print(f"Error spawning standby FFmpeg: {e}")
+        if standby:
+            terminate_ffmpeg(standby[0])
+
+    def _take_standby(self, cmd):
+        """Hand over the standby process if it is alive and matches cmd, else None"""
+        with self._standby_lock:
+            standby, self._standby = self._standby, None
+        if standby is None:
+            return None
+        proc, standby_cmd = standby
+        if standby_cmd == cmd and proc.poll() is None:
+            return proc
+        terminate_ffmpeg(proc)
+        return None
+
+    def discard_standby(self):
+        """Terminate the standby FFmpeg, if any"""
+        with self._standby_lock:
+            standby, self._standby = self._standby, None
+        if standby:
+            terminate_ffmpeg(standby[0])
+
+    def stop(self, reason='stopped', message="Stopped"):
+        """Stop streaming and FFmpeg; the device stays open until close() or stop_monitor()"""
+        # Checked by the reconnect supervisor, which may be waiting for the lock
+        self._reconnect_stop.set()
+        # Stopped before taking the lock, since it may be waiting for it inside set_bitrate()
+        controller, self.bitrate_controller = self.bitrate_controller, None
+        if controller:
+            controller.stop()
+        with self._lock:
+            was_streaming = self.is_streaming
+            self.is_streaming = False
+            self._cleanup()
+        if was_streaming:
+            if reason == 'disconnected':
+                self.m_disconnects.inc()
+            self._emit(reason, message)
+
+    def close(self):
+        """Stop everything, including monitoring and the standby FFmpeg"""
+        if self.devices is not None:
+            self.devices.remove_listener(self._on_devices_changed)
+        self.stop()
+        self.stop_monitor()
+        self.discard_standby()
+        with self._tap_lock:
+            tap, self._ts_tap = self._ts_tap, None
+        if tap:
+            tap.close()
+
+    def _cleanup(self):
+        """Cleanup streaming resources; the device keeps running for the meters"""
+        if self.capture:
+            self.capture.unsubscribe(self.audio_callback)
+
+        self._stop_encoder()
+        self._stop_recording()
+        self.ring = None
+        self.drift = None
+        self.gate = None
+        self.dsp = None
+        self.output_meter.reset()
+        self.reconnecting = False
+        self.bitrate = None
+        self._switch_message = None
+        self._reset_stats()
+
+    def _fail(self, message, encoder=None):
+        """Tear down (or reconnect) from a worker thread after the encoder or the pipe failed"""
+        if not self.is_streaming or (encoder is not None and encoder is not self.encoder):
+            return  # Already stopped, or a late report from an encoder that was replaced
+        if self.settings.auto_reconnect:
+            self._begin_reconnect(message)
+            return
+        threading.Thread(target=self.stop, args=('disconnected', message), daemon=True).start()
+
+    def _begin_reconnect(self, message):
+        """Start the reconnect supervisor unless it is already running"""
+        with self._reconnect_lock:
+            self._encoder_failed.set()
+            if self.reconnecting:
+                return
+            self.reconnecting = True
+            self.outage_started = time.monotonic()
+            self._outage_dropped_base = self.ring.dropped_frames if self.ring else 0
+        threading.Thread(target=self._supervise_reconnect, args=(message,), daemon=True,
+                         name="ReconnectSupervisor").start()
+
+    def _supervise_reconnect(self, message):
+        """Restart FFmpeg with exponential backoff while the device keeps capturing"""
+        settings = self.settings
+        stop_event = self._reconnect_stop
+        with self._lock:
+            if stop_event.is_set():
+                return
+            self._stop_encoder()
+            self._reset_encoder_stats()
+
+        attempt = 0
+        while True:
+            attempt += 1
+            if settings.reconnect_attempts and attempt > settings.reconnect_attempts:
+                self.stop('disconnected', f"{message} - gave up after {attempt - 1} reconnect attempts")
+                return
+            delay = min(settings.reconnect_delay * 2 ** (attempt - 1), settings.reconnect_max_delay)
+            self.reconnect_attempt = attempt
+            self._emit('reconnecting', f"{message} - reconnecting in {delay:.1f}s (attempt {attempt})")
+            if stop_event.wait(delay):
+                return
+
+            with self._lock:
+                if stop_event.is_set() or not self.is_streaming:
+                    return
+                self.m_reconnect_attempts.inc()
+                self._encoder_failed.clear()
+                self._start_clock = perf_counter()
+                self._apply_gap_policy()
+                try:
+                    self._start_encoder()
+                except Exception as e:
+                    print(f"Reconnect attempt {attempt} failed: {e}")
+                    self._stop_encoder()
+                    continue
+            if self._wait_encoder_ready(stop_event):
+                break
+            with self._lock:
+                if stop_event.is_set():
+                    return
+                self._stop_encoder()
+                self._reset_encoder_stats()
+
+        with self._reconnect_lock:
+            outage = time.monotonic() - self.outage_started
+            self.reconnecting = False
+            self.reconnects += 1
+            self.reconnect_attempt = 0
+            self.last_outage = outage
+            self.total_outage += outage
+            self.outage_started = None
+        self.m_reconnects.inc()
+        self.m_outage_seconds.observe(outage)
+        self._emit('reconnected', f"Reconnected to {settings.stream_url.strip()} after {outage:.1f}s")
+        self.prepare_standby()
+
+    def _apply_gap_policy(self):
+        """Account for (and under 'drop', discard) the audio queued during the outage"""
+        ring = self.ring
+        if ring is None:
+            return
+        dropped = ring.dropped_frames - self._outage_dropped_base
+        self._outage_dropped_base = ring.dropped_frames
+        if self.settings.gap_policy == 'drop':
+            dropped += ring.discard()
+        self.gap_dropped_frames += dropped
+        self.m_gap_dropped.inc(dropped)
+
+    def _wait_encoder_ready(self, stop_event):
+        """True once a restarted encoder produces output (or runs without error for a while)"""
+        encoder = self.encoder
+        deadline = time.monotonic() + RECONNECT_CONFIRM_SECONDS
+        while time.monotonic() < deadline:
+            if self._encoder_failed.wait(0.1) or stop_event.is_set():
+                return False
+            if encoder.poll() is not None:
+                return False
+            if self._ready.is_set():
+                return True
+        return True
+
+    def _on_pipe_error(self, error, encoder=None):
+        """Called from the pipe writer thread when the encoder's input breaks"""
+        if encoder is not None and encoder.wait(timeout=0.5) is not None:
+            return  # Encoder exited; its exit is reported with the encoder's own error
+        self._fail("Disconnected - Client closed connection", encoder)
+
+    def _on_encoder_progress(self, encoder, snapshot, ready):
+        """Progress snapshot from an encoder; the first one with output marks it ready"""
+        if encoder is not self.encoder:
+            return  # Encoder was replaced by a reconnect
+        gate = self.gate
+        if gate is not None:
+            gate.count_output(snapshot.total_size - self.progress.total_size if snapshot.size_known else None)
+        self.progress = snapshot
+        if snapshot.total_size > 0 or snapshot.out_time_us > 0:
+            self.ffmpeg_connected = True
+            if not ready.is_set():
+                self._on_first_packet(ready)
+
+    def _on_encoder_exit(self, encoder, ready):
+        """The encoder stopped on its own; unless we stopped it, that is a failure"""
+        if encoder is not self.encoder or not self.is_streaming:
+            return
+        error = self._last_ffmpeg_error or f"exit code {encoder.wait()}"
+        if ready.is_set():
+            self._fail(f"Disconnected - FFmpeg exited: {error}", encoder)
+        else:
+            self._fail(f"FFmpeg failed to start: {error}", encoder)
+
+    def _on_first_packet(self, ready):
+        elapsed = perf_counter() - self._start_clock
+        self.time_to_first_packet = elapsed
+        self.m_first_packet.observe(elapsed)
+        ready.set()
+        switch_message, self._switch_message = self._switch_message, None
+        if switch_message:
+            self._emit('bitrate_changed', f"{switch_message}, first packet after {elapsed * 1000:.0f} ms")
+        elif not self.reconnecting:
+            self._emit('ready', f"First packet after {elapsed * 1000:.0f} ms")
+
+    def _handle_stderr_line(self, encoder, line_str):
+        line_lower = line_str.lower()
+
+        # With several destinations (or a recording), one failing output only marks that destination
+        if self._tee_output:
+            if self._handle_destination_failure(line_str, encoder):
+                return
+            fatal = any(keyword in line_lower for keyword in FATAL_FANOUT_ERRORS)
+        else:
+            fatal = any(keyword in line_lower for keyword in FATAL_ERRORS)
+
+        print(f"[FFMPEG ERROR] {line_str}")
+        if encoder is self.encoder:
+            self._last_ffmpeg_error = line_str
+        # Check for I/O errors or connection failures
+        if fatal:
+            # Only trigger disconnect once
+            if self._ready.is_set():
+                self._fail("Disconnected - Client closed connection", encoder)
+            else:
+                self._fail(f"FFmpeg failed to start: {line_str}", encoder)
+
+    def _handle_destination_failure(self, line_str, encoder=None):
+        """Mark a tee slave as failed; returns True if the line was about one"""
+        index = None
+        match = SLAVE_FAILED_RE.search(line_str)
+        if match:
+            index, error = int(match.group(1)), match.group(2)
+        else:
+            match = FIFO_OPEN_FAILED_RE.search(line_str)
+            if not match:
+                return False
+            url, error = match.groups()
+            for i, destination in enumerate(self.destinations):
+                if destination.output_url() == url or destination.url.strip() == url:
+                    index = i
+                    break
+
+        if index is None or index >= len(self.destination_stats):
+            if self.recorder is not None and index == len(self.destination_stats):
+                print(f"[FFMPEG ERROR] Recording output failed: {error}")
+            return True
+        dest = self.destination_stats[index]
+        if dest.state != 'failed':
+            dest.state = 'failed'
+            dest.error = error
+            if self.start_time:
+                dest.active_seconds = time.time() - self.start_time
+            print(f"[FFMPEG ERROR] Destination {dest.url} failed: {error}")
+            self._emit('destination_failed', f"{dest.url}: {error}")
+            # With a recording slave still running, FFmpeg itself would carry on
+            if all(d.state == 'failed' for d in self.destination_stats):
+                self._fail("Disconnected - all destinations failed", encoder)
+        return True
+
+    def stats(self):
+        """Return a StreamStats snapshot"""
+        progress = self.progress
+        if self.reconnecting:
+            state = 'reconnecting'
+        elif self.is_streaming:
+            state = 'streaming'
+        else:
+            state = 'monitoring' if self.capture and self.capture.active else 'idle'
+        stats = StreamStats(
+            state=state,
+            encoded_size=progress.total_size,
+            output_bitrate=progress.bitrate,
+            ffmpeg_time=progress.out_time,
+            speed=progress.speed,
+            target_bitrate=self.bitrate or self.settings.bitrate,
+            bitrate_switches=self.bitrate_switches,
+        )
+        writer = self.pipe_writer
+        stats.bytes_sent = self._bytes_sent_before + (writer.bytes_written if writer else 0)
+        ring = self.ring
+        if ring is not None:
+            stats.buffer_ms = ring.latency_ms(self.sample_rate)
+            stats.overflows = ring.overflows
+            stats.underflows = ring.underflows
+            stats.dropped_frames = ring.dropped_frames
+        if self.start_time:
+            stats.uptime = time.time() - self.start_time
+        for dest in self.destination_stats:
+            snapshot = DestinationStats(dest.url, dest.state, dest.error, dest.active_seconds)
+            if dest.state == 'active':
+                snapshot.active_seconds = stats.uptime
+            stats.destinations.append(snapshot)
+        # Encoded > 1KB or raw > 100KB
+        stats.connected = progress.total_size > 1024 or stats.bytes_sent > 100000
+        stats.reconnects = self.reconnects
+        stats.reconnect_attempt = self.reconnect_attempt
+        outage_started = self.outage_started
+        stats.outage_seconds = time.monotonic() - outage_started if outage_started else self.last_outage
+        stats.total_outage_seconds = self.total_outage
+        stats.gap_dropped_frames = self.gap_dropped_frames
+        stats.device_lost = self.device_lost
+        if self.time_to_first_packet is not None:
+            stats.first_packet_ms = self.time_to_first_packet * 1000
+        drift = self.drift
+        if drift is not None:
+            stats.drift_ppm = drift.ppm
+        corrector = self._drift_corrector()
+        if corrector is not None:
+            stats.drift_correction_ppm = corrector.ppm
+        if self.dsp is not None and self.dsp.stage('limiter'):
+            stats.limiter_gain_db = self._limiter_gain_db()
+        gate = self.gate
+        if gate is not None:
+            stats.gated = gate.gated
+            stats.gated_seconds = gate.gated_seconds
+            stats.gate_bytes_saved = self._gate_bytes_saved()
+        recorder = self.recorder
+        if recorder is not None:
+            stats.recording = True
+            stats.record_path = recorder.path or ''
+            stats.record_bytes = recorder.bytes_written
+            stats.record_dropped_bytes = recorder.dropped_bytes
+        return stats
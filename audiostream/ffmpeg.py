@@ -0,0 +1,163 @@
+import os
+import re
+import subprocess
+import sys
+
+# stderr fragments that mean the output (client / network) is gone
+FATAL_ERRORS = ('i/o error', 'error muxing', 'error submitting', 'conversion failed',
+                'error writing trailer', 'error closing file')
+
+# With several destinations a single slave failing is not fatal; only these are
+FATAL_FANOUT_ERRORS = ('all tee outputs failed', 'conversion failed', 'error submitting')
+
+# tee muxer messages about one destination failing
+SLAVE_FAILED_RE = re.compile(r'Slave muxer #(\d+) failed: (.*?)(?:, continuing|$)')
+FIFO_OPEN_FAILED_RE = re.compile(r'\[fifo @ [^\]]+\] Error opening (\S+): (.*)')
+
+# Options for each tee slave: own FIFO thread so a stalled destination cannot block the others
+# (fifo_options is unescaped twice, hence the double backslash before each nested ':')
+TEE_SLAVE_OPTIONS = (r'f=mpegts:mpegts_flags=initial_discontinuity:onfail=ignore:use_fifo=1:'
+                     r'fifo_options=drop_pkts_on_overflow=1\\:attempt_recovery=1\\:recovery_wait_time=1')
+
+# A single destination teed only for the recording: written directly, and its failure ends the encode
+PRIMARY_SLAVE_OPTIONS = 'f=mpegts:mpegts_flags=initial_discontinuity:onfail=abort'
+
+
+def get_ffmpeg_path():
+    """Find FFmpeg executable, checking bundled location first"""
+    # Check if running as PyInstaller bundle
+    if getattr(sys, 'frozen', False):
+        # Running in a bundle - check bundle directory
+        bundle_dir = sys._MEIPASS
+        ffmpeg_bundled = os.path.join(bundle_dir, 'ffmpeg.exe')
+        if os.path.exists(ffmpeg_bundled):
+            return ffmpeg_bundled
+
+    # Check in script directory
+    script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ffmpeg_local = os.path.join(script_dir, 'ffmpeg.exe')
+    if os.path.exists(ffmpeg_local):
+        return ffmpeg_local
+
+    # Fall back to system PATH
+    return 'ffmpeg'
+
+
+def build_ffmpeg_command(settings, ffmpeg_exe=None, record_url=None):
+    """Build the low-latency FFmpeg command line for a StreamSettings
+
+    One destination is written directly; several are fed from the same encode
+    through the tee muxer, so CPU and pipe bandwidth do not grow per output.
+    record_url (a recorder.TSTap) adds one more tee slave for the archive.
+    """
+    ffmpeg_exe = ffmpeg_exe or get_ffmpeg_path()
+    destinations = settings.destinations()
+    profile = settings.codec_profile()
+
+    ffmpeg_cmd = [
+        ffmpeg_exe,
+        "-y",                      # Overwrite output
+        "-loglevel", "error",      # stderr carries errors only
+        "-nostats",                # No human-readable stats lines on stderr
+        "-progress", "pipe:1",     # Machine-readable key=value progress on stdout
+        "-stats_period", "0.1",    # Progress update interval; also times the first packet
+        "-probesize", "32",        # Raw PCM needs no probing; without these FFmpeg reads
+        "-analyzeduration", "0",   # ~5 s of input before it opens the output
+        "-f", settings.transport_format,  # Raw PCM as written by the pipe writer
+        "-ar", str(settings.sample_rate),
+        "-ac", str(settings.channels),
+        "-i", "pipe:0",
+    ]
+
+    # Encoder options come from the codec profile, so each codec only gets flags valid for it
+    ffmpeg_cmd.extend(profile.ffmpeg_args)
+    if profile.uses_bitrate:
+        ffmpeg_cmd.extend(["-b:a", settings.bitrate])
+    encode_rate = settings.encode_rate()
+    if encode_rate != settings.sample_rate:
+        ffmpeg_cmd.extend(["-ar", str(encode_rate)])  # e.g. Opus: resample to 48 kHz
+
+    ffmpeg_cmd.extend([
+        "-fflags", "nobuffer+flush_packets",  # No buffering, flush immediately
+        "-flags", "low_delay",     # Low delay mode
+        "-avoid_negative_ts", "make_zero",
+        "-max_delay", "0",         # Minimize muxing delay
+        "-muxdelay", "0",          # No muxing delay
+        "-flush_packets", "1",     # Force packet flushing (like recording mode)
+        "-muxpreload", "0",        # No preload (like OBS recording mode)
+    ])
+
+    if len(destinations) > 1 or record_url:
+        # Per-destination SRT options travel in each URL's query string
+        ffmpeg_cmd.extend(["-map", "0:a", "-f", "tee", build_tee_output(destinations, record_url)])
+        return ffmpeg_cmd
+
+    destination = destinations[0]
+    ffmpeg_cmd.extend([
+        "-f", "mpegts",            # MPEG-TS for streaming compatibility
+        "-mpegts_flags", "initial_discontinuity"
+    ])
+
+    # Add SRT-specific low-latency options
+    if destination.is_srt:
+        for key, value in destination.srt_options().items():
+            ffmpeg_cmd.extend([f"-{key}", str(value)])
+
+    ffmpeg_cmd.append(destination.url.strip())
+    return ffmpeg_cmd
+
+
+def build_tee_output(destinations, record_url=None):
+    """tee muxer output spec: one MPEG-TS slave per destination, failures isolated
+
+    record_url is added last, always behind its own dropping FIFO, so the
+    recording can neither stall nor fail the stream.
+    """
+    options = TEE_SLAVE_OPTIONS if len(destinations) > 1 else PRIMARY_SLAVE_OPTIONS
+    slaves = []
+    for destination in destinations:
+        # '|' separates slaves and brackets delimit options; escape them in URLs
+        url = re.sub(r'([|\[\]])', r'\\\1', destination.output_url())
+        slaves.append(f"[{options}]{url}")
+    if record_url:
+        slaves.append(f"[{TEE_SLAVE_OPTIONS}]{record_url}")
+    return "|".join(slaves)
+
+
+def spawn_ffmpeg(ffmpeg_cmd):
+    """Start FFmpeg with binary stdin/stdout/stderr pipes and no console window"""
+    # Set binary mode on Windows
+    startupinfo = None
+    creationflags = 0
+    if sys.platform == 'win32':
+        startupinfo = subprocess.STARTUPINFO()
+        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        creationflags = subprocess.CREATE_NO_WINDOW
+
+    proc = subprocess.Popen(
+        ffmpeg_cmd,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        startupinfo=startupinfo,
+        creationflags=creationflags,
+        bufsize=0  # Unbuffered
+    )
+
+    # Set stdin to binary mode on Windows
+    if sys.platform == 'win32' and proc.stdin:
+        import msvcrt
+        msvcrt.setmode(proc.stdin.fileno(), os.O_BINARY)
+    return proc
+
+
+def terminate_ffmpeg(proc, timeout=2):
+    """Close stdin and stop an FFmpeg process, killing it if it does not exit"""
+    try:
+        if proc.stdin:
+            proc.stdin.close()
+        proc.terminate()
+        proc.wait(timeout=timeout)
+    except Exception as e:
+        print(f"Error terminating FFmpeg: {e}")
+        proc.kill()
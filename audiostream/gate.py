@@ -0,0 +1,95 @@
+"""Silence gate: digital zeros to the encoder during dead air
+
+A quiet source is rarely silent to the encoder: a noise floor at -70 dBFS
+still costs AAC its full bitrate (and Opus most of it), because noise is the
+hardest thing to compress. Digital zeros cost far less: AAC at 192k falls
+to ~100 kbit/s of MPEG-TS, most of it the container's per-packet overhead,
+and the encoder does less work.
+
+SilenceGate runs on the pipe writer thread, before drift correction and PCM
+conversion. Once every batch has peaked below the threshold for hold
+seconds it fades the audio out and sends zeros; the first batch peaking
+above threshold + hysteresis opens it again with a short fade-in, so
+audio that hovers around the threshold does not chatter. The encoder keeps
+running throughout, so nothing restarts and the receiver sees one
+continuous stream.
+"""
+import numpy as np
+
+THRESHOLD_DB = -60.0               # Peak level (dBFS) below which a batch counts as silence
+HYSTERESIS_DB = 6.0                # The gate opens again only above threshold + this
+HOLD_SECONDS = 2.0                 # Silence lasting this long closes the gate
+FADE_SECONDS = 0.005               # Ramp when closing and opening
+
+
+class SilenceGate:
+    """Replaces sustained near-silence in the encoder feed with zeros
+
+    One gate serves a whole stream (across encoder restarts), so gated_frames
+    and encoded_bytes count from start(). encoded_bytes is what the encoder
+    produced while gated, as reported by its progress. FFmpeg does not report
+    its output size with several destinations (tee), and then the savings
+    are unknown rather than the whole target bitrate.
+    """
+
+    def __init__(self, sample_rate, threshold_db=THRESHOLD_DB, hold=HOLD_SECONDS, hysteresis_db=HYSTERESIS_DB):
+        self.sample_rate = sample_rate
+        self.close_level = 10 ** (threshold_db / 20)
+        self.open_level = 10 ** ((threshold_db + hysteresis_db) / 20)
+        self.hold_frames = int(hold * sample_rate)
+        self.gated = False
+        self.gates = 0                 # Times the gate closed
+        self.gated_frames = 0          # Frames sent as zeros
+        self.encoded_bytes = 0         # Encoder output while gated
+        self.output_unknown = False    # The encoder did not report its output size while gated
+        self._quiet_frames = 0
+        fade = max(int(FADE_SECONDS * sample_rate), 1)
+        self._fade_out = np.linspace(1.0, 0.0, fade, dtype=np.float32)[:, None]
+        self._fade_in = self._fade_out[::-1].copy()
+
+    @property
+    def gated_seconds(self):
+        return self.gated_frames / self.sample_rate
+
+    def bytes_saved(self, bitrate_bits):
+        """Encoded bytes the gated time would have cost at bitrate_bits, less what it did cost; None if unknown"""
+        if self.output_unknown:
+            return None
+        return max(int(self.gated_seconds * bitrate_bits / 8) - self.encoded_bytes, 0)
+
+    def process(self, batch, frames):
+        """Gate batch[:frames] in place; True if the batch is all zeros"""
+        block = batch[:frames]
+        peak = max(block.max(), -block.min()) if frames else 0.0
+        if self.gated:
+            if peak < self.open_level:
+                block.fill(0.0)
+                self.gated_frames += frames
+                return True
+            self.gated = False
+            self._quiet_frames = 0
+            fade = min(len(self._fade_in), frames)
+            block[:fade] *= self._fade_in[:fade]
+            return False
+        if peak >= self.close_level:
+            self._quiet_frames = 0
+            return False
+        self._quiet_frames += frames
+        if self._quiet_frames < self.hold_frames:
+            return False
+        self.gated = True
+        self.gates += 1
+        fade = min(len(self._fade_out), frames)
+        block[:fade] *= self._fade_out[:fade]
+        block[fade:] = 0.0
+        self.gated_frames += frames
+        return False  # Converted as usual, for the fade
+
+    def count_output(self, nbytes):
+        """Encoder output of nbytes was reported (None: not reported); counted against the savings while gated"""
+        if not self.gated:
+            return
+        if nbytes is None:
+            self.output_unknown = True
+        elif nbytes > 0:
+            self.encoded_bytes += nbytes
@@ -0,0 +1,733 @@
+import os
+import sys
+import threading
+import tkinter as tk
+from time import perf_counter
+from tkinter import filedialog, ttk, messagebox
+
+import numpy as np
+
+from .codecs import CODEC_PROFILES
+from .devices import HOTPLUG_INTERVAL, DeviceRegistry
+from .engine import StreamEngine, StreamError
+from .history import StatsHistory
+from .levels import MeterBallistics
+from .metrics import default_registry, start_exporters
+from .process import ProcessEngine
+from .settings import (BITRATES, SAMPLE_RATES, load_settings, parse_sample_rate, sample_rate_label,
+                       save_capture_tuning, save_settings)
+from .tuning import TUNE_LATENCY, tune_capture
+
+VU_WIDTH = 350
+VU_HEIGHT = 20
+VU_MIN_INTERVAL_MS = 33    # ~30 redraws per second while levels move
+VU_MAX_INTERVAL_MS = 125   # Backed-off rate when idle or when the Tk loop is lagging
+# (upper dBFS bound, bar colour) by RMS level
+VU_COLORS = ((-18.0, 'green'), (-6.0, '#d7d700'), (0.0, '#d70000'))
+SPARK_WIDTH = 170          # One pixel per second of history
+SPARK_HEIGHT = 28
+# (history metric, caption) of the sparklines under the stats line
+SPARK_METRICS = (('bitrate_kbps', 'kbit/s'), ('buffer_ms', 'buffer ms'), ('peak_db', 'peak dBFS'))
+
+
+class VuChannel:
+    """One meter canvas drawn in retained mode
+
+    The bar and peak marker are created once; draw() moves them with
+    coords() and recolours with itemconfig(), and skips Tk calls entirely
+    when nothing changed on screen.
+    """
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.ballistics = MeterBallistics()
+        self.bar = canvas.create_rectangle(0, 0, 0, VU_HEIGHT, fill=VU_COLORS[0][1], outline='')
+        self.peak = canvas.create_rectangle(0, 0, 0, VU_HEIGHT, fill='#e0e0e0', outline='', state='hidden')
+        self._bar_width = 0
+        self._peak_x = 0
+        self._color = VU_COLORS[0][1]
+
+    def draw(self):
+        """Update the canvas items from the ballistics; returns True if anything moved"""
+        ballistics = self.ballistics
+        bar_width = int(ballistics.fraction(ballistics.rms_db) * VU_WIDTH)
+        peak_x = int(ballistics.fraction(ballistics.peak_db) * VU_WIDTH)
+        color = next(c for bound, c in VU_COLORS if ballistics.rms_db <= bound or bound == 0.0)
+        changed = False
+        if bar_width != self._bar_width:
+            self.canvas.coords(self.bar, 0, 0, bar_width, VU_HEIGHT)
+            self._bar_width = bar_width
+            changed = True
+        if color != self._color:
+            self.canvas.itemconfig(self.bar, fill=color)
+            self._color = color
+        if peak_x != self._peak_x:
+            if peak_x > 0:
+                self.canvas.coords(self.peak, peak_x - 2, 0, peak_x, VU_HEIGHT)
+                self.canvas.itemconfig(self.peak, state='normal')
+            else:
+                self.canvas.itemconfig(self.peak, state='hidden')
+            self._peak_x = peak_x
+            changed = True
+        return changed
+
+
+class Sparkline:
+    """Recent history of one metric on a small canvas, drawn in retained mode like VuChannel
+
+    The line and caption are created once; draw() replaces the line's
+    coordinates with the latest SPARK_WIDTH points, scaled to their own range.
+    """
+
+    def __init__(self, canvas, metric, caption):
+        self.canvas = canvas
+        self.metric = metric
+        self.caption = caption
+        self.line = canvas.create_line(0, SPARK_HEIGHT, 0, SPARK_HEIGHT, fill='#00d700')
+        self.text = canvas.create_text(3, 1, anchor=tk.NW, text=caption, fill='#a0a0a0', font=('Segoe UI', 7))
+
+    def draw(self, values):
+        values = values[-SPARK_WIDTH:]
+        known = values[~np.isnan(values)]
+        if len(known) < 2:
+            self.canvas.coords(self.line, 0, SPARK_HEIGHT, 0, SPARK_HEIGHT)
+            self.canvas.itemconfig(self.text, text=self.caption)
+            return
+        low, high = float(known.min()), float(known.max())
+        scale = (SPARK_HEIGHT - 4) / ((high - low) or 1.0)
+        xs = np.arange(SPARK_WIDTH - len(values), SPARK_WIDTH)
+        ys = SPARK_HEIGHT - 2 - (np.nan_to_num(values, nan=low) - low) * scale  # Unknown points at the bottom
+        self.canvas.coords(self.line, *np.column_stack((xs, ys)).ravel().tolist())
+        self.canvas.itemconfig(self.text, text=f"{self.caption} {known[-1]:.0f}")
+
+
+class AudioStreamerGUI:
+    def __init__(self, root, config_path=None):
+        self.root = root
+        self.root.title("Audio to Stream")
+        self.root.geometry("590x430")
+        self.root.resizable(False, False)
+        
+        # Apply dark theme
+        self.apply_dark_theme()
+        
+        self.vu_interval = VU_MIN_INTERVAL_MS
+        self.vu_last_tick = None
+        self.vu_due = None
+        self.device_list = []          # PortAudio ids of the combo entries
+        self.device_keys = []          # Their registry keys, which settings.ini stores
+        self.tuning = False
+        
+        # Per-second stats while streaming, for the sparklines and Export History
+        self.history = StatsHistory()
+        self.history_peak = 0.0        # Displayed meter level since the previous history sample
+        self.history_energy = 0.0
+        self.history_seconds = 0.0
+        
+        # Config file path
+        self.config_path = config_path
+        self.settings = load_settings(self.config_path)
+        
+        # Devices are enumerated in the background and watched for hot-plug. With capture_process the
+        # child watches and re-binds them; here they are only listed once and on Refresh, since every
+        # re-scan re-initialises PortAudio
+        self.devices = DeviceRegistry(interval=None if self.settings.capture_process else HOTPLUG_INTERVAL)
+        self.devices.add_listener(lambda added, removed: self.root.after(0, self.on_devices_changed, added, removed))
+
+        # Capture/encode pipeline; events from worker threads are marshalled onto the Tk loop.
+        # With capture_process it runs in a child process, which also serves the metrics
+        if self.settings.capture_process:
+            self.engine = ProcessEngine(self.settings, devices=self.devices)
+            self.metrics_exporters = []
+        else:
+            self.engine = StreamEngine(self.settings, devices=self.devices)
+            self.metrics_exporters = start_exporters(default_registry, self.settings.metrics_port,
+                                                     self.settings.metrics_jsonl, self.settings.metrics_interval)
+        self.engine.add_listener(self.on_engine_event)
+        
+        self.setup_ui()
+        self.load_settings()
+        self.status_var.set("Loading audio devices...")
+        self.devices.start()
+    
+    @property
+    def is_streaming(self):
+        return self.engine.is_streaming
+    
+    def apply_dark_theme(self):
+        """Apply a dark mode theme to the application"""
+        # Dark color palette
+        bg_dark = '#2b2b2b'
+        bg_darker = '#1e1e1e'
+        fg_color = '#e0e0e0'
+        accent_color = '#007acc'
+        border_color = '#3c3c3c'
+        
+        # Configure root window
+        self.root.configure(bg=bg_dark)
+        
+        # Create custom style
+        style = ttk.Style()
+        
+        # Configure TFrame
+        style.configure('TFrame', background=bg_dark)
+        
+        # Configure TLabel
+        style.configure('TLabel',
+                       background=bg_dark,
+                       foreground=fg_color,
+                       font=('Segoe UI', 9))
+        
+        # Configure TButton
+        style.configure('TButton',
+                       background='#2b2b2b',
+                       foreground='black',
+                       borderwidth=1,
+                       relief='raised',
+                       font=('Segoe UI', 9, 'bold'),
+                       padding=6)
+        style.map('TButton',
+                 background=[('active', '#2b2b2b'), ('pressed', '#c0c0c0'), ('disabled', '#d0d0d0')],
+                 foreground=[('active', 'black'), ('pressed', 'black'), ('disabled', '#808080')])
+        
+        # Configure TCombobox
+        style.configure('TCombobox',
+                       fieldbackground='white',
+                       background='white',
+                       foreground='black',
+                       arrowcolor='black',
+                       borderwidth=1,
+                       relief='solid',
+                       font=('Segoe UI', 9))
+        style.map('TCombobox',
+                 fieldbackground=[('readonly', 'white'), ('disabled', '#f0f0f0')],
+                 foreground=[('readonly', 'black'), ('disabled', '#808080')],
+                 selectbackground=[('readonly', accent_color)],
+                 selectforeground=[('readonly', 'white')])
+        
+        # Configure TEntry
+        style.configure('TEntry',
+                       fieldbackground='white',
+                       foreground='black',
+                       insertcolor='black',
+                       borderwidth=1,
+                       relief='solid',
+                       font=('Segoe UI', 9))
+        style.map('TEntry',
+                 fieldbackground=[('readonly', '#f0f0f0'), ('disabled', '#f0f0f0')],
+                 foreground=[('readonly', '#404040'), ('disabled', '#808080')])
+        
+        # Configure TCheckbutton
+        style.configure('TCheckbutton',
+                       background=bg_dark,
+                       foreground=fg_color,
+                       font=('Segoe UI', 9))
+        style.map('TCheckbutton', background=[('active', bg_dark)])
+        
+        # Store colors for later use
+        self.dark_bg = bg_dark
+        self.dark_bg_darker = bg_darker
+        self.dark_fg = fg_color
+        self.dark_accent = accent_color
+        self.dark_border = border_color
+        
+    def setup_ui(self):
+        # Main frame
+        main_frame = ttk.Frame(self.root, padding="10")
+        main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        icon_path = os.path.join(getattr(sys, '_MEIPASS', os.path.abspath('.')), "Icon.ico")
+        self.root.iconbitmap(icon_path)
+        self.root.title("Audio to Stream")
+
+        # Audio Source Selection
+        ttk.Label(main_frame, text="Audio Source:").grid(row=0, column=0, sticky=tk.W, pady=5)
+        self.device_var = tk.StringVar()
+        self.device_combo = ttk.Combobox(main_frame, textvariable=self.device_var, width=50, state='readonly')
+        self.device_combo.grid(row=0, column=1, pady=5, padx=5)
+        self.device_combo.bind('<<ComboboxSelected>>', self.on_device_selected)
+        
+        # Refresh button
+        ttk.Button(main_frame, text="Refresh", command=self.refresh_devices).grid(row=0, column=2, pady=5)
+        
+        # Bitrate and Sample Rate
+        ttk.Label(main_frame, text="Bitrate:").grid(row=1, column=0, sticky=tk.W, pady=5)
+        self.bitrate_var = tk.StringVar(value="192k")
+        self.bitrate_combo = ttk.Combobox(main_frame, textvariable=self.bitrate_var, width=10, state='readonly')
+        self.bitrate_combo['values'] = BITRATES
+        self.bitrate_combo.current(4)  # Default to 192k
+        self.bitrate_combo.grid(row=1, column=1, sticky=tk.W, pady=5, padx=(5, 10))
+        self.bitrate_combo.bind('<<ComboboxSelected>>', lambda e: self.save_settings())
+        
+        # Sample Rate
+        ttk.Label(main_frame, text="Sample Rate:").grid(row=1, column=1, sticky=tk.W, pady=5, padx=(120, 0))
+        self.samplerate_var = tk.StringVar(value="44.1kHz")
+        self.samplerate_combo = ttk.Combobox(main_frame, textvariable=self.samplerate_var, width=10, state='readonly')
+        self.samplerate_combo['values'] = tuple(SAMPLE_RATES)
+        self.samplerate_combo.current(0)  # Default to 44.1kHz
+        self.samplerate_combo.grid(row=1, column=1, sticky=tk.W, pady=5, padx=(210, 0))
+        self.samplerate_combo.bind('<<ComboboxSelected>>', lambda e: self.save_settings())
+        
+        # Codec (limits the sample rates offered, see apply_codec_constraints)
+        codec_frame = ttk.Frame(main_frame)
+        codec_frame.grid(row=1, column=2, sticky=tk.W, pady=5)
+        ttk.Label(codec_frame, text="Codec:").pack(side=tk.LEFT)
+        self.codec_var = tk.StringVar(value=CODEC_PROFILES['aac'].label)
+        self.codec_combo = ttk.Combobox(codec_frame, textvariable=self.codec_var, width=10, state='readonly')
+        self.codec_combo['values'] = tuple(profile.label for profile in CODEC_PROFILES.values())
+        self.codec_combo.current(0)  # Default to AAC-LC
+        self.codec_combo.pack(side=tk.LEFT, padx=(5, 0))
+        self.codec_combo.bind('<<ComboboxSelected>>', self.on_codec_selected)
+        
+        # Stream URL
+        ttk.Label(main_frame, text="Stream URL:").grid(row=2, column=0, sticky=tk.W, pady=5)
+        self.url_var = tk.StringVar(value="srt://localhost:9000")
+        url_entry = ttk.Entry(main_frame, textvariable=self.url_var, width=50)
+        url_entry.grid(row=2, column=1, pady=5, padx=5, columnspan=2)
+        url_entry.bind('<FocusOut>', lambda e: self.save_settings())
+        url_entry.bind('<Return>', lambda e: self.save_settings())
+        
+        # VU Meter Label
+        ttk.Label(main_frame, text="Audio Levels:").grid(row=3, column=0, sticky=tk.W, pady=10)
+        
+        # DSP chain (high-pass, gain, limiter from settings.ini) and which side of it the meters show
+        dsp_frame = ttk.Frame(main_frame)
+        dsp_frame.grid(row=3, column=1, sticky=tk.W, padx=5)
+        self.dsp_var = tk.BooleanVar(value=False)
+        self.dsp_check = ttk.Checkbutton(dsp_frame, text="DSP", variable=self.dsp_var, command=self.save_settings)
+        self.dsp_check.pack(side=tk.LEFT)
+        self.meter_post_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(dsp_frame, text="Meter after DSP", variable=self.meter_post_var).pack(side=tk.LEFT, padx=10)
+        
+        # VU Meter Frame
+        vu_frame = ttk.Frame(main_frame)
+        vu_frame.grid(row=4, column=0, columnspan=3, pady=5, sticky=(tk.W, tk.E))
+        
+        # Left Channel
+        ttk.Label(vu_frame, text="L:").pack(side=tk.LEFT, padx=5)
+        self.vu_left = tk.Canvas(vu_frame, width=VU_WIDTH, height=VU_HEIGHT, bg='#1e1e1e', highlightthickness=1, highlightbackground='#3c3c3c')
+        self.vu_left.pack(side=tk.LEFT, padx=5)
+        
+        # Right Channel
+        vu_frame2 = ttk.Frame(main_frame)
+        vu_frame2.grid(row=5, column=0, columnspan=3, pady=5, sticky=(tk.W, tk.E))
+        ttk.Label(vu_frame2, text="R:").pack(side=tk.LEFT, padx=5)
+        self.vu_right = tk.Canvas(vu_frame2, width=VU_WIDTH, height=VU_HEIGHT, bg='#1e1e1e', highlightthickness=1, highlightbackground='#3c3c3c')
+        self.vu_right.pack(side=tk.LEFT, padx=5)
+        self.vu_channels = [VuChannel(self.vu_left), VuChannel(self.vu_right)]
+        
+        # Control Buttons
+        button_frame = ttk.Frame(main_frame)
+        button_frame.grid(row=6, column=0, columnspan=3, pady=20)
+        
+        self.start_button = ttk.Button(button_frame, text="Start Streaming", command=self.start_streaming, width=20)
+        self.start_button.pack(side=tk.LEFT, padx=5)
+        
+        self.stop_button = ttk.Button(button_frame, text="Stop Streaming", command=self.stop_streaming, width=20, state=tk.DISABLED)
+        self.stop_button.pack(side=tk.LEFT, padx=5)
+        
+        # Auto-reconnect keeps the device open and restarts FFmpeg after a failure
+        self.reconnect_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(button_frame, text="Auto-reconnect", variable=self.reconnect_var,
+                        command=self.save_settings).pack(side=tk.LEFT, padx=5)
+        
+        # Adaptive bitrate steps down from the selected bitrate while the network is congested
+        self.adaptive_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(button_frame, text="Adaptive bitrate", variable=self.adaptive_var,
+                        command=self.save_settings).pack(side=tk.LEFT, padx=5)
+        
+        # Keeps a local copy in rotating segments (record_format in settings.ini: ts or pcm)
+        self.record_var = tk.BooleanVar(value=False)
+        self.record_check = ttk.Checkbutton(button_frame, text="Record", variable=self.record_var,
+                                            command=self.save_settings)
+        self.record_check.pack(side=tk.LEFT, padx=5)
+        
+        # Probes the device for its lowest stable blocksize
+        self.tune_button = ttk.Button(button_frame, text="Tune", command=self.tune_capture, width=6)
+        self.tune_button.pack(side=tk.LEFT, padx=5)
+        
+        # Status Label
+        self.status_var = tk.StringVar(value="Ready")
+        status_label = tk.Label(main_frame, textvariable=self.status_var, relief=tk.SUNKEN, anchor=tk.W,
+                               bg='#1e1e1e', fg='#e0e0e0', font=('Segoe UI', 9))
+        status_label.grid(row=7, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=10)
+        
+        # FFmpeg Stats Label
+        self.stats_var = tk.StringVar(value="")
+        stats_label = tk.Label(main_frame, textvariable=self.stats_var, font=('Consolas', 8, 'bold'), anchor=tk.W,
+                              bg='#2b2b2b', fg='#00d700')
+        stats_label.grid(row=8, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(0, 5))
+        
+        # Stats history: the last few minutes as sparklines, everything kept via Export History
+        history_frame = ttk.Frame(main_frame)
+        history_frame.grid(row=9, column=0, columnspan=3, sticky=(tk.W, tk.E))
+        self.sparklines = []
+        for metric, caption in SPARK_METRICS:
+            canvas = tk.Canvas(history_frame, width=SPARK_WIDTH, height=SPARK_HEIGHT, bg='#1e1e1e',
+                               highlightthickness=1, highlightbackground='#3c3c3c')
+            canvas.pack(side=tk.LEFT, padx=(0, 5))
+            self.sparklines.append(Sparkline(canvas, metric, caption))
+        ttk.Button(history_frame, text="Export", command=self.export_history, width=7).pack(side=tk.LEFT)
+        
+        # Start VU meter update
+        self.update_vu_meters()
+        
+    def refresh_devices(self):
+        """Enumerate again in the background; hardware changes are only seen when not streaming
+
+        A re-scan re-opens every device, which would put a gap in the stream.
+        """
+        if not self.is_streaming and not self.tuning:
+            self.engine.stop_monitor()
+        self.status_var.set("Refreshing audio devices...")
+        self.devices.refresh_async(rescan=not self.is_streaming)
+    
+    def on_devices_changed(self, added, removed):
+        """Registry listener (on the Tk loop): refill the list, keeping the selected device by key"""
+        if added or removed or not self.device_keys:
+            first = not self.device_keys
+            selected = self.device_combo.current()
+            key = self.device_keys[selected] if selected >= 0 else self.settings.audio_device_key
+            devices = self.devices.devices
+            self.device_list = [device.index for device in devices]
+            self.device_keys = [device.key for device in devices]
+            self.device_combo['values'] = [f"{device.index}: {device.name}" for device in devices]
+            if key in self.device_keys:
+                self.device_combo.current(self.device_keys.index(key))
+            elif first and 0 <= self.settings.audio_device < len(devices):
+                self.device_combo.current(self.settings.audio_device)
+            elif devices and first:
+                self.device_combo.current(0)
+            else:
+                self.device_combo.set('')
+            if first:
+                self.status_var.set("Ready" if devices else "No audio input devices found")
+            elif added or removed:
+                changes = [f"+{device.name}" for device in added] + [f"-{device.name}" for device in removed]
+                self.status_var.set(f"Audio devices changed: {', '.join(changes)}")
+        # Monitoring resumes after a refresh, or once the selected device is back
+        if not self.is_streaming and not self.tuning and self.engine.capture is None:
+            self.on_device_selected()
+    
+    def sync_settings(self):
+        """Copy the current widget values into self.settings"""
+        selected = self.device_combo.current()
+        if selected >= 0:
+            self.settings.audio_device = selected
+            self.settings.audio_device_key = self.device_keys[selected]
+        self.settings.bitrate = self.bitrate_var.get().strip()
+        self.settings.codec = self.selected_codec()
+        self.settings.stream_url = self.url_var.get().strip()
+        self.settings.sample_rate = self.get_sample_rate_value()
+        self.settings.auto_reconnect = self.reconnect_var.get()
+        self.settings.adaptive_bitrate = self.adaptive_var.get()
+        self.settings.record = self.record_var.get()
+        self.settings.dsp = self.dsp_var.get()
+        return self.settings
+    
+    def save_settings(self):
+        """Save current settings to INI file"""
+        save_settings(self.sync_settings(), self.config_path)
+    
+    def load_settings(self):
+        """Apply settings loaded from the INI file to the widgets"""
+        settings = self.settings
+        try:
+            # Load bitrate
+            self.bitrate_var.set(settings.bitrate)
+            # Set combo box index
+            try:
+                idx = self.bitrate_combo['values'].index(settings.bitrate)
+                self.bitrate_combo.current(idx)
+            except ValueError:
+                pass
+            
+            self.codec_var.set(settings.codec_profile().label)
+            
+            # Load stream URL
+            self.url_var.set(settings.stream_url)
+            self.reconnect_var.set(settings.auto_reconnect)
+            self.adaptive_var.set(settings.adaptive_bitrate)
+            self.record_var.set(settings.record)
+            self.dsp_var.set(settings.dsp)
+            
+            # Load sample rate
+            samplerate = sample_rate_label(settings.sample_rate)
+            self.samplerate_var.set(samplerate)
+            # Set combo box index
+            try:
+                idx = self.samplerate_combo['values'].index(samplerate)
+                self.samplerate_combo.current(idx)
+            except ValueError:
+                pass
+            self.apply_codec_constraints()
+            # The audio device is selected by on_devices_changed() once the devices are listed
+        except Exception as e:
+            print(f"Error loading settings: {e}")
+    
+    def get_sample_rate_value(self):
+        """Convert sample rate string to integer value"""
+        return parse_sample_rate(self.samplerate_var.get())
+    
+    def selected_codec(self):
+        """Codec profile name for the codec combo box label"""
+        for name, profile in CODEC_PROFILES.items():
+            if profile.label == self.codec_var.get():
+                return name
+        return 'aac'
+    
+    def apply_codec_constraints(self):
+        """Offer only the sample rates the codec encodes without resampling, and bitrates if it uses one"""
+        profile = CODEC_PROFILES[self.selected_codec()]
+        rates = profile.native_rates(SAMPLE_RATES.values())
+        self.samplerate_combo['values'] = tuple(sample_rate_label(rate) for rate in rates)
+        current = self.get_sample_rate_value()
+        if current not in rates:
+            # e.g. Opus and PCM only run at 48 kHz
+            self.samplerate_var.set(sample_rate_label(profile.encode_rate(current)))
+        self.bitrate_combo.config(state='readonly' if profile.uses_bitrate else tk.DISABLED)
+    
+    def on_codec_selected(self, event=None):
+        self.apply_codec_constraints()
+        self.save_settings()
+    
+    def on_device_selected(self, event=None):
+        """Start monitoring audio when device is selected"""
+        # Save settings when device changes
+        if event:  # Only save if triggered by user action
+            self.save_settings()
+        
+        # Don't start monitoring if already streaming or while the device is being tuned
+        if self.is_streaming or self.tuning:
+            return
+        
+        # Get selected device
+        selected_idx = self.device_combo.current()
+        if selected_idx < 0:
+            self.engine.stop_monitor()
+            return
+        
+        device_id = self.device_list[selected_idx]
+        
+        try:
+            # Start monitoring stream (VU meter only, no FFmpeg)
+            self.sync_settings()
+            self.engine.start_monitor(device_id)
+        except Exception as e:
+            self.status_var.set(f"Error monitoring: {str(e)}")
+    
+    def tune_capture(self):
+        """Probe blocksizes on the selected device in the background and store the lowest stable one"""
+        if self.is_streaming or self.tuning:
+            return
+        selected_idx = self.device_combo.current()
+        if selected_idx < 0:
+            messagebox.showerror("Error", "Please select an audio source")
+            return
+        device_id = self.device_list[selected_idx]
+        settings = self.sync_settings()
+        
+        # The probe opens the device itself
+        self.engine.stop_monitor()
+        self.tuning = True
+        self.start_button.config(state=tk.DISABLED)
+        self.tune_button.config(state=tk.DISABLED)
+        self.device_combo.config(state=tk.DISABLED)
+        self.status_var.set("Tuning capture...")
+        threading.Thread(target=self._run_tune, args=(device_id, settings.sample_rate, settings.channels),
+                         daemon=True, name="CaptureTuning").start()
+    
+    def _run_tune(self, device_id, sample_rate, channels):
+        def progress(result):
+            state = 'stable' if result.stable else 'unstable'
+            self.root.after(0, self.status_var.set,
+                            f"Tuning capture: {result.blocksize} frames {state} (jitter {result.jitter_ms:.1f} ms)")
+        try:
+            best, _ = tune_capture(device_id, sample_rate, channels, on_result=progress)
+        except Exception as e:
+            print(f"Error tuning capture: {e}")
+            best = None
+        self.root.after(0, self.finish_tune, device_id, best)
+    
+    def finish_tune(self, device_id, best):
+        """Store the tuning result and resume monitoring (Tk thread)"""
+        self.tuning = False
+        self.start_button.config(state=tk.NORMAL)
+        self.tune_button.config(state=tk.NORMAL)
+        self.device_combo.config(state='readonly')
+        device = self.devices.get(device_id)
+        name = device.label if device else None
+        if best and name:
+            save_capture_tuning(self.settings, name, best.blocksize, TUNE_LATENCY, self.config_path)
+            self.settings.capture_autotune = True
+            self.save_settings()
+            self.status_var.set(f"Capture tuned: {best.blocksize} frames ({best.period_ms:.1f} ms)")
+        else:
+            self.status_var.set("Tuning found no stable blocksize; using device defaults")
+        self.on_device_selected()
+    
+    def on_engine_event(self, event, message):
+        """Engine listener; may be called from a worker thread"""
+        if event == 'disconnected':
+            # Schedule UI update on main thread
+            self.root.after(0, self.handle_client_disconnect, message)
+        elif event in ('monitoring', 'reconnecting'):
+            self.root.after(0, self.status_var.set, message)
+        elif event == 'ready':
+            self.root.after(0, self.status_var.set, f"Streaming to {self.settings.stream_url} ({message})")
+        elif event == 'bitrate_changed':
+            self.root.after(0, self.status_var.set, f"Streaming to {self.settings.stream_url} ({message})")
+        elif event == 'reconnected':
+            self.root.after(0, self.status_var.set, f"Streaming to {self.settings.stream_url} ({message})")
+        elif event in ('device_lost', 'device_restored'):
+            self.root.after(0, self.status_var.set, message)
+    
+    def handle_client_disconnect(self, message="Disconnected - Client closed connection"):
+        """Handle client disconnection reported by the engine"""
+        self.status_var.set(message)
+        self.start_button.config(state=tk.NORMAL)
+        self.stop_button.config(state=tk.DISABLED)
+        self.device_combo.config(state='readonly')
+        self.codec_combo.config(state='readonly')
+        self.record_check.config(state=tk.NORMAL)
+        self.dsp_check.config(state=tk.NORMAL)
+        self.stats_var.set("")
+        # Restart monitoring
+        self.on_device_selected()
+                
+    def start_streaming(self):
+        """Start the audio streaming"""
+        if self.tuning:
+            return
+        # Get selected device
+        selected_idx = self.device_combo.current()
+        if selected_idx < 0:
+            messagebox.showerror("Error", "Please select an audio source")
+            return
+            
+        device_id = self.device_list[selected_idx]
+        settings = self.sync_settings()
+        
+        if not settings.stream_url:
+            messagebox.showerror("Error", "Please enter a stream URL")
+            return
+        
+        # Start FFmpeg process with low-latency configuration
+        self.stats_var.set("Initializing FFmpeg...")
+        
+        try:
+            self.engine.start(device_id)
+        except StreamError as e:
+            self.status_var.set(f"Error starting stream: {str(e)}")
+            self.stats_var.set("")
+            return
+        
+        self.start_button.config(state=tk.DISABLED)
+        self.stop_button.config(state=tk.NORMAL)
+        self.device_combo.config(state=tk.DISABLED)
+        self.codec_combo.config(state=tk.DISABLED)
+        self.record_check.config(state=tk.DISABLED)
+        self.dsp_check.config(state=tk.DISABLED)
+        self.status_var.set(f"Streaming to {settings.stream_url}")
+        
+        # Start stats updates AFTER is_streaming is set
+        self.root.after(500, self.update_stream_stats)
+
+    def stop_streaming(self):
+        """Stop the audio streaming"""
+        self.engine.stop()
+        self.start_button.config(state=tk.NORMAL)
+        self.stop_button.config(state=tk.DISABLED)
+        self.device_combo.config(state='readonly')
+        self.codec_combo.config(state='readonly')
+        self.record_check.config(state=tk.NORMAL)
+        self.dsp_check.config(state=tk.NORMAL)
+        self.status_var.set("Stopped")
+        self.stats_var.set("")
+        
+        # Restart monitoring
+        self.on_device_selected()
+            
+    def update_stream_stats(self):
+        """Update streaming statistics periodically"""
+        if self.is_streaming:
+            try:
+                stats = self.engine.stats()
+                self.stats_var.set(stats.summary())
+                self.record_history(stats)
+            except Exception as e:
+                print(f"Error updating stats: {e}")
+            
+            # Schedule next update - continue as long as streaming
+            self.root.after(1000, self.update_stream_stats)
+    
+    def record_history(self, stats):
+        """Add a stats sample and the displayed level since the previous one, and redraw the sparklines"""
+        seconds = self.history_seconds
+        rms = (self.history_energy / seconds) ** 0.5 if seconds else None
+        self.history.add_stats(stats, self.history_peak if seconds else None, rms)
+        self.history_peak = self.history_energy = self.history_seconds = 0.0
+        for sparkline in self.sparklines:
+            sparkline.draw(self.history.series(sparkline.metric)[1])
+
+    def export_history(self):
+        """Save the stats history as CSV or JSON (by extension)"""
+        path = filedialog.asksaveasfilename(title="Export stats history", defaultextension='.csv',
+                                            filetypes=[("CSV", "*.csv"), ("JSON", "*.json")])
+        if not path:
+            return
+        try:
+            self.history.export(path)
+            self.status_var.set(f"Stats history exported to {path}")
+        except OSError as e:
+            self.status_var.set(f"Error exporting stats history: {e}")
+
+    def update_vu_meters(self):
+        """Advance the meter ballistics and redraw, at a rate that adapts to load"""
+        started = perf_counter()
+        elapsed = started - self.vu_last_tick if self.vu_last_tick else self.vu_interval / 1000
+        self.vu_last_tick = started
+
+        # Peak and RMS of every block captured since the previous tick; after the DSP only while it runs
+        meter = self.engine.level_meter
+        if self.meter_post_var.get() and self.engine.dsp is not None:
+            meter = self.engine.output_meter
+        peaks, levels = meter.snapshot()
+        if self.is_streaming:
+            self.history_peak = max(self.history_peak, *peaks)
+            self.history_energy += sum(level * level for level in levels) / len(levels) * elapsed
+            self.history_seconds += elapsed
+        changed = False
+        for index, channel in enumerate(self.vu_channels):
+            index = min(index, len(peaks) - 1)  # Mono sources drive both meters
+            channel.ballistics.update(peaks[index], levels[index], elapsed)
+            changed |= channel.draw()
+
+        # Back off when the Tk loop runs late or the tick is expensive, and when
+        # nothing moved; return to full rate as soon as the meters move again
+        cost_ms = (perf_counter() - started) * 1000
+        late_ms = (started - self.vu_due) * 1000 if self.vu_due else 0.0
+        if late_ms > self.vu_interval or cost_ms > self.vu_interval * 0.1 or not changed:
+            self.vu_interval = min(self.vu_interval * 1.5, VU_MAX_INTERVAL_MS)
+        else:
+            self.vu_interval = VU_MIN_INTERVAL_MS
+        self.vu_due = perf_counter() + self.vu_interval / 1000
+            
+        # Schedule next update
+        self.root.after(int(self.vu_interval), self.update_vu_meters)
+        
+    def close(self):
+        """Save settings, stop the engine and metrics exporters, and close the window"""
+        self.save_settings()
+        self.devices.stop()
+        self.engine.close()
+        for exporter in self.metrics_exporters:
+            exporter.stop()
+        self.root.destroy()
+        
+    def on_closing(self):
+        """Handle window closing"""
+        if self.is_streaming:
+            if messagebox.askokcancel("Quit", "Streaming is active. Do you want to stop and quit?"):
+                self.close()
+        else:
+            self.close()
@@ -0,0 +1,196 @@
+"""Bounded time-series history of stream stats at several resolutions
+
+The stats line only ever shows the current second. StatsHistory keeps what
+came before, for sparklines and for looking back after an incident: one
+fixed-size NumPy ring per resolution, RESOLUTIONS by default (an hour at
+1 s, six hours at 10 s and a day at 1 min), allocated once and about 310 KB
+for all of them however long the application runs.
+
+Each sample is folded into the current bucket of every ring, and the bucket
+becomes a row once a sample falls into the next one. A row holds the mean,
+the maximum or the last value of its samples, depending on the metric.
+Cumulative counters keep their last value, so a coarse row still shows the
+totals at its end. The bucket still being filled is included when reading,
+so exports and sparklines reach the latest sample. A metric that is unknown
+in a sample (the encoder's speed before its first report) is NaN and left
+out of the bucket.
+"""
+import csv
+import json
+import math
+import re
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+import numpy as np
+
+from .levels import FLOOR_DB, to_dbfs
+
+
+@dataclass(frozen=True)
+class HistoryMetric:
+    """One column of the history"""
+    name: str
+    label: str                         # Readable name, exported with the JSON history
+    aggregate: str = 'mean'            # How a bucket combines its samples: mean, max or last
+
+
+HISTORY_METRICS = (
+    HistoryMetric('bitrate_kbps', 'Bitrate (kbit/s)'),
+    HistoryMetric('speed', 'Encoder speed (x)'),
+    HistoryMetric('buffer_ms', 'Buffered (ms)', 'max'),
+    HistoryMetric('peak_db', 'Peak (dBFS)', 'max'),
+    HistoryMetric('rms_db', 'RMS (dBFS)'),
+    HistoryMetric('drift_ppm', 'Drift (ppm)', 'last'),
+    HistoryMetric('overflows', 'Ring overflows', 'last'),
+    HistoryMetric('dropped_frames', 'Dropped frames', 'last'),
+    HistoryMetric('reconnects', 'Reconnects', 'last'),
+)
+
+RESOLUTIONS = ((1, 3600), (10, 2160), (60, 1440))   # (seconds per row, rows kept)
+
+_KBITS_RE = re.compile(r'([\d.]+)\s*kbits/s')
+
+
+def _kbits(text):
+    """FFmpeg's '273.9kbits/s' as a float, NaN if it is not a bitrate (yet)"""
+    match = _KBITS_RE.search(text or '')
+    return float(match.group(1)) if match else math.nan
+
+
+class HistoryRing:
+    """Rows of one resolution, oldest overwritten first"""
+
+    def __init__(self, resolution, slots, metrics=HISTORY_METRICS):
+        self.resolution = resolution
+        self.slots = slots
+        self.count = 0                 # Rows written
+        self.times = np.zeros(slots, dtype=np.float64)                    # Bucket start, Unix seconds
+        self.values = np.full((slots, len(metrics)), np.nan, dtype=np.float32)
+        self._mean = np.array([m.aggregate == 'mean' for m in metrics])
+        self._max = np.array([m.aggregate == 'max' for m in metrics])
+        self._bucket = None
+        self._sums = np.zeros(len(metrics), dtype=np.float64)
+        self._counts = np.zeros(len(metrics), dtype=np.int64)
+        self._peaks = np.full(len(metrics), -np.inf, dtype=np.float64)
+        self._lasts = np.full(len(metrics), np.nan, dtype=np.float64)
+
+    def add(self, now, values):
+        """Fold a sample (float64 array, NaN = unknown) taken at Unix time now"""
+        bucket = int(now // self.resolution)
+        if self._bucket is not None and bucket != self._bucket:
+            self._flush()
+        self._bucket = bucket
+        known = ~np.isnan(values)
+        self._sums[known] += values[known]
+        self._counts[known] += 1
+        np.fmax(self._peaks, values, out=self._peaks)
+        self._lasts[known] = values[known]
+
+    def _aggregate(self):
+        """Row of the current bucket"""
+        counts = self._counts
+        row = np.where(self._mean, self._sums / np.maximum(counts, 1), np.where(self._max, self._peaks, self._lasts))
+        row[counts == 0] = np.nan
+        return row
+
+    def _flush(self):
+        index = self.count % self.slots
+        self.values[index] = self._aggregate()
+        self.times[index] = self._bucket * self.resolution
+        self.count += 1
+        self._sums.fill(0.0)
+        self._counts.fill(0)
+        self._peaks.fill(-np.inf)
+        self._lasts.fill(np.nan)
+
+    def rows(self):
+        """(times, values) of the rows kept and the current bucket, oldest first (copies)"""
+        kept = min(self.count, self.slots)
+        order = np.arange(self.count - kept, self.count) % self.slots
+        times, values = self.times[order], self.values[order]
+        if self._bucket is not None:
+            start = 1 if kept == self.slots else 0  # Still no more than slots rows
+            times = np.append(times[start:], self._bucket * self.resolution)
+            values = np.vstack((values[start:], self._aggregate().astype(np.float32)))
+        return times, values
+
+
+class StatsHistory:
+    """Per-second StreamStats samples, kept at RESOLUTIONS
+
+    Not thread-safe: add and read from one thread (the GUI's Tk loop, or the
+    headless main loop).
+    """
+
+    def __init__(self, metrics=HISTORY_METRICS, resolutions=RESOLUTIONS):
+        self.metrics = tuple(metrics)
+        self.rings = [HistoryRing(resolution, slots, self.metrics) for resolution, slots in resolutions]
+        self._index = {metric.name: i for i, metric in enumerate(self.metrics)}
+
+    def add(self, sample, now=None):
+        """Record {metric name: value}; missing names and None are unknown"""
+        now = time.time() if now is None else now
+        values = np.array([math.nan if sample.get(m.name) is None else sample[m.name] for m in self.metrics],
+                          dtype=np.float64)
+        for ring in self.rings:
+            ring.add(now, values)
+
+    def add_stats(self, stats, peak=None, rms=None, now=None):
+        """Record a StreamStats, with the linear peak and RMS level since the previous sample if known"""
+        self.add({
+            'bitrate_kbps': _kbits(stats.output_bitrate),
+            'speed': stats.speed,
+            'buffer_ms': stats.buffer_ms,
+            'peak_db': to_dbfs(peak, FLOOR_DB) if peak is not None else None,
+            'rms_db': to_dbfs(rms, FLOOR_DB) if rms is not None else None,
+            'drift_ppm': stats.drift_ppm,
+            'overflows': stats.overflows,
+            'dropped_frames': stats.dropped_frames,
+            'reconnects': stats.reconnects,
+        }, now)
+
+    def ring(self, resolution=None):
+        """The ring of resolution seconds, the finest without one"""
+        if resolution is None:
+            return self.rings[0]
+        for ring in self.rings:
+            if ring.resolution == resolution:
+                return ring
+        raise ValueError(f"No {resolution} s history")
+
+    def series(self, name, resolution=None):
+        """(times, values) of one metric, oldest first"""
+        times, values = self.ring(resolution).rows()
+        return times, values[:, self._index[name]]
+
+    def to_dict(self):
+        """Every ring as {'metrics': [...], 'resolutions': {seconds: {'time': [...], name: [...]}}}, NaN as None"""
+        resolutions = {}
+        for ring in self.rings:
+            times, values = ring.rows()
+            columns = {'time': times.tolist()}
+            for i, metric in enumerate(self.metrics):
+                columns[metric.name] = [None if math.isnan(v) else round(v, 3) for v in values[:, i].tolist()]
+            resolutions[str(ring.resolution)] = columns
+        return {
+            'metrics': [{'name': m.name, 'label': m.label, 'aggregate': m.aggregate} for m in self.metrics],
+            'resolutions': resolutions,
+        }
+
+    def export(self, path):
+        """Write the history to path: JSON for a .json path, else CSV (one row per ring row, coarsest first)"""
+        if path.lower().endswith('.json'):
+            with open(path, 'w') as f:
+                json.dump(self.to_dict(), f)
+            return
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['resolution_s', 'time', 'utc'] + [m.name for m in self.metrics])
+            for ring in reversed(self.rings):
+                times, values = ring.rows()
+                for when, row in zip(times.tolist(), values.tolist()):
+                    utc = datetime.fromtimestamp(when, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+                    writer.writerow([ring.resolution, f"{when:.0f}", utc]
+                                    + ['' if math.isnan(v) else f"{v:.6g}" for v in row])
@@ -0,0 +1,318 @@
+"""End-to-end latency measurement through the real pipeline, without a sound card
+
+A ClickSource feeds a StreamEngine with a tone burst every interval and
+records when each one was captured. The stream goes to a receiver on
+localhost (FFmpeg, or PyAV when the FFmpeg build cannot decode) that
+decodes it and writes raw PCM back over a pipe. The harness timestamps that
+PCM as it arrives, so capture and decode times come from the same
+monotonic clock. The difference is the capture-to-decode latency, including
+the ring buffer, the encoder, muxing, the network protocol and the receiver's
+decoder.
+
+Run it with benchmarks/bench_latency.py.
+"""
+import math
+import os
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from .capture import SyntheticSource
+from .engine import StreamEngine
+from .ffmpeg import get_ffmpeg_path
+
+CLICK_SECONDS = 0.02               # Tone burst length
+CLICK_HZ = 2000.0
+CLICK_AMPLITUDE = 0.7
+CLICK_THRESHOLD = 0.3              # Decoded level that counts as a click
+RECEIVER_STARTUP_SECONDS = 1.0     # Time for a receiver to start listening before the sender connects
+
+PROTOCOLS = ('udp', 'srt')
+RECEIVERS = ('ffmpeg', 'pyav')
+
+
+class ClickSource(SyntheticSource):
+    """SyntheticSource that plays a tone burst every interval and records each capture time
+
+    A synthetic block is delivered when its last sample is due, so a click
+    starting at offset k of a block was captured (blocksize - k) / rate
+    before the callback; onsets holds those time.monotonic() values.
+    """
+
+    def __init__(self, sample_rate, channels, callback, interval=1.0, blocksize=512):
+        super().__init__(sample_rate, channels, self._deliver, signal='silence', blocksize=blocksize)
+        self.deliver = callback
+        self.interval_frames = int(interval * sample_rate)
+        self.click_frames = int(CLICK_SECONDS * sample_rate)
+        self.onsets = []
+        self._onset_offset = None
+
+    def _fill(self):
+        start = self.frames_generated
+        position = (start + self._ramp) % self.interval_frames
+        wave = np.where(position < self.click_frames,
+                        CLICK_AMPLITUDE * np.sin(2.0 * np.pi * CLICK_HZ * position / self.samplerate), 0.0)
+        self._block[:] = wave[:, None]
+        offset = -start % self.interval_frames
+        self._onset_offset = offset if offset < self.blocksize else None
+
+    def _deliver(self, indata, frames, time_info, status):
+        if self._onset_offset is not None:
+            self.onsets.append(time_info.inputBufferAdcTime - (frames - self._onset_offset) / self.samplerate)
+        self.deliver(indata, frames, time_info, status)
+
+
+class ClickDetector:
+    """Finds click onsets in interleaved float32 PCM and notes when each arrived
+
+    feed() takes arbitrary byte chunks. A click is the first loud sample
+    after at least rearm_seconds of quiet, so one burst counts once.
+    """
+
+    def __init__(self, sample_rate, channels, threshold=CLICK_THRESHOLD, rearm_seconds=0.25):
+        self.frame_bytes = 4 * channels
+        self.channels = channels
+        self.threshold = threshold
+        self.rearm_frames = int(rearm_seconds * sample_rate)
+        self.arrivals = []
+        self._pending = b''
+        self._frames = 0
+        self._last_loud = -self.rearm_frames
+
+    def feed(self, chunk, arrived_at):
+        data = self._pending + chunk
+        usable = len(data) - len(data) % self.frame_bytes
+        self._pending = data[usable:]
+        if not usable:
+            return
+        samples = np.frombuffer(data[:usable], dtype=np.float32).reshape(-1, self.channels)
+        loud = np.flatnonzero(np.abs(samples).max(axis=1) > self.threshold)
+        if len(loud):
+            first = self._frames + int(loud[0])
+            if first - self._last_loud > self.rearm_frames:
+                self.arrivals.append(arrived_at)
+            self._last_loud = self._frames + int(loud[-1])
+        self._frames += len(samples)
+
+
+class Receiver:
+    """Child process that decodes the stream from url and writes f32le PCM to stdout"""
+
+    def __init__(self, url, sample_rate, channels):
+        self.url = url
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.detector = ClickDetector(sample_rate, channels)
+        self.proc = None
+        self._thread = None
+
+    def command(self):
+        raise NotImplementedError
+
+    def environment(self):
+        return None
+
+    def start(self):
+        self.proc = subprocess.Popen(self.command(), stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                     env=self.environment(), bufsize=0)
+        self._thread = threading.Thread(target=self._read, daemon=True, name="LatencyReceiver")
+        self._thread.start()
+
+    def _read(self):
+        stdout = self.proc.stdout
+        while True:
+            chunk = stdout.read(4096)
+            if not chunk:
+                break
+            self.detector.feed(chunk, time.monotonic())
+
+    def stop(self):
+        if self.proc:
+            if self.proc.poll() is not None:
+                print(f"Latency receiver exited early (exit code {self.proc.returncode})")
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+        if self._thread:
+            self._thread.join(2)
+
+    @property
+    def arrivals(self):
+        return self.detector.arrivals
+
+
+class FFmpegReceiver(Receiver):
+    """ffmpeg decoding with its input buffering disabled"""
+
+    def __init__(self, url, sample_rate, channels, ffmpeg_exe=None):
+        super().__init__(url, sample_rate, channels)
+        self.ffmpeg_exe = ffmpeg_exe or get_ffmpeg_path()
+
+    def command(self):
+        return [self.ffmpeg_exe, '-hide_banner', '-loglevel', 'error',
+                '-fflags', 'nobuffer', '-flags', 'low_delay',
+                '-probesize', '16384', '-analyzeduration', '0',
+                '-i', self.url,
+                '-f', 'f32le', '-ac', str(self.channels), '-ar', str(self.sample_rate), 'pipe:1']
+
+
+class PyAVReceiver(Receiver):
+    """PyAV decoding in a child Python (this module's __main__); UDP only with PyPI builds, which lack libsrt"""
+
+    def command(self):
+        return [sys.executable, '-m', 'audiostream.latency', self.url, str(self.sample_rate), str(self.channels)]
+
+    def environment(self):
+        env = dict(os.environ)
+        package_parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [package_parent, env.get('PYTHONPATH')]))
+        return env
+
+
+def _pyav_receive(url, sample_rate, channels):
+    """PyAVReceiver's child: decode url and write interleaved float32 to stdout"""
+    import av
+
+    container = av.open(url, format='mpegts', options={'probesize': '2048', 'analyzeduration': '0',
+                                                       'fflags': 'nobuffer'}, timeout=(30.0, 5.0))
+    resampler = av.AudioResampler(format='flt', layout='mono' if channels == 1 else 'stereo', rate=sample_rate)
+    out = sys.stdout.buffer
+    try:
+        for frame in container.decode(audio=0):
+            for converted in resampler.resample(frame):
+                out.write(converted.to_ndarray().tobytes())
+            out.flush()
+    except (av.error.FFmpegError, OSError, BrokenPipeError):
+        pass  # Sender stopped (read timeout) or the harness closed the pipe
+
+
+@dataclass
+class LatencyReport:
+    """Capture-to-decode latency of the clicks sent while measuring"""
+    latencies_ms: list = field(default_factory=list)
+    clicks: int = 0                    # Clicks captured while measuring
+    first_packet_ms: float = None
+
+    @property
+    def missed(self):
+        return self.clicks - len(self.latencies_ms)
+
+    def percentile(self, p):
+        values = sorted(self.latencies_ms)
+        if not values:
+            return math.nan
+        return values[min(int(len(values) * p / 100), len(values) - 1)]
+
+    def to_dict(self):
+        return {
+            'clicks': self.clicks,
+            'received': len(self.latencies_ms),
+            'p50_ms': self.percentile(50),
+            'p90_ms': self.percentile(90),
+            'p99_ms': self.percentile(99),
+            'max_ms': max(self.latencies_ms) if self.latencies_ms else math.nan,
+            'first_packet_ms': self.first_packet_ms,
+        }
+
+    def summary(self):
+        d = self.to_dict()
+        return (f"p50 {d['p50_ms']:.1f} ms, p90 {d['p90_ms']:.1f} ms, p99 {d['p99_ms']:.1f} ms, "
+                f"max {d['max_ms']:.1f} ms ({d['received']}/{d['clicks']} clicks)")
+
+
+class LatencyHarness:
+    """A StreamEngine fed by a ClickSource, streaming to a local receiver
+
+    settings supplies the encoder, buffering and SRT options; its
+    destinations are replaced by one localhost URL for protocol. The sender
+    is an SRT caller and the receiver a listener with the same latency.
+    """
+
+    def __init__(self, settings, protocol='udp', port=19200, receiver='ffmpeg', interval=1.0, blocksize=512,
+                 ffmpeg_exe=None, metrics=None):
+        if protocol not in PROTOCOLS:
+            raise ValueError(f"Unsupported protocol: {protocol}")
+        self.interval = interval
+        self.blocksize = blocksize
+        self.source = None
+        self._steady = 0.0
+        self._end = math.inf
+
+        settings.extra_destinations = []
+        if protocol == 'srt':
+            settings.stream_url = f'srt://127.0.0.1:{port}'
+            settings.srt_mode = 'caller'
+            listen_url = f'srt://127.0.0.1:{port}?mode=listener&latency={settings.srt_latency}'
+        else:
+            settings.stream_url = f'udp://127.0.0.1:{port}?pkt_size=1316'
+            listen_url = f'udp://127.0.0.1:{port}?overrun_nonfatal=1&fifo_size=50000'
+        self.settings = settings
+
+        if receiver == 'pyav':
+            self.receiver = PyAVReceiver(listen_url, settings.sample_rate, settings.channels)
+        else:
+            self.receiver = FFmpegReceiver(listen_url, settings.sample_rate, settings.channels, ffmpeg_exe)
+        self.engine = StreamEngine(settings, source_factory=self._open_source, ffmpeg_exe=ffmpeg_exe,
+                                   metrics=metrics, labels={'session': 'latency'})
+
+    def _open_source(self, device, sample_rate, channels, callback, blocksize=0, latency=None):
+        self.source = ClickSource(sample_rate, channels, callback, interval=self.interval,
+                                  blocksize=blocksize or self.blocksize)
+        return self.source
+
+    def start(self, timeout=10.0):
+        """Start the receiver, then the stream; True once the encoder produced its first packet"""
+        self.receiver.start()
+        time.sleep(RECEIVER_STARTUP_SECONDS)
+        self.engine.start(None)
+        self._steady = time.monotonic()
+        return self.engine.wait_ready(timeout)
+
+    def mark_steady(self):
+        """Only count clicks captured from now on (e.g. after a warm-up)"""
+        self._steady = time.monotonic()
+
+    def stop(self):
+        """End the measurement, stop sender and receiver; returns the LatencyReport"""
+        self._end = time.monotonic()
+        first_packet = self.engine.time_to_first_packet
+        time.sleep(self.interval)  # Keep streaming so the last measured clicks reach the receiver
+        self.engine.close()
+        self.receiver.stop()
+        return self.report(first_packet)
+
+    def report(self, first_packet=None):
+        onsets = self.source.onsets if self.source else []
+        report = LatencyReport(first_packet_ms=first_packet * 1000 if first_packet is not None else None)
+        report.clicks = sum(1 for onset in onsets if self._steady <= onset < self._end)
+        for arrival in self.receiver.arrivals:
+            # The click behind this arrival: the latest one captured before it
+            earlier = [onset for onset in onsets if onset < arrival]
+            if (earlier and self._steady <= earlier[-1] < self._end
+                    and arrival - earlier[-1] < self.interval):
+                report.latencies_ms.append((arrival - earlier[-1]) * 1000)
+        return report
+
+
+def measure_latency(settings, seconds=10.0, warmup=1.0, **kwargs):
+    """Run a LatencyHarness for warmup + seconds; returns the LatencyReport of the measured part"""
+    harness = LatencyHarness(settings, **kwargs)
+    try:
+        harness.start()
+        time.sleep(warmup)
+        harness.mark_steady()
+        time.sleep(seconds)
+    finally:
+        report = harness.stop()
+    return report
+
+
+if __name__ == '__main__':
+    # PyAVReceiver child: python -m audiostream.latency URL SAMPLE_RATE CHANNELS
+    _pyav_receive(sys.argv[1], int(sys.argv[2]), int(sys.argv[3]))
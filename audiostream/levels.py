@@ -0,0 +1,159 @@
+import math
+
+import numpy as np
+
+# Meter scale: FLOOR_DB maps to an empty bar, 0 dBFS to a full one
+FLOOR_DB = -60.0
+
+
+def to_dbfs(value, floor=FLOOR_DB):
+    """Linear amplitude (1.0 = full scale) to dBFS, clamped at floor"""
+    if value <= 0.0:
+        return floor
+    return max(20.0 * math.log10(value), floor)
+
+
+class LevelMeter:
+    """Per-channel peak and RMS accumulated in the audio callback
+
+    update() runs in the capture thread: it squares each block into reused
+    scratch buffers and folds the block's peak and energy into running
+    accumulators, so every sample is seen no matter how rarely the UI polls.
+    It does not allocate numpy buffers once the scratch buffers are large
+    enough for the device's block size.
+
+    snapshot() hands the peak/RMS since the previous snapshot to one UI
+    reader. The reader only requests the reset; the callback performs it, so
+    the accumulators are only ever written from the capture thread.
+    """
+
+    def __init__(self, channels=2, max_frames=1024):
+        self.channels = channels
+        self._sumsq = np.zeros(channels, dtype=np.float32)     # Sum of squares since reset
+        self._peak_sq = [0.0] * channels                       # Max squared sample since reset
+        self._frames = 0
+        self._reset_pending = False
+        self._block_sumsq = np.zeros(channels, dtype=np.float32)
+        self.levels = np.zeros(channels, dtype=np.float32)     # RMS of the latest block
+        self._allocate(max_frames)
+
+    def _allocate(self, frames):
+        channels = self.channels
+        self._squares = np.zeros((frames, channels), dtype=np.float32)
+        self._rows = np.zeros((channels, frames), dtype=np.float32)
+        self._ones = np.ones(frames, dtype=np.float32)
+        # Views for the usual case of full-size blocks, so update() creates none
+        self._squares_t = self._squares.T
+        self._row_views = list(self._rows)
+
+    def update(self, indata):
+        """Fold the peak and energy of each channel of indata into the accumulators"""
+        frames = len(indata)
+        if frames == 0:
+            return
+        if frames > len(self._squares):
+            # Only happens if the host API delivers a larger block than seen before
+            self._allocate(frames)
+        if frames == len(self._squares):
+            squares, squares_t, rows, ones = self._squares, self._squares_t, self._rows, self._ones
+        else:
+            squares = self._squares[:frames]
+            squares_t, rows, ones = squares.T, self._rows[:, :frames], self._ones[:frames]
+
+        # Everything here is a contiguous ufunc, BLAS dot or plain copy: numpy
+        # reductions (max/sum over an axis) allocate iterator state on every call
+        np.multiply(indata, indata, out=squares)
+        np.dot(ones, squares, out=self._block_sumsq)
+        np.copyto(rows, squares_t)  # Channel-major, so each channel's peak is a 1-D argmax
+
+        if self._reset_pending:
+            self._sumsq.fill(0.0)
+            self._peak_sq = [0.0] * self.channels
+            self._frames = 0
+            self._reset_pending = False
+        peak_sq = self._peak_sq
+        row_views = self._row_views if rows is self._rows else rows
+        for channel in range(self.channels):
+            row = row_views[channel]
+            peak = row[row.argmax()]
+            if peak > peak_sq[channel]:
+                peak_sq[channel] = float(peak)
+        np.add(self._sumsq, self._block_sumsq, out=self._sumsq)
+        self._frames += frames
+
+        np.multiply(self._block_sumsq, 1.0 / frames, out=self.levels)
+        np.sqrt(self.levels, out=self.levels)
+
+    def snapshot(self):
+        """Return ([peak, ...], [rms, ...]) since the previous snapshot, as linear floats"""
+        peaks, levels, _ = self.take()
+        return peaks, levels
+
+    def take(self):
+        """snapshot() plus the number of frames it covers, for readers that combine snapshots"""
+        if self._reset_pending:
+            # No block arrived since the previous snapshot (or reset): silence
+            return [0.0] * self.channels, [0.0] * self.channels, 0
+        frames = self._frames
+        peak_sq = list(self._peak_sq)
+        sumsq = self._sumsq.tolist()
+        self._reset_pending = True
+        if frames == 0:
+            return [0.0] * self.channels, [0.0] * self.channels, 0
+        return [math.sqrt(p) for p in peak_sq], [math.sqrt(s / frames) for s in sumsq], frames
+
+    def read(self):
+        """Return (left, right) RMS of the latest block as Python floats"""
+        left = float(self.levels[0])
+        right = float(self.levels[1]) if self.channels > 1 else left
+        return left, right
+
+    def reset(self):
+        """Zero the levels, e.g. when the capture stream closes"""
+        self.levels.fill(0.0)
+        self._reset_pending = True
+
+
+class MeterBallistics:
+    """Display dynamics for one channel, driven by LevelMeter snapshots on the UI thread
+
+    The bar follows RMS in dBFS with separate attack and release time
+    constants. The peak indicator jumps to each new peak, holds for
+    peak_hold seconds, then falls at fall_db_per_s. All timing uses the
+    elapsed time between calls, so the result does not depend on the redraw
+    rate.
+    """
+
+    def __init__(self, attack=0.05, release=0.3, peak_hold=1.5, fall_db_per_s=20.0, floor=FLOOR_DB):
+        self.attack = attack
+        self.release = release
+        self.peak_hold = peak_hold
+        self.fall_db_per_s = fall_db_per_s
+        self.floor = floor
+        self.rms_db = floor
+        self.peak_db = floor
+        self._held_for = 0.0
+
+    def update(self, peak, rms, elapsed):
+        """Advance by elapsed seconds with the linear peak and RMS measured over that time"""
+        target = to_dbfs(rms, self.floor)
+        tau = self.attack if target > self.rms_db else self.release
+        self.rms_db += (target - self.rms_db) * (1.0 - math.exp(-elapsed / tau))
+
+        peak_db = to_dbfs(peak, self.floor)
+        if peak_db >= self.peak_db:
+            self.peak_db = peak_db
+            self._held_for = 0.0
+        else:
+            self._held_for += elapsed
+            if self._held_for > self.peak_hold:
+                self.peak_db = max(self.peak_db - self.fall_db_per_s * elapsed, peak_db, self.floor)
+
+    def fraction(self, db):
+        """Position of db on the meter scale, 0.0 (floor) to 1.0 (0 dBFS)"""
+        return min(max((db - self.floor) / -self.floor, 0.0), 1.0)
+
+    def reset(self):
+        self.rms_db = self.floor
+        self.peak_db = self.floor
+        self._held_for = 0.0
@@ -0,0 +1,281 @@
+"""Pipeline metrics: counters, gauges and histograms with Prometheus/JSON export
+
+Metrics are cheap enough to update from the audio callback (no locks, no
+allocation beyond float arithmetic). Values that already live elsewhere
+(ring depth, FFmpeg progress) are registered as gauge functions and only
+read when the registry is scraped.
+"""
+import json
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Seconds; spans a fast callback (tens of microseconds) to a stalled pipe
+DURATION_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+OUTAGE_BUCKETS = (0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+
+def _label_key(labels):
+    return tuple(sorted((labels or {}).items()))
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + list((extra or {}).items())
+    if not items:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in items) + '}'
+
+
+class Counter:
+    """Monotonically increasing value"""
+    kind = 'counter'
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def samples(self, name, labels):
+        return [(name, labels, {}, self.value)]
+
+    def to_json(self):
+        return self.value
+
+
+class Gauge:
+    """Value that is set directly, or read from a function at scrape time"""
+    kind = 'gauge'
+
+    def __init__(self, fn=None):
+        self.fn = fn
+        self.value = 0.0
+
+    def set(self, value):
+        self.value = value
+
+    def get(self):
+        if self.fn is None:
+            return self.value
+        try:
+            value = self.fn()
+        except Exception:
+            return float('nan')
+        return float('nan') if value is None else value
+
+    def samples(self, name, labels):
+        return [(name, labels, {}, self.get())]
+
+    def to_json(self):
+        value = self.get()
+        return None if value != value else value  # NaN is not valid JSON
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() only bisects and increments"""
+    kind = 'histogram'
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Approximate quantile (upper bucket bound) of the observations"""
+        if self.count == 0:
+            return 0.0
+        target = q * self.count
+        running = 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            if running >= target:
+                return bound
+        return self.max
+
+    def samples(self, name, labels):
+        samples = []
+        running = 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            samples.append((f'{name}_bucket', labels, {'le': repr(bound)}, running))
+        samples.append((f'{name}_bucket', labels, {'le': '+Inf'}, self.count))
+        samples.append((f'{name}_sum', labels, {}, self.sum))
+        samples.append((f'{name}_count', labels, {}, self.count))
+        return samples
+
+    def to_json(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p99': self.quantile(0.99),
+        }
+
+
+class MetricsRegistry:
+    """Named metric families, each holding one metric per label set"""
+
+    def __init__(self):
+        self._families = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name, help_text, labels, factory):
+        key = _label_key(labels)
+        with self._lock:
+            family = self._families.setdefault(name, {'help': help_text, 'metrics': {}})
+            metric = family['metrics'].get(key)
+            if metric is None:
+                metric = family['metrics'][key] = factory()
+        return metric
+
+    def counter(self, name, help_text, labels=None):
+        return self._get(name, help_text, labels, Counter)
+
+    def gauge(self, name, help_text, labels=None, fn=None):
+        gauge = self._get(name, help_text, labels, lambda: Gauge(fn))
+        if fn is not None:
+            gauge.fn = fn
+        return gauge
+
+    def histogram(self, name, help_text, labels=None, buckets=DURATION_BUCKETS):
+        return self._get(name, help_text, labels, lambda: Histogram(buckets))
+
+    def unregister(self, labels):
+        """Drop every metric whose labels include all of labels (e.g. a removed session's); returns how many"""
+        wanted = set(_label_key(labels))
+        removed = 0
+        with self._lock:
+            for name, family in list(self._families.items()):
+                metrics = family['metrics']
+                for key in [key for key in metrics if wanted.issubset(key)]:
+                    del metrics[key]
+                    removed += 1
+                if not metrics:
+                    del self._families[name]
+        return removed
+
+    def render_prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        with self._lock:
+            families = {name: (family['help'], dict(family['metrics'])) for name, family in self._families.items()}
+        for name, (help_text, metrics) in sorted(families.items()):
+            if not metrics:
+                continue
+            kind = next(iter(metrics.values())).kind
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, metric in metrics.items():
+                for sample_name, sample_labels, extra, value in metric.samples(name, labels):
+                    lines.append(f'{sample_name}{_format_labels(sample_labels, extra)} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        """{name: [{'labels': {...}, 'value': ...}]} for JSON export"""
+        with self._lock:
+            families = {name: dict(family['metrics']) for name, family in self._families.items()}
+        return {
+            name: [{'labels': dict(labels), 'value': metric.to_json()} for labels, metric in metrics.items()]
+            for name, metrics in sorted(families.items())
+        }
+
+
+# Shared by every engine in the process; sessions are told apart by labels
+default_registry = MetricsRegistry()
+
+
+class MetricsServer:
+    """Serves a registry at http://host:port/metrics from a daemon thread"""
+
+    def __init__(self, registry, port, host='127.0.0.1'):
+        registry_ref = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = registry_ref.render_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Keep scrapes out of the console
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True, name="MetricsServer")
+
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class JsonLinesDumper:
+    """Appends one JSON snapshot of a registry per interval to a file"""
+
+    def __init__(self, registry, path, interval=10.0):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True, name="MetricsDumper")
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def dump(self):
+        record = {'time': time.time(), 'metrics': self.registry.snapshot()}
+        try:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(record, default=str) + '\n')
+        except OSError as e:
+            print(f"Error writing metrics: {e}")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.dump()
+
+    def stop(self):
+        self._stop.set()
+        if self.thread.is_alive():
+            self.thread.join(1.0)
+        self.dump()
+
+
+def start_exporters(registry, port=0, jsonl_path='', interval=10.0, host='127.0.0.1'):
+    """Start the HTTP endpoint and/or JSON-lines dumper that are configured; returns them"""
+    exporters = []
+    if port:
+        try:
+            exporters.append(MetricsServer(registry, port, host).start())
+            print(f"Metrics available at http://{host}:{port}/metrics")
+        except OSError as e:
+            print(f"Error starting metrics endpoint on port {port}: {e}")
+    if jsonl_path:
+        exporters.append(JsonLinesDumper(registry, jsonl_path, interval).start())
+    return exporters
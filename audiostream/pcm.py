@@ -0,0 +1,76 @@
+"""PCM transport formats for the pipe between the ring buffer and FFmpeg
+
+The ring always holds float32 frames; the pipe writer converts each batch
+into the selected transport format just before writing, so the audio
+callback is unaffected by the choice.
+"""
+import numpy as np
+
+# FFmpeg raw format name -> bytes per sample
+TRANSPORT_FORMATS = {
+    'f32le': 4,
+    's24le': 3,
+    's16le': 2,
+}
+
+
+class PcmConverter:
+    """Converts float32 batches to s16le/s24le in preallocated buffers
+
+    Each batch is scaled to the integer range, optionally TPDF-dithered
+    (triangular noise of +/-1 LSB from two uniform draws), clipped, rounded
+    and packed little-endian. All intermediate arrays are allocated once for
+    batch_frames, so convert() creates no numpy buffers.
+    """
+
+    def __init__(self, fmt, batch_frames, channels=2, dither=True, seed=None):
+        if fmt not in TRANSPORT_FORMATS or fmt == 'f32le':
+            raise ValueError(f"Unsupported transport format: {fmt}")
+        self.format = fmt
+        self.channels = channels
+        self.dither = dither
+        self.bytes_per_sample = TRANSPORT_FORMATS[fmt]
+        self.frame_bytes = self.bytes_per_sample * channels
+        bits = 8 * self.bytes_per_sample
+        self._scale = np.float32(2 ** (bits - 1) - 1)
+        self._low = np.float32(-(2 ** (bits - 1)))
+        self._high = np.float32(2 ** (bits - 1) - 1)
+
+        self.batch_frames = max(int(batch_frames), 1)
+        shape = (self.batch_frames, channels)
+        self._work = np.zeros(shape, dtype=np.float32)
+        self._noise = np.zeros(shape, dtype=np.float32)
+        self._noise2 = np.zeros(shape, dtype=np.float32)
+        self._rng = np.random.default_rng(seed)
+        if fmt == 's16le':
+            self._ints = np.zeros(shape, dtype='<i2')
+            self._out = memoryview(self._ints).cast('B')
+        else:
+            # Convert to int32, then keep the low three bytes of each little-endian sample
+            self._ints = np.zeros(shape, dtype='<i4')
+            self._int_bytes = self._ints.view(np.uint8).reshape(-1, 4)[:, :3]
+            self._packed = np.zeros((shape[0] * channels, 3), dtype=np.uint8)
+            self._out = memoryview(self._packed).cast('B')
+
+    def convert(self, batch, frames):
+        """Convert batch[:frames] (float32, full scale +/-1.0); returns a memoryview of the bytes"""
+        full = frames == len(self._work)
+        work = self._work if full else self._work[:frames]
+        np.multiply(batch if full else batch[:frames], self._scale, out=work)
+        if self.dither:
+            noise = self._noise if full else self._noise[:frames]
+            noise2 = self._noise2 if full else self._noise2[:frames]
+            self._rng.random(dtype=np.float32, out=noise)
+            self._rng.random(dtype=np.float32, out=noise2)
+            np.subtract(noise, noise2, out=noise)
+            np.add(work, noise, out=work)
+        np.minimum(work, self._high, out=work)
+        np.maximum(work, self._low, out=work)
+        np.rint(work, out=work)
+        ints = self._ints if full else self._ints[:frames]
+        np.copyto(ints, work, casting='unsafe')
+        if self.format == 's24le':
+            samples = frames * self.channels
+            np.copyto(self._packed if full else self._packed[:samples],
+                      self._int_bytes if full else self._int_bytes[:samples])
+        return self._out[:frames * self.frame_bytes]
@@ -0,0 +1,434 @@
+"""Capture engine in a child process, read by the UI through shared memory
+
+The capture callback and the pipe writer need the GIL for only a few
+microseconds per block, but they need it on time: a UI thread that holds it
+through a long redraw or stats refresh delays the callback, and a callback
+delayed by more than the device's buffer is an input overflow. With
+settings.capture_process a StreamEngine runs in a child process with no UI,
+so nothing the GUI does can hold its GIL.
+
+ProcessEngine stands in for the StreamEngine in the GUI. Commands (start,
+stop, monitor) go to the child over a pipe and wait for its reply; the
+child's events come back over the same pipe and are delivered to listeners
+from a reader thread, as a StreamEngine's worker threads would deliver them.
+Levels and stats never cross the pipe: the child publishes them into a
+multiprocessing.shared_memory block (levels every LEVEL_INTERVAL, stats
+every STATS_INTERVAL), and the UI's meter ticks and stats() only read that
+block, so they cost no round trip and the child never waits for the UI.
+
+The block holds two level rings, for the capture and for the DSP chain's
+output, of LEVEL_SLOTS LevelMeter snapshots each (per-channel peak and RMS,
+and the frames covered) with a count of slots written, then the latest
+StreamStats as JSON behind a sequence number that is odd while the child
+writes it; a reader that sees it change retries.
+"""
+import json
+import multiprocessing
+import queue
+import threading
+import time
+from dataclasses import asdict
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .capture import open_input_stream
+from .devices import DeviceRegistry
+from .engine import DestinationStats, StreamEngine, StreamError, StreamStats
+from .metrics import default_registry, start_exporters
+
+LEVEL_INTERVAL = 0.01              # Seconds between level snapshots published by the child
+STATS_INTERVAL = 0.25              # Seconds between stats snapshots
+LEVEL_SLOTS = 256                  # Level snapshots kept per ring (2.5 s at LEVEL_INTERVAL)
+STATS_BYTES = 65536                # Room for the stats JSON
+COMMAND_TIMEOUT = 30.0             # Longest wait for the child to answer a command
+READ_RETRIES = 10                  # Attempts at a stats read the child keeps overwriting
+
+_HEADER_BYTES = 64                 # int64: stats sequence, stats length, slots written per level ring
+
+
+class SharedStatus:
+    """Level rings and stats in one shared memory buffer; one writer (the child), any number of readers
+
+    Slots and the stats text are written before the counters that publish
+    them, so a reader never sees a count or sequence ahead of its data.
+    """
+
+    def __init__(self, buf, channels):
+        self.channels = channels
+        width = 2 * channels + 1       # peaks, RMS, frames
+        ring_bytes = LEVEL_SLOTS * width * 4
+        self._header = np.ndarray(_HEADER_BYTES // 8, dtype=np.int64, buffer=buf)
+        self._rings = [np.ndarray((LEVEL_SLOTS, width), dtype=np.float32, buffer=buf,
+                                  offset=_HEADER_BYTES + ring * ring_bytes) for ring in range(2)]
+        self._stats = np.ndarray(STATS_BYTES, dtype=np.uint8, buffer=buf, offset=_HEADER_BYTES + 2 * ring_bytes)
+        self._last_stats = {}
+
+    @staticmethod
+    def size(channels):
+        """Bytes of shared memory needed for channels"""
+        return _HEADER_BYTES + 2 * LEVEL_SLOTS * (2 * channels + 1) * 4 + STATS_BYTES
+
+    def release(self):
+        """Drop the views into the buffer, so its SharedMemory can be closed"""
+        self._header = self._stats = None
+        self._rings = []
+
+    # Writer
+
+    def write_levels(self, ring, peaks, levels, frames):
+        count = int(self._header[2 + ring])
+        channels = self.channels
+        slot = self._rings[ring][count % LEVEL_SLOTS]
+        slot[:channels] = peaks
+        slot[channels:2 * channels] = levels
+        slot[-1] = frames
+        self._header[2 + ring] = count + 1
+
+    def write_stats(self, data):
+        """Publish data (bytes); skipped if larger than STATS_BYTES"""
+        if len(data) > STATS_BYTES:
+            return
+        header = self._header
+        sequence = int(header[0])
+        header[0] = sequence + 1
+        header[1] = len(data)
+        self._stats[:len(data)] = np.frombuffer(data, dtype=np.uint8)
+        header[0] = sequence + 2
+
+    # Readers
+
+    def level_count(self, ring):
+        return int(self._header[2 + ring])
+
+    def read_levels(self, ring, first, count):
+        """Copy of slots first..count - 1 (slot numbers as counted by level_count)"""
+        indices = np.arange(first, count) % LEVEL_SLOTS
+        return self._rings[ring][indices]
+
+    def read_stats(self):
+        """The latest stats dict; the previous one if every attempt was torn"""
+        header = self._header
+        for _ in range(READ_RETRIES):
+            sequence = int(header[0])
+            if sequence % 2:
+                time.sleep(0)
+                continue
+            data = self._stats[:int(header[1])].tobytes()
+            if int(header[0]) == sequence:
+                if data:
+                    self._last_stats = json.loads(data)
+                break
+        return self._last_stats
+
+
+class SharedLevelReader:
+    """LevelMeter.snapshot() for the UI, folded from a ring of the child's snapshots"""
+
+    def __init__(self, status, ring):
+        self.status = status
+        self.ring = ring
+        self.channels = status.channels
+        self._read = 0                 # Slots consumed
+
+    def snapshot(self):
+        """Return ([peak, ...], [rms, ...]) of the slots published since the previous snapshot"""
+        status, channels = self.status, self.channels
+        count = status.level_count(self.ring)
+        first = max(self._read, count - LEVEL_SLOTS + 1)  # The oldest slot is the next one overwritten
+        self._read = count
+        if first >= count:
+            return [0.0] * channels, [0.0] * channels
+        rows = status.read_levels(self.ring, first, count)
+        overwritten = status.level_count(self.ring) - LEVEL_SLOTS + 1 - first
+        if overwritten > 0:
+            rows = rows[overwritten:]  # Lapped while copying (the UI stalled for seconds)
+        frames = rows[:, -1].astype(np.float64)
+        total = frames.sum()
+        if not total:
+            return [0.0] * channels, [0.0] * channels
+        peaks = rows[:, :channels].max(axis=0)
+        energy = np.square(rows[:, channels:2 * channels], dtype=np.float64).T @ frames
+        return peaks.tolist(), np.sqrt(energy / total).tolist()
+
+
+class StatusPublisher:
+    """Child side: copies the engine's levels and stats into a SharedStatus from its own thread"""
+
+    def __init__(self, engine, status):
+        self.engine = engine
+        self.status = status
+        self._stop = threading.Event()
+        self._write_lock = threading.Lock()  # Stats are also published after each command
+        self._thread = threading.Thread(target=self._run, daemon=True, name="StatusPublisher")
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(2.0)
+
+    def publish_stats(self):
+        engine = self.engine
+        capture = engine.capture
+        data = json.dumps({
+            'stats': asdict(engine.stats()),
+            'capture': capture is not None and capture.active,
+            'dsp': engine.dsp is not None,
+        }).encode()
+        with self._write_lock:
+            self.status.write_stats(data)
+
+    def _run(self):
+        engine, status = self.engine, self.status
+        next_stats = 0.0
+        while not self._stop.wait(LEVEL_INTERVAL):
+            try:
+                status.write_levels(0, *engine.level_meter.take())
+                if engine.dsp is not None:
+                    status.write_levels(1, *engine.output_meter.take())
+                now = time.monotonic()
+                if now >= next_stats:
+                    next_stats = now + STATS_INTERVAL
+                    self.publish_stats()
+            except Exception as e:
+                print(f"Error publishing engine status: {e}")
+
+
+def _run_command(engine, devices, command, args):
+    """Carry out one command from the UI process; returns engine.is_streaming"""
+    if command in ('start', 'start_monitor'):
+        settings, device, key = args
+        if not engine.is_streaming:
+            engine.settings = settings
+        if devices is not None and key:
+            # PortAudio ids of the two processes differ once either has re-scanned; the key does not
+            found = devices.find(key)
+            if found is not None:
+                device = found.index
+        getattr(engine, command)(device)
+    elif command in ('stop', 'stop_monitor'):
+        getattr(engine, command)()
+    else:
+        raise StreamError(f"Unknown command {command}")
+    return engine.is_streaming
+
+
+def serve(conn, shm_name, settings, source_factory=None, exporters=True):
+    """Child process main: run a StreamEngine for commands from conn until 'close' or the UI process exits
+
+    source_factory replaces the sound card (it must be picklable); without
+    one, devices are enumerated and watched here, as in the UI process.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    status = SharedStatus(shm.buf, settings.channels)
+    send_lock = threading.Lock()
+
+    def send(message):
+        with send_lock:
+            try:
+                conn.send(message)
+            except (OSError, ValueError):
+                pass  # The UI process is gone; the receive loop ends too
+
+    devices = None
+    if source_factory is None:
+        devices = DeviceRegistry()
+        devices.refresh()
+    engine = StreamEngine(settings, source_factory or open_input_stream, devices=devices)
+    engine.add_listener(lambda event, message: send(('event', event, message)))
+    running = (start_exporters(default_registry, settings.metrics_port, settings.metrics_jsonl,
+                               settings.metrics_interval) if exporters else [])
+    publisher = StatusPublisher(engine, status)
+    publisher.start()
+    if devices is not None:
+        devices.start()
+
+    sequence = None
+    try:
+        while True:
+            try:
+                command, sequence, *args = conn.recv()
+            except (EOFError, OSError):
+                sequence = None
+                break
+            if command == 'close':
+                break
+            try:
+                value = _run_command(engine, devices, command, args)
+            except Exception as e:
+                send(('reply', sequence, 'error', str(e)))
+            else:
+                publisher.publish_stats()  # So the UI's next stats() already reflects the command
+                send(('reply', sequence, 'ok', value))
+    finally:
+        publisher.stop()
+        if devices is not None:
+            devices.stop()
+        engine.close()
+        for exporter in running:
+            exporter.stop()
+        status.release()
+        shm.close()
+        if sequence is not None:
+            send(('reply', sequence, 'ok', False))
+        conn.close()
+
+
+class ProcessEngine:
+    """The StreamEngine surface the GUI uses, with the engine running in a child process
+
+    start(), stop(), start_monitor() and stop_monitor() block until the
+    child has carried them out and raise StreamError if it failed (or does
+    not answer). level_meter and output_meter read the shared level rings;
+    stats(), capture and dsp reflect the child's latest published stats.
+    Listeners receive the child engine's events from a reader thread, and
+    'disconnected' if the child exits while streaming.
+
+    devices, the UI's DeviceRegistry, supplies the key sent with each device
+    id; the child resolves it against its own enumeration. Metrics live in
+    the child, so with exporters it serves them from there.
+    """
+
+    def __init__(self, settings, devices=None, source_factory=None, exporters=True):
+        self.settings = settings
+        self.devices = devices
+        self.is_streaming = False
+        self._listeners = []
+        self._replies = queue.Queue()
+        self._call_lock = threading.Lock()
+        self._sequence = 0
+        self._closing = False
+
+        self._shm = shared_memory.SharedMemory(create=True, size=SharedStatus.size(settings.channels))
+        self._status = SharedStatus(self._shm.buf, settings.channels)
+        self.level_meter = SharedLevelReader(self._status, 0)
+        self.output_meter = SharedLevelReader(self._status, 1)
+
+        # spawn everywhere: a forked child would inherit the UI's threads and PortAudio state
+        context = multiprocessing.get_context('spawn')
+        self._conn, child_conn = context.Pipe()
+        self.process = context.Process(target=serve, args=(child_conn, self._shm.name, settings, source_factory,
+                                                           exporters), daemon=True, name="CaptureEngine")
+        self.process.start()
+        child_conn.close()
+        self._reader = threading.Thread(target=self._read_messages, daemon=True, name="CaptureEngineEvents")
+        self._reader.start()
+
+    # Events
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _emit(self, event, message=''):
+        for listener in list(self._listeners):
+            try:
+                listener(event, message)
+            except Exception as e:
+                print(f"Error in stream listener: {e}")
+
+    def _read_messages(self):
+        while True:
+            try:
+                message = self._conn.recv()
+            except (EOFError, OSError):
+                break
+            if message[0] == 'event':
+                _, event, text = message
+                if event in ('stopped', 'disconnected'):
+                    self.is_streaming = False
+                self._emit(event, text)
+            else:
+                self._replies.put(message[1:])
+        self._replies.put((None, 'error', "Capture process exited"))
+        if self.is_streaming and not self._closing:
+            self.is_streaming = False
+            self._emit('disconnected', "Capture process exited")
+
+    def _call(self, command, *args, timeout=COMMAND_TIMEOUT):
+        with self._call_lock:
+            if not self.process.is_alive():
+                raise StreamError("Capture process is not running")
+            self._sequence += 1
+            sequence = self._sequence
+            try:
+                self._conn.send((command, sequence) + args)
+            except (OSError, ValueError) as e:
+                raise StreamError(f"Capture process unreachable: {e}") from e
+            deadline = time.monotonic() + timeout
+            while True:
+                try:
+                    answered, status, value = self._replies.get(timeout=max(deadline - time.monotonic(), 0.0))
+                except queue.Empty:
+                    raise StreamError(f"Capture process did not answer '{command}'") from None
+                if answered is None or answered == sequence:
+                    break
+                # A late answer to a command that already timed out
+        if status == 'error':
+            raise StreamError(value)
+        return value
+
+    # Engine surface
+
+    def _device_key(self, device):
+        info = self.devices.get(device) if self.devices is not None else None
+        return info.key if info else ''
+
+    def start_monitor(self, device):
+        self._call('start_monitor', self.settings, device, self._device_key(device))
+
+    def stop_monitor(self):
+        try:
+            self._call('stop_monitor')
+        except StreamError as e:
+            print(f"Error stopping monitor: {e}")  # A child that is gone has nothing open
+
+    def start(self, device):
+        self.is_streaming = self._call('start', self.settings, device, self._device_key(device))
+
+    def stop(self):
+        """Like StreamEngine.stop(), never raises: a child that is gone is not streaming"""
+        try:
+            self.is_streaming = self._call('stop')
+        except StreamError as e:
+            print(f"Error stopping stream: {e}")
+            self.is_streaming = False
+
+    @property
+    def capture(self):
+        """True while the child has the device open, else None (as StreamEngine.capture is tested)"""
+        return True if self._status.read_stats().get('capture') else None
+
+    @property
+    def dsp(self):
+        """True while the child's stream runs a DSP chain, else None"""
+        return True if self._status.read_stats().get('dsp') else None
+
+    def stats(self):
+        """StreamStats as last published by the child"""
+        published = dict(self._status.read_stats().get('stats', {}))
+        published['destinations'] = [DestinationStats(**dest) for dest in published.get('destinations', [])]
+        return StreamStats(**published)
+
+    def close(self):
+        """Stop the child's engine and the child, and free the shared memory"""
+        self._closing = True
+        try:
+            self._call('close', timeout=10.0)
+        except StreamError as e:
+            print(f"Error closing capture process: {e}")
+        self.process.join(5.0)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(2.0)
+        self._conn.close()
+        self.is_streaming = False
+        self._status.release()
+        self.level_meter.status = self.output_meter.status = None
+        self._shm.close()
+        self._shm.unlink()
@@ -0,0 +1,103 @@
+import time
+from dataclasses import dataclass
+
+
+def _int(value, default=0):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _float(value, suffix):
+    """Parse '192.3kbits/s' / '1.01x' style values; None for N/A"""
+    if not value or value == 'N/A':
+        return None
+    try:
+        return float(value.strip().removesuffix(suffix))
+    except ValueError:
+        return None
+
+
+@dataclass
+class FFmpegProgress:
+    """One block of FFmpeg's machine-readable -progress output"""
+    out_time_us: int = 0              # Encoded media time in microseconds
+    total_size: int = 0               # Bytes muxed so far (0 when FFmpeg reports N/A, e.g. tee)
+    size_known: bool = True           # False when total_size was N/A
+    bitrate_kbps: float = None        # Output bitrate, None when N/A
+    speed: float = None               # Encoding speed as a multiple of real time, None when N/A
+    drop_frames: int = 0
+    dup_frames: int = 0
+    progress: str = 'continue'        # 'end' on the final block
+    received_at: float = 0.0          # time.monotonic() when the block completed
+
+    @property
+    def out_time(self):
+        """Encoded time as HH:MM:SS"""
+        seconds = self.out_time_us // 1_000_000
+        return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+    @property
+    def bitrate(self):
+        """Bitrate in FFmpeg's own notation, for display"""
+        return f"{self.bitrate_kbps:.1f}kbits/s" if self.bitrate_kbps is not None else "0kbits/s"
+
+
+class ProgressParser:
+    """Incremental parser for the key=value stream written by ffmpeg -progress
+
+    feed() accepts arbitrary chunks (partial lines are carried over) and
+    returns the FFmpegProgress snapshots completed by that chunk.
+    """
+
+    def __init__(self):
+        self._pending = b''
+        self._fields = {}
+
+    def feed(self, chunk):
+        data = self._pending + chunk
+        lines = data.split(b'\n')
+        self._pending = lines.pop()
+        snapshots = []
+        for line in lines:
+            key, sep, value = line.partition(b'=')
+            if not sep:
+                continue
+            key = key.strip().decode('ascii', errors='ignore')
+            value = value.strip().decode('ascii', errors='ignore')
+            self._fields[key] = value
+            # 'progress' is always the last key of a block
+            if key == 'progress':
+                snapshots.append(self._snapshot())
+                self._fields = {}
+        return snapshots
+
+    def _snapshot(self):
+        fields = self._fields
+        # out_time_ms is (despite its name) also microseconds; older builds only write that
+        out_time_us = _int(fields.get('out_time_us', fields.get('out_time_ms')))
+        return FFmpegProgress(
+            out_time_us=max(out_time_us, 0),
+            total_size=_int(fields.get('total_size')),
+            size_known=fields.get('total_size', 'N/A') != 'N/A',
+            bitrate_kbps=_float(fields.get('bitrate'), 'kbits/s'),
+            speed=_float(fields.get('speed'), 'x'),
+            drop_frames=_int(fields.get('drop_frames')),
+            dup_frames=_int(fields.get('dup_frames')),
+            progress=fields.get('progress', 'continue'),
+            received_at=time.monotonic(),
+        )
+
+
+class LineSplitter:
+    """Splits a chunked byte stream into lines on \\n or \\r"""
+
+    def __init__(self):
+        self._pending = b''
+
+    def feed(self, chunk):
+        data = self._pending + chunk.replace(b'\r', b'\n')
+        lines = data.split(b'\n')
+        self._pending = lines.pop()
+        return [line.decode('utf-8', errors='ignore').strip() for line in lines if line.strip()]
@@ -0,0 +1,275 @@
+"""Local archive recording: a copy of the stream in rotating segment files, without a second encode
+
+Two sources, selected by settings.record_format:
+
+    ts   the encoded MPEG-TS, taken from the encoder through one more tee
+         slave (a loopback TCP connection to a TSTap) with its own FIFO that
+         drops packets on overflow, so the archive never blocks the stream
+    pcm  the float32 audio the pipe writer sends to the encoder, as WAV
+
+Either way the bytes go to a SegmentRecorder, whose write() only appends to
+a bounded in-memory queue: a writer thread flushes the queue to disk every
+FLUSH_INTERVAL in one write and starts a new file every segment_seconds or
+segment_bytes. When the disk falls behind and the queue is full, writes are
+dropped and counted instead of waiting, so a slow disk never stalls the
+capture, the pipe writer or the encoder.
+"""
+import os
+import re
+import socket
+import struct
+import threading
+import time
+
+TS_PACKET_SIZE = 188
+FLUSH_INTERVAL = 0.25              # Seconds of queued data per disk write
+QUEUE_BYTES = 16 * 1024 * 1024     # ~10 s of 192 kHz stereo float, ~10 min of 192k MPEG-TS
+WAV_MAX_BYTES = 0xFFFFFFFF - 36    # RIFF sizes are 32-bit
+
+
+class SegmentRecorder:
+    """Writes a byte stream to rotating files <directory>/<prefix>_<start time><extension>
+
+    write() is safe to call from any one producer thread and never blocks on
+    the disk. Segments are cut on align-byte boundaries (whole TS packets or
+    PCM frames), and with keep only the newest keep segments of this prefix
+    are left on disk.
+    """
+    extension = '.ts'
+
+    def __init__(self, directory, prefix='stream', segment_seconds=600.0, segment_bytes=0, keep=0,
+                 max_queued_bytes=QUEUE_BYTES, align=TS_PACKET_SIZE):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.prefix = prefix
+        self.segment_seconds = segment_seconds
+        self.segment_bytes = segment_bytes
+        self.keep = keep
+        self.max_queued_bytes = max_queued_bytes
+        self.align = align
+        self.path = None               # Segment being written
+        self.segments = 0
+        self.bytes_written = 0
+        self.dropped_writes = 0        # write() calls refused because the queue was full
+        self.dropped_bytes = 0
+        self.write_errors = 0
+        self._file = None
+        self._segment_size = 0
+        self._segment_started = 0.0
+        self._queue = []
+        self._queued_bytes = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="Recorder")
+
+    @property
+    def queued_bytes(self):
+        return self._queued_bytes
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def write(self, data):
+        """Queue a copy of data for the disk; False (and counted as dropped) if the queue is full"""
+        size = len(data)
+        with self._lock:
+            if self._stop.is_set() or self._queued_bytes + size > self.max_queued_bytes:
+                self.dropped_writes += 1
+                self.dropped_bytes += size
+                return False
+            self._queue.append(bytes(data))
+            self._queued_bytes += size
+        return True
+
+    def close(self, timeout=2.0):
+        """Flush what is queued and close the segment; a disk still busy after timeout finishes alone"""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.wait(FLUSH_INTERVAL):
+            self._flush()
+        self._flush()
+        self._close_segment()
+
+    def _flush(self):
+        with self._lock:
+            chunks, self._queue = self._queue, []
+            self._queued_bytes = 0
+        if not chunks:
+            return
+        data = memoryview(b''.join(chunks))
+        try:
+            while len(data):
+                if self._file is None or self._segment_full():
+                    self._close_segment()
+                    self._open_segment()
+                room = len(data)
+                if self.segment_bytes:
+                    room = min(room, max(self.segment_bytes - self._segment_size, 0) // self.align * self.align)
+                    room = room or len(data[:self.align])  # Segment smaller than one unit: one per file
+                self._file.write(data[:room])
+                self._segment_size += room
+                self.bytes_written += room
+                data = data[room:]
+        except OSError as e:
+            if not self.write_errors:
+                print(f"Recording error: {e}")
+            self.write_errors += 1
+            self.dropped_writes += 1
+            self.dropped_bytes += len(data)
+            self._close_segment()
+
+    def _segment_full(self):
+        if self.segment_bytes and self._segment_size + self.align > self.segment_bytes:
+            return True
+        return bool(self.segment_seconds) and time.monotonic() - self._segment_started >= self.segment_seconds
+
+    def _open_segment(self):
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        path = os.path.join(self.directory, f"{self.prefix}_{stamp}{self.extension}")
+        number = 1
+        while os.path.exists(path):
+            # Several segments within one second (tiny segment_bytes)
+            number += 1
+            path = os.path.join(self.directory, f"{self.prefix}_{stamp}-{number}{self.extension}")
+        self._file = open(path, 'wb')
+        self.path = path
+        self._segment_size = 0
+        self._segment_started = time.monotonic()
+        self.segments += 1
+        self._write_header()
+        self._remove_old_segments()
+
+    def _close_segment(self):
+        if self._file is None:
+            return
+        try:
+            self._finish_header()
+            self._file.close()
+        except OSError as e:
+            print(f"Error closing recording {self.path}: {e}")
+        self._file = None
+
+    def _remove_old_segments(self):
+        if not self.keep:
+            return
+        # The exact name _open_segment makes, so another prefix starting with this one ('studio_b') is left alone
+        pattern = re.compile(rf"{re.escape(self.prefix)}_(\d{{8}}-\d{{6}})(?:-(\d+))?{re.escape(self.extension)}")
+        segments = []
+        for name in os.listdir(self.directory):
+            match = pattern.fullmatch(name)
+            if match:
+                segments.append((match.group(1), int(match.group(2) or 1), name))
+        for _, _, name in sorted(segments)[:-self.keep]:
+            path = os.path.join(self.directory, name)
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"Error removing old recording {path}: {e}")
+
+    def _write_header(self):
+        """Called for each new segment before its data"""
+
+    def _finish_header(self):
+        """Called before a segment is closed"""
+
+
+class WavRecorder(SegmentRecorder):
+    """SegmentRecorder for interleaved float32 PCM, one WAV file per segment
+
+    Each header is written with 0xFFFFFFFF sizes (readable while recording,
+    and after a crash) and patched with the real sizes when the segment closes.
+    """
+    extension = '.wav'
+
+    def __init__(self, directory, sample_rate, channels, prefix='stream', segment_seconds=600.0,
+                 segment_bytes=0, keep=0, max_queued_bytes=QUEUE_BYTES):
+        frame_bytes = 4 * channels
+        limit = WAV_MAX_BYTES // frame_bytes * frame_bytes
+        super().__init__(directory, prefix, segment_seconds, min(segment_bytes, limit) if segment_bytes else limit,
+                         keep, max_queued_bytes, align=frame_bytes)
+        self.sample_rate = sample_rate
+        self.channels = channels
+
+    def _write_header(self):
+        frame_bytes = 4 * self.channels
+        self._file.write(b'RIFF' + struct.pack('<I', 0xFFFFFFFF) + b'WAVE')
+        # WAVE_FORMAT_IEEE_FLOAT, 32 bits per sample
+        self._file.write(b'fmt ' + struct.pack('<IHHIIHH', 16, 3, self.channels, self.sample_rate,
+                                               self.sample_rate * frame_bytes, frame_bytes, 32))
+        self._file.write(b'data' + struct.pack('<I', 0xFFFFFFFF))
+
+    def _finish_header(self):
+        self._file.seek(4)
+        self._file.write(struct.pack('<I', 36 + self._segment_size))
+        self._file.seek(40)
+        self._file.write(struct.pack('<I', self._segment_size))
+
+
+class TSTap:
+    """Loopback TCP listener the encoder's recording tee slave connects to
+
+    Forwards whole TS packets to sink (a SegmentRecorder's write, or None to
+    discard). One connection is read at a time: an encoder started by a
+    reconnect or a bitrate switch replaces the previous one, whose partial
+    last packet is dropped, so segments only ever hold whole packets. The
+    reader only hands data to the queue, so it keeps up with the encoder
+    whatever the disk does.
+    """
+
+    def __init__(self, host='127.0.0.1'):
+        self.sink = None
+        self.connections = 0
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.bind((host, 0))
+        self._server.listen(4)
+        self.url = f"tcp://{host}:{self._server.getsockname()[1]}"
+        self._conn = None
+        self._lock = threading.Lock()
+        self._closed = False
+        threading.Thread(target=self._accept, daemon=True, name="TSTap").start()
+
+    def close(self):
+        self._closed = True
+        with self._lock:
+            conn, self._conn = self._conn, None
+        for sock in (self._server, conn):
+            if sock is not None:
+                try:
+                    sock.close()
+                except OSError:
+                    pass
+
+    def _accept(self):
+        while not self._closed:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return
+            with self._lock:
+                previous, self._conn = self._conn, conn
+                self.connections += 1
+            if previous is not None:
+                previous.close()
+            threading.Thread(target=self._read, args=(conn,), daemon=True, name="TSTapReader").start()
+
+    def _read(self, conn):
+        pending = b''
+        try:
+            while True:
+                chunk = conn.recv(65536)
+                if not chunk:
+                    break
+                data = pending + chunk if pending else chunk
+                whole = len(data) - len(data) % TS_PACKET_SIZE
+                pending = data[whole:]
+                sink = self.sink
+                if whole and sink is not None and conn is self._conn:
+                    sink(data[:whole])
+        except OSError:
+            pass  # Closed by a newer connection or by close()
+        finally:
+            conn.close()
@@ -0,0 +1,232 @@
+import threading
+import time
+
+import numpy as np
+
+
+class AudioRingBuffer:
+    """Fixed-capacity float32 frame ring between the audio callback and a single reader
+
+    The buffer is preallocated once; write() never allocates and never blocks, so
+    it is safe to call from the PortAudio real-time thread. Positions are kept as
+    monotonically increasing frame counters (one writer, one reader).
+    """
+
+    def __init__(self, capacity_frames, channels=2, sample_rate=None):
+        self.capacity = max(int(capacity_frames), 1)
+        self.channels = channels
+        self.sample_rate = sample_rate
+        self._buf = np.zeros((self.capacity, channels), dtype=np.float32)
+        self._write_pos = 0
+        self._read_pos = 0
+        self._data_ready = threading.Event()
+        self.last_write_time = 0.0  # perf_counter() of the latest write()
+        self.last_write_end = 0     # Frame position just after the latest write()
+
+        # Counters
+        self.overflows = 0        # write() calls that could not store the whole block
+        self.underflows = 0       # reader waits that timed out with nothing to read
+        self.dropped_frames = 0   # frames discarded because the ring was full
+
+    @classmethod
+    def from_duration(cls, depth_ms, sample_rate, channels=2):
+        """Create a ring sized to hold depth_ms of audio at sample_rate"""
+        return cls(int(sample_rate * depth_ms / 1000), channels, sample_rate)
+
+    def available(self):
+        """Number of frames waiting to be read"""
+        return self._write_pos - self._read_pos
+
+    def free(self):
+        """Number of frames that can be written without dropping"""
+        return self.capacity - (self._write_pos - self._read_pos)
+
+    def write(self, block):
+        """Copy a (frames, channels) block into the ring, dropping what does not fit"""
+        frames = len(block)
+        free = self.capacity - (self._write_pos - self._read_pos)
+        if frames > free:
+            self.overflows += 1
+            self.dropped_frames += frames - free
+            frames = free
+            if frames <= 0:
+                return 0
+
+        start = self._write_pos % self.capacity
+        first = min(frames, self.capacity - start)
+        if first == len(block):
+            # Common case: one contiguous copy, no slicing of the source block
+            np.copyto(self._buf[start:start + first], block)
+        else:
+            np.copyto(self._buf[start:start + first], block[:first])
+            if frames > first:
+                np.copyto(self._buf[:frames - first], block[first:frames])
+
+        self._write_pos += frames
+        self.last_write_end = self._write_pos
+        self.last_write_time = time.perf_counter()
+        self._data_ready.set()
+        return frames
+
+    def read_into(self, out, consume=True):
+        """Copy up to len(out) frames into the preallocated array out, return frames copied
+
+        With consume=False the frames stay queued until consume(): a reader
+        that stops before that leaves them to the next reader.
+        """
+        frames = min(len(out), self._write_pos - self._read_pos)
+        if frames <= 0:
+            return 0
+
+        start = self._read_pos % self.capacity
+        first = min(frames, self.capacity - start)
+        np.copyto(out[:first], self._buf[start:start + first])
+        if frames > first:
+            np.copyto(out[first:frames], self._buf[:frames - first])
+
+        if consume:
+            self._read_pos += frames
+        return frames
+
+    def consume(self, frames):
+        """Reader side: drop frames read with read_into(consume=False)"""
+        self._read_pos += frames
+
+    def wait(self, timeout):
+        """Block until data is available or timeout expires, return True if data is ready"""
+        if self._write_pos - self._read_pos > 0:
+            return True
+        self._data_ready.clear()
+        # Re-check after clearing so a write between the check and clear() is not lost
+        if self._write_pos - self._read_pos > 0:
+            return True
+        if self._data_ready.wait(timeout):
+            return True
+        self.underflows += 1
+        return False
+
+    def discard(self):
+        """Reader side: skip everything queued, return the number of frames skipped"""
+        frames = self._write_pos - self._read_pos
+        self._read_pos += frames
+        return frames
+
+    def wake(self):
+        """Wake a reader blocked in wait()"""
+        self._data_ready.set()
+
+    def age(self, position):
+        """Seconds since the frame at position was written, from the latest write's timestamp"""
+        return time.perf_counter() - self.write_time(position)
+
+    def write_time(self, position):
+        """perf_counter time the frame at position was written, from the latest write's timestamp"""
+        behind = (self.last_write_end - position) / self.sample_rate if self.sample_rate else 0.0
+        return self.last_write_time - behind
+
+    def latency_ms(self, sample_rate):
+        """Current buffered audio in milliseconds"""
+        return self.available() * 1000.0 / sample_rate
+
+
+class PipeWriter(threading.Thread):
+    """Drains an AudioRingBuffer into a binary pipe with batched writes
+
+    Runs off the audio thread so a stalled FFmpeg or SRT socket only fills the
+    ring instead of blocking the PortAudio callback.
+
+    A batch leaves the ring only once it has been written. A writer stopped
+    before that (blocked in a write to an encoder being replaced) leaves
+    its batch to the next writer on the same ring, so a bitrate switch does
+    not lose it. If the old encoder did take it, up to one batch is sent twice.
+    """
+
+    def __init__(self, ring, pipe, batch_frames, on_error=None, on_batch=None, converter=None, tap=None,
+                 corrector=None, gate=None, dsp=None):
+        super().__init__(daemon=True, name="PipeWriter")
+        self.ring = ring
+        self.pipe = pipe
+        self.on_error = on_error
+        self.on_batch = on_batch  # on_batch(frames, nbytes, latency_seconds) after each write
+        self.converter = converter  # PcmConverter for integer transport formats; None writes float32
+        self.tap = tap  # tap(view) gets each float32 batch once written (recording); must not block
+        self.corrector = corrector  # DriftCorrector resampling each batch to the host clock, or None
+        self.gate = gate  # SilenceGate zeroing dead air before the corrector, or None
+        self.dsp = dsp  # DspChain processing each batch in place first, or None
+        self._silence = None  # Zeros in the transport format: gated batches are not converted (or dithered)
+        if converter is not None and gate is not None:
+            self._silence = memoryview(bytes(converter.frame_bytes * converter.batch_frames))
+        self._batch = np.zeros((max(int(batch_frames), 1), ring.channels), dtype=np.float32)
+        self._batch_view = memoryview(self._batch).cast('B')
+        self._frame_bytes = self._batch.itemsize * ring.channels
+        self._running = threading.Event()
+        self._consume_lock = threading.Lock()  # Once stop() returns, this writer consumes nothing more
+        self.bytes_written = 0
+        self.writes = 0
+
+    def run(self):
+        self._running.set()
+        try:
+            while self._running.is_set():
+                if not self.ring.wait(0.1):
+                    continue
+                # Drain everything that is queued, one batch at a time
+                while self._running.is_set():
+                    ring = self.ring
+                    frames = ring.read_into(self._batch, consume=False)
+                    if frames == 0:
+                        break
+                    read, end = frames, ring._read_pos + frames
+                    batch, view = self._batch, self._batch_view
+                    if self.dsp:
+                        self.dsp.process(batch, frames)
+                    silent = self.gate.process(batch, frames) if self.gate else False
+                    if self.corrector:
+                        batch, frames = self.corrector.process(batch, frames, ring.write_time(end),
+                                                               ring.dropped_frames)
+                        if batch is not self._batch:
+                            view = self.corrector.out_view
+                    if silent and self._silence is not None:
+                        data = self._silence[:frames * self.converter.frame_bytes]
+                    elif self.converter:
+                        data = self.converter.convert(batch, frames)
+                    else:
+                        data = view[:frames * self._frame_bytes]
+                    nbytes = len(data)
+                    self._write_all(data)
+                    with self._consume_lock:
+                        if not self._running.is_set():
+                            # Stopped while blocked in the write: the batch stays queued for a
+                            # replacement writer, which may already be running
+                            break
+                        ring.consume(read)
+                    if self.tap:
+                        self.tap(view[:frames * self._frame_bytes])
+                    if self.on_batch:
+                        # Age of the last frame of the batch when it reached the pipe
+                        self.on_batch(frames, nbytes, ring.age(end))
+        except (BrokenPipeError, OSError, ValueError) as e:
+            if self._running.is_set():
+                print(f"FFmpeg pipe error: {e}")
+                if self.on_error:
+                    self.on_error(e)
+
+    def _write_all(self, view):
+        """Write a memoryview fully, handling short writes on raw pipes"""
+        while len(view):
+            written = self.pipe.write(view)
+            if written is None:
+                # Non-blocking pipe not ready yet
+                time.sleep(0.001)
+                continue
+            self.bytes_written += written
+            view = view[written:]
+        self.writes += 1
+
+    def stop(self, timeout=1.0):
+        """Stop draining and wait for the thread to exit; a batch not yet written stays in the ring"""
+        with self._consume_lock:
+            self._running.clear()
+        self.ring.wake()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
@@ -0,0 +1,97 @@
+import threading
+
+from .capture import open_input_stream
+from .engine import StreamEngine
+
+
+class SessionManager:
+    """Runs several independent capture -> encode -> SRT pipelines in one process
+
+    Each session is a StreamEngine with its own device, sample rate, bitrate and
+    URL. Listeners receive (name, event, message) for every session's events,
+    and stats()/levels() read all sessions in one pass so a single UI timer or
+    stats loop serves every pipeline.
+    """
+
+    def __init__(self, source_factory=open_input_stream, ffmpeg_exe=None, metrics=None, device_registry=None):
+        self.source_factory = source_factory
+        self.ffmpeg_exe = ffmpeg_exe
+        self.metrics = metrics
+        self.device_registry = device_registry
+        self.sessions = {}
+        self.devices = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def _forward(self, name):
+        def listener(event, message):
+            for callback in list(self._listeners):
+                try:
+                    callback(name, event, message)
+                except Exception as e:
+                    print(f"Error in session listener: {e}")
+        return listener
+
+    def add(self, name, settings, device=None, source_factory=None):
+        """Register a session; it is not started until start()/start_all()"""
+        with self._lock:
+            if name in self.sessions:
+                raise ValueError(f"Session '{name}' already exists")
+            engine = StreamEngine(settings, source_factory=source_factory or self.source_factory,
+                                  ffmpeg_exe=self.ffmpeg_exe, metrics=self.metrics,
+                                  labels={'session': name}, devices=self.device_registry)
+            engine.add_listener(self._forward(name))
+            self.sessions[name] = engine
+            self.devices[name] = device
+        return engine
+
+    def remove(self, name):
+        """Stop and forget a session"""
+        with self._lock:
+            engine = self.sessions.pop(name, None)
+            self.devices.pop(name, None)
+        if engine:
+            engine.close()
+            engine.metrics.unregister(engine.metric_labels)  # Its gauges would keep the engine alive
+
+    def start(self, name):
+        """Start one session; raises StreamError on failure"""
+        self.sessions[name].start(self.devices[name])
+
+    def start_all(self):
+        """Start every session, returning {name: error} for the ones that failed"""
+        errors = {}
+        for name in list(self.sessions):
+            try:
+                self.start(name)
+            except Exception as e:
+                errors[name] = e
+        return errors
+
+    def stop(self, name):
+        self.sessions[name].stop()
+
+    def stop_all(self):
+        for engine in list(self.sessions.values()):
+            engine.stop()
+
+    def close(self):
+        """Stop every session, release all devices and unregister the sessions' metrics"""
+        for engine in list(self.sessions.values()):
+            engine.close()
+            engine.metrics.unregister(engine.metric_labels)
+
+    def active(self):
+        """Names of the sessions that are currently streaming"""
+        return [name for name, engine in self.sessions.items() if engine.is_streaming]
+
+    def stats(self):
+        """{name: StreamStats} for every session"""
+        return {name: engine.stats() for name, engine in list(self.sessions.items())}
+
+    def levels(self):
+        """{name: (left, right)} meter levels for every session"""
+        return {name: engine.level_meter.read() for name, engine in list(self.sessions.items())}
@@ -0,0 +1,427 @@
+import configparser
+import os
+import sys
+from dataclasses import dataclass, field
+from urllib.parse import parse_qsl, urlencode
+
+from .codecs import CODEC_PROFILES, get_codec_profile
+
+BITRATES = ('64k', '96k', '128k', '160k', '192k', '224k', '256k', '288k', '320k')
+
+# Raw PCM formats for the pipe to FFmpeg (see pcm.TRANSPORT_FORMATS)
+PCM_FORMATS = ('f32le', 's24le', 's16le')
+
+# Encoder implementations (see encoders.py): FFmpeg subprocess or libav in-process via PyAV
+ENCODER_BACKENDS = ('ffmpeg', 'pyav')
+
+# What happens to audio captured while the encoder is reconnecting
+GAP_POLICIES = ('replay', 'drop')
+
+# What a local recording keeps (see recorder.py): the encoded MPEG-TS or the captured PCM as WAV
+RECORD_FORMATS = ('ts', 'pcm')
+
+# Combo box label -> sample rate in Hz (order matches the GUI)
+SAMPLE_RATES = {
+    '44.1kHz': 44100,
+    '48.0kHz': 48000,
+    '88.2kHz': 88200,
+    '96.0kHz': 96000,
+    '176.4kHz': 176400,
+    '192.0kHz': 192000,
+}
+
+
+def sample_rate_label(rate):
+    """Convert a sample rate in Hz back to its settings.ini label"""
+    for label, value in SAMPLE_RATES.items():
+        if value == rate:
+            return label
+    return f"{rate / 1000:.1f}kHz"
+
+
+def parse_sample_rate(value):
+    """Accept a settings label ('48.0kHz') or a plain number ('48000')"""
+    value = str(value).strip()
+    if value in SAMPLE_RATES:
+        return SAMPLE_RATES[value]
+    try:
+        return int(float(value))
+    except ValueError:
+        return 44100
+
+
+def parse_latency(value):
+    """capture_latency as sounddevice takes it: '' -> None (default), 'low'/'high', or seconds"""
+    value = str(value).strip().lower()
+    if value in ('low', 'high'):
+        return value
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def app_dir():
+    """Directory holding settings.ini: next to the exe, or the repository root"""
+    if getattr(sys, 'frozen', False):
+        # Running as executable
+        return os.path.dirname(sys.executable)
+    # Running as script
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def default_config_path():
+    return os.path.join(app_dir(), 'settings.ini')
+
+
+@dataclass
+class Destination:
+    """One output of the encoder, with its own SRT options"""
+    url: str
+    latency: int = 50000           # SRT latency in microseconds - balanced for LAN
+    pkt_size: int = 1316           # Optimal packet size for SRT (7 TS packets)
+    mode: str = 'caller'           # SRT caller/listener/rendezvous
+
+    @property
+    def is_srt(self):
+        return self.url.strip().lower().startswith('srt://')
+
+    def srt_options(self):
+        """SRT low-latency options (based on OBS SRT implementation)"""
+        return {
+            'pkt_size': self.pkt_size,
+            'latency': self.latency,
+            'tlpktdrop': 1,        # Drop packets if too late (OBS default)
+            'mode': self.mode,
+            'nakreport': 1,        # Enable NAK reporting for better recovery
+        }
+
+    def output_url(self):
+        """URL with the SRT options folded into the query string; explicit query values win"""
+        url = self.url.strip()
+        if not self.is_srt:
+            return url
+        base, _, query = url.partition('?')
+        options = {key: str(value) for key, value in self.srt_options().items()}
+        options.update(parse_qsl(query, keep_blank_values=True))
+        return f"{base}?{urlencode(options, safe='/:')}"
+
+
+@dataclass
+class StreamSettings:
+    """Everything needed to run one capture -> encode -> stream pipeline"""
+    audio_device: int = 0          # Index into the list of input-capable devices (used if the key is not found)
+    audio_device_key: str = ''     # '<host API>|<name>|<channels>' of the device (see devices.py)
+    bitrate: str = '192k'
+    codec: str = 'aac'             # Output codec profile (see codecs.CODEC_PROFILES)
+    adaptive_bitrate: bool = False # Lower the bitrate while the output path is congested (see abr.py)
+    adaptive_min_bitrate: str = '64k'  # Lowest bitrate adaptive bitrate steps down to; bitrate is the highest
+    stream_url: str = 'srt://localhost:9000'
+    sample_rate: int = 44100
+    buffer_ms: int = 500           # Ring buffer depth between audio callback and FFmpeg pipe
+    channels: int = 2
+    capture_blocksize: int = 0     # Frames per audio callback; 0 lets the host API choose
+    capture_latency: str = ''      # Device latency: '' (PortAudio default), 'low', 'high' or seconds
+    capture_autotune: bool = False # Use the tuned blocksize/latency stored for the device, if any
+    capture_tuning: dict = field(default_factory=dict)  # {device name: {sample rate: (blocksize, latency)}}
+    encoder_backend: str = 'ffmpeg'  # 'ffmpeg' subprocess, or 'pyav' to encode in-process
+    transport_format: str = 'f32le'  # PCM format on the pipe to FFmpeg: f32le, s24le or s16le
+    transport_dither: bool = True  # TPDF dither when converting to s16le/s24le
+    drift_correction: bool = True  # Resample by the measured capture clock drift (see drift.py)
+    dsp: bool = False              # Process the audio before encoding (see dsp.py)
+    dsp_highpass_hz: float = 20.0  # DC/high-pass cutoff; 0 disables the filter
+    dsp_gain_db: float = 0.0
+    dsp_limiter: bool = True
+    dsp_limiter_ceiling_db: float = -1.0  # Peak level the look-ahead limiter holds the output to
+    silence_gate: bool = False     # Send digital silence during dead air (see gate.py)
+    silence_threshold_db: float = -60.0  # Peak level below which audio counts as silence
+    silence_hold_seconds: float = 2.0    # Silence lasting this long closes the gate
+    silence_hysteresis_db: float = 6.0   # Audio must rise this far above the threshold to reopen it
+    srt_latency: int = 50000       # SRT options of stream_url
+    srt_pkt_size: int = 1316
+    srt_mode: str = 'caller'
+    extra_destinations: list = field(default_factory=list)  # More Destination outputs of the same encode
+    capture_process: bool = False  # GUI: run capture and encoding in a child process (see process.py)
+    metrics_port: int = 0          # Serve Prometheus metrics on 127.0.0.1:<port>; 0 disables
+    metrics_jsonl: str = ''        # Append a JSON metrics snapshot to this file periodically
+    metrics_interval: float = 10.0 # Seconds between JSON-lines snapshots
+    auto_reconnect: bool = False   # Restart FFmpeg after an output failure instead of stopping
+    reconnect_delay: float = 1.0   # First backoff delay in seconds, doubled per failed attempt
+    reconnect_max_delay: float = 30.0
+    reconnect_attempts: int = 0    # Give up after this many attempts in a row; 0 retries forever
+    gap_buffer_ms: int = 10000     # Audio kept while the encoder is down (added to buffer_ms)
+    gap_policy: str = 'replay'     # 'replay' sends the kept audio on reconnect, 'drop' resumes live
+    warm_standby: bool = False     # Keep an FFmpeg pre-spawned so start and reconnect skip its startup
+    record: bool = False           # Keep a local copy of the stream in rotating segment files
+    record_format: str = 'ts'      # 'ts' (encoded stream, no second encode) or 'pcm' (WAV)
+    record_dir: str = ''           # Segment directory; '' is recordings/ next to settings.ini
+    record_segment_seconds: float = 600.0  # Start a new segment after this long; 0 = no time limit
+    record_segment_mb: float = 0.0 # ... or once a segment reaches this size; 0 = no size limit
+    record_keep: int = 0           # Delete all but the newest this many segments; 0 keeps everything
+
+    def capture_options(self, device_name=None):
+        """(blocksize, latency) to open device_name with, preferring its tuned values under capture_autotune"""
+        if self.capture_autotune and device_name:
+            tuned = self.capture_tuning.get(device_name, {}).get(self.sample_rate)
+            if tuned:
+                return tuned[0], parse_latency(tuned[1])
+        return self.capture_blocksize, parse_latency(self.capture_latency)
+
+    def codec_profile(self):
+        return get_codec_profile(self.codec)
+
+    def encode_rate(self):
+        """Sample rate of the encoded stream (the capture rate unless the codec does not accept it)"""
+        return self.codec_profile().encode_rate(self.sample_rate)
+
+    def recording_dir(self):
+        return self.record_dir.strip() or os.path.join(app_dir(), 'recordings')
+
+    def destinations(self):
+        """All outputs, stream_url first"""
+        primary = Destination(self.stream_url, self.srt_latency, self.srt_pkt_size, self.srt_mode)
+        return [primary] + [d for d in self.extra_destinations if d.url.strip()]
+
+
+def load_settings(path=None, settings=None):
+    """Read the [Settings] section of settings.ini into a StreamSettings"""
+    settings = settings or StreamSettings()
+    path = path or default_config_path()
+    config = configparser.ConfigParser(interpolation=None)
+    try:
+        if not os.path.exists(path):
+            return settings
+        config.read(path)
+        if 'Settings' not in config:
+            return settings
+        _apply_section(settings, config['Settings'])
+
+        # [Destination N] sections add outputs fed by the same encode
+        settings.extra_destinations = []
+        for name in config.sections():
+            if not name.startswith('Destination') or 'url' not in config[name]:
+                continue
+            dest = config[name]
+            settings.extra_destinations.append(Destination(
+                url=dest['url'],
+                latency=dest.getint('latency', 50000),
+                pkt_size=dest.getint('pkt_size', 1316),
+                mode=dest.get('mode', 'caller'),
+            ))
+        settings.capture_tuning = _load_tuning(config)
+    except Exception as e:
+        print(f"Error loading settings: {e}")
+    return settings
+
+
+def _load_tuning(config):
+    """Read [Tuning <device name>] sections: blocksize_<rate> / latency_<rate> per sample rate"""
+    tuning = {}
+    for name in config.sections():
+        if not name.startswith('Tuning '):
+            continue
+        section = config[name]
+        rates = {}
+        for key in section:
+            if key.startswith('blocksize_'):
+                rate = key[len('blocksize_'):]
+                try:
+                    rates[int(rate)] = (section.getint(key), section.get(f'latency_{rate}', ''))
+                except ValueError:
+                    pass
+        tuning[name[len('Tuning '):]] = rates
+    return tuning
+
+
+def save_capture_tuning(settings, device_name, blocksize, latency, path=None):
+    """Record a tuned blocksize/latency for device_name at settings.sample_rate, in memory and in settings.ini"""
+    settings.capture_tuning.setdefault(device_name, {})[settings.sample_rate] = (blocksize, latency)
+    path = path or default_config_path()
+    config = configparser.ConfigParser(interpolation=None)
+    try:
+        if os.path.exists(path):
+            config.read(path)
+        section = f'Tuning {device_name}'
+        if section not in config:
+            config[section] = {}
+        config[section][f'blocksize_{settings.sample_rate}'] = str(blocksize)
+        config[section][f'latency_{settings.sample_rate}'] = str(latency)
+        with open(path, 'w') as configfile:
+            config.write(configfile)
+    except Exception as e:
+        print(f"Error saving capture tuning: {e}")
+
+
+def load_sessions(path=None):
+    """Read every [Session <name>] section into {name: StreamSettings}
+
+    Keys missing from a session section fall back to [Settings].
+    """
+    path = path or default_config_path()
+    sessions = {}
+    config = configparser.ConfigParser(interpolation=None)
+    try:
+        if not os.path.exists(path):
+            return sessions
+        config.read(path)
+        for name in config.sections():
+            if not name.startswith('Session '):
+                continue
+            settings = StreamSettings()
+            if 'Settings' in config:
+                _apply_section(settings, config['Settings'])
+            _apply_section(settings, config[name])
+            settings.capture_tuning = _load_tuning(config)
+            sessions[name[len('Session '):].strip()] = settings
+    except Exception as e:
+        print(f"Error loading sessions: {e}")
+    return sessions
+
+
+def _apply_section(settings, section):
+    """Copy the stream keys present in an ini section onto settings"""
+    if 'bitrate' in section:
+        settings.bitrate = section['bitrate']
+    settings.adaptive_bitrate = section.getboolean('adaptive_bitrate', settings.adaptive_bitrate)
+    settings.adaptive_min_bitrate = section.get('adaptive_min_bitrate', settings.adaptive_min_bitrate)
+    if section.get('codec', settings.codec) in CODEC_PROFILES:
+        settings.codec = section.get('codec', settings.codec)
+    if 'stream_url' in section:
+        settings.stream_url = section['stream_url']
+    if 'sample_rate' in section:
+        settings.sample_rate = parse_sample_rate(section['sample_rate'])
+    if 'buffer_ms' in section:
+        try:
+            settings.buffer_ms = max(int(section['buffer_ms']), 20)
+        except ValueError:
+            pass
+    if 'capture_blocksize' in section:
+        try:
+            settings.capture_blocksize = max(int(section['capture_blocksize']), 0)
+        except ValueError:
+            pass
+    settings.capture_latency = section.get('capture_latency', settings.capture_latency)
+    settings.capture_autotune = section.getboolean('capture_autotune', settings.capture_autotune)
+    if 'audio_device' in section:
+        try:
+            settings.audio_device = int(section['audio_device'])
+            settings.audio_device_key = ''  # An index alone (a session's own device) is not overridden by a key
+        except ValueError:
+            pass
+    settings.audio_device_key = section.get('audio_device_key', settings.audio_device_key)
+    if section.get('encoder_backend', settings.encoder_backend) in ENCODER_BACKENDS:
+        settings.encoder_backend = section.get('encoder_backend', settings.encoder_backend)
+    if section.get('transport_format', settings.transport_format) in PCM_FORMATS:
+        settings.transport_format = section.get('transport_format', settings.transport_format)
+    settings.transport_dither = section.getboolean('transport_dither', settings.transport_dither)
+    settings.drift_correction = section.getboolean('drift_correction', settings.drift_correction)
+    settings.dsp = section.getboolean('dsp', settings.dsp)
+    settings.dsp_highpass_hz = max(section.getfloat('dsp_highpass_hz', settings.dsp_highpass_hz), 0.0)
+    settings.dsp_gain_db = section.getfloat('dsp_gain_db', settings.dsp_gain_db)
+    settings.dsp_limiter = section.getboolean('dsp_limiter', settings.dsp_limiter)
+    settings.dsp_limiter_ceiling_db = min(section.getfloat('dsp_limiter_ceiling_db',
+                                                           settings.dsp_limiter_ceiling_db), 0.0)
+    settings.silence_gate = section.getboolean('silence_gate', settings.silence_gate)
+    settings.silence_threshold_db = min(section.getfloat('silence_threshold_db', settings.silence_threshold_db), 0.0)
+    settings.silence_hold_seconds = max(section.getfloat('silence_hold_seconds', settings.silence_hold_seconds), 0.0)
+    settings.silence_hysteresis_db = max(section.getfloat('silence_hysteresis_db',
+                                                          settings.silence_hysteresis_db), 0.0)
+    settings.srt_latency = section.getint('srt_latency', settings.srt_latency)
+    settings.srt_pkt_size = section.getint('srt_pkt_size', settings.srt_pkt_size)
+    settings.srt_mode = section.get('srt_mode', settings.srt_mode)
+    settings.capture_process = section.getboolean('capture_process', settings.capture_process)
+    settings.metrics_port = section.getint('metrics_port', settings.metrics_port)
+    settings.metrics_jsonl = section.get('metrics_jsonl', settings.metrics_jsonl)
+    settings.metrics_interval = section.getfloat('metrics_interval', settings.metrics_interval)
+    settings.auto_reconnect = section.getboolean('auto_reconnect', settings.auto_reconnect)
+    settings.reconnect_delay = max(section.getfloat('reconnect_delay', settings.reconnect_delay), 0.1)
+    settings.reconnect_max_delay = section.getfloat('reconnect_max_delay', settings.reconnect_max_delay)
+    settings.reconnect_attempts = section.getint('reconnect_attempts', settings.reconnect_attempts)
+    settings.gap_buffer_ms = max(section.getint('gap_buffer_ms', settings.gap_buffer_ms), 0)
+    settings.warm_standby = section.getboolean('warm_standby', settings.warm_standby)
+    if section.get('gap_policy', settings.gap_policy) in GAP_POLICIES:
+        settings.gap_policy = section.get('gap_policy', settings.gap_policy)
+    settings.record = section.getboolean('record', settings.record)
+    if section.get('record_format', settings.record_format) in RECORD_FORMATS:
+        settings.record_format = section.get('record_format', settings.record_format)
+    settings.record_dir = section.get('record_dir', settings.record_dir)
+    settings.record_segment_seconds = max(section.getfloat('record_segment_seconds',
+                                                           settings.record_segment_seconds), 0.0)
+    settings.record_segment_mb = max(section.getfloat('record_segment_mb', settings.record_segment_mb), 0.0)
+    settings.record_keep = max(section.getint('record_keep', settings.record_keep), 0)
+
+
+def save_settings(settings, path=None):
+    """Write a StreamSettings to the [Settings] section of settings.ini
+
+    Other sections (e.g. [Session ...]) already in the file are kept.
+    """
+    path = path or default_config_path()
+    config = configparser.ConfigParser(interpolation=None)
+    try:
+        if os.path.exists(path):
+            config.read(path)
+    except configparser.Error as e:
+        print(f"Error reading settings before save: {e}")
+    for name in config.sections():
+        if name.startswith('Destination'):
+            config.remove_section(name)
+    config['Settings'] = {
+        'audio_device': settings.audio_device,
+        'audio_device_key': settings.audio_device_key,
+        'bitrate': settings.bitrate,
+        'codec': settings.codec,
+        'adaptive_bitrate': settings.adaptive_bitrate,
+        'adaptive_min_bitrate': settings.adaptive_min_bitrate,
+        'stream_url': settings.stream_url,
+        'sample_rate': sample_rate_label(settings.sample_rate),
+        'buffer_ms': settings.buffer_ms,
+        'capture_blocksize': settings.capture_blocksize,
+        'capture_latency': settings.capture_latency,
+        'capture_autotune': settings.capture_autotune,
+        'encoder_backend': settings.encoder_backend,
+        'transport_format': settings.transport_format,
+        'transport_dither': settings.transport_dither,
+        'drift_correction': settings.drift_correction,
+        'dsp': settings.dsp,
+        'dsp_highpass_hz': settings.dsp_highpass_hz,
+        'dsp_gain_db': settings.dsp_gain_db,
+        'dsp_limiter': settings.dsp_limiter,
+        'dsp_limiter_ceiling_db': settings.dsp_limiter_ceiling_db,
+        'silence_gate': settings.silence_gate,
+        'silence_threshold_db': settings.silence_threshold_db,
+        'silence_hold_seconds': settings.silence_hold_seconds,
+        'silence_hysteresis_db': settings.silence_hysteresis_db,
+        'srt_latency': settings.srt_latency,
+        'srt_pkt_size': settings.srt_pkt_size,
+        'srt_mode': settings.srt_mode,
+        'capture_process': settings.capture_process,
+        'metrics_port': settings.metrics_port,
+        'metrics_jsonl': settings.metrics_jsonl,
+        'metrics_interval': settings.metrics_interval,
+        'auto_reconnect': settings.auto_reconnect,
+        'reconnect_delay': settings.reconnect_delay,
+        'reconnect_max_delay': settings.reconnect_max_delay,
+        'reconnect_attempts': settings.reconnect_attempts,
+        'gap_buffer_ms': settings.gap_buffer_ms,
+        'gap_policy': settings.gap_policy,
+        'warm_standby': settings.warm_standby,
+        'record': settings.record,
+        'record_format': settings.record_format,
+        'record_dir': settings.record_dir,
+        'record_segment_seconds': settings.record_segment_seconds,
+        'record_segment_mb': settings.record_segment_mb,
+        'record_keep': settings.record_keep,
+    }
+    for number, dest in enumerate(settings.extra_destinations, start=1):
+        config[f'Destination {number}'] = {
+            'url': dest.url,
+            'latency': dest.latency,
+            'pkt_size': dest.pkt_size,
+            'mode': dest.mode,
+        }
+    try:
+        with open(path, 'w') as configfile:
+            config.write(configfile)
+    except Exception as e:
+        print(f"Error saving settings: {e}")
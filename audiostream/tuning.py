@@ -0,0 +1,110 @@
+"""Capture blocksize auto-tuning
+
+The device is opened once per candidate blocksize, smallest first, and
+callback arrival times and overflow flags are recorded for a few seconds.
+The first candidate whose callbacks arrive on time and complete, without
+overflows, is the lowest stable setting for that device and host API.
+"""
+import time
+from dataclasses import dataclass
+from time import perf_counter
+
+from .capture import open_input_stream
+
+TUNE_BLOCKSIZES = (64, 128, 256, 512, 1024, 2048)
+TUNE_LATENCY = 'low'               # Requested device latency while probing (and persisted with the result)
+TUNE_WARMUP_SECONDS = 0.5          # Callbacks right after start are bursty on most host APIs
+
+# Stable: 99th percentile callback interval error within this many block periods...
+JITTER_TOLERANCE = 1.0
+# ...and at least this share of the expected callbacks delivered
+MIN_CALLBACK_RATIO = 0.97
+
+
+@dataclass
+class ProbeResult:
+    """Callback timing of the device at one blocksize"""
+    blocksize: int
+    period_ms: float                   # Nominal time between callbacks
+    latency: float = None              # Input latency reported by the host API, seconds
+    callbacks: int = 0
+    expected_callbacks: int = 0
+    overflows: int = 0
+    jitter_ms: float = 0.0             # 99th percentile |interval - period|
+    max_interval_ms: float = 0.0
+    error: str = ''
+
+    @property
+    def stable(self):
+        return (not self.error and self.overflows == 0
+                and self.callbacks >= self.expected_callbacks * MIN_CALLBACK_RATIO
+                and self.jitter_ms <= self.period_ms * JITTER_TOLERANCE)
+
+    def summary(self):
+        if self.error:
+            return f"{self.blocksize:>5} frames: failed ({self.error})"
+        latency = f"{self.latency * 1000:.1f} ms" if self.latency is not None else "n/a"
+        return (f"{self.blocksize:>5} frames ({self.period_ms:5.1f} ms): jitter p99 {self.jitter_ms:5.2f} ms, "
+                f"max interval {self.max_interval_ms:6.1f} ms, callbacks {self.callbacks}/{self.expected_callbacks}, "
+                f"overflows {self.overflows}, latency {latency} -> {'stable' if self.stable else 'unstable'}")
+
+
+def probe_blocksize(device, sample_rate, channels, blocksize, seconds=3.0, latency=TUNE_LATENCY,
+                    source_factory=open_input_stream):
+    """Open the device at blocksize and measure its callbacks for seconds; returns a ProbeResult"""
+    result = ProbeResult(blocksize, period_ms=blocksize / sample_rate * 1000)
+    arrivals = []                      # (perf_counter, overflow) per callback
+
+    def callback(indata, frames, time_info, status):
+        arrivals.append((perf_counter(), bool(status and status.input_overflow)))
+
+    try:
+        stream = source_factory(device, sample_rate, channels, callback, blocksize=blocksize, latency=latency)
+    except Exception as e:
+        result.error = str(e)
+        return result
+    try:
+        stream.start()
+        result.latency = getattr(stream, 'latency', None)
+        time.sleep(TUNE_WARMUP_SECONDS)
+        first = len(arrivals)
+        time.sleep(seconds)
+        measured = arrivals[first:]
+    except Exception as e:
+        result.error = str(e)
+        return result
+    finally:
+        try:
+            stream.stop()
+            stream.close()
+        except Exception as e:
+            print(f"Error closing probe stream: {e}")
+
+    result.callbacks = len(measured)
+    result.expected_callbacks = int(seconds * sample_rate / blocksize)
+    result.overflows = sum(1 for _, overflow in measured if overflow)
+    intervals = [(b[0] - a[0]) * 1000 for a, b in zip(measured, measured[1:])]
+    if intervals:
+        errors = sorted(abs(interval - result.period_ms) for interval in intervals)
+        result.jitter_ms = errors[min(int(len(errors) * 0.99), len(errors) - 1)]
+        result.max_interval_ms = max(intervals)
+    return result
+
+
+def tune_capture(device, sample_rate, channels, blocksizes=TUNE_BLOCKSIZES, seconds=3.0,
+                 source_factory=open_input_stream, on_result=None):
+    """Probe blocksizes smallest first; returns (lowest stable ProbeResult or None, all results)
+
+    on_result(ProbeResult) is called after each probe, e.g. to show progress.
+    """
+    results = []
+    for blocksize in sorted(blocksizes):
+        result = probe_blocksize(device, sample_rate, channels, blocksize, seconds,
+                                 source_factory=source_factory)
+        results.append(result)
+        if on_result:
+            on_result(result)
+        if result.stable:
+            return result, results
+    return None, results
+
@@ -0,0 +1,98 @@
+"""Micro-benchmark: per-callback time and allocations of the capture path
+
+Compares the original audio_callback body (indata.tobytes() + pipe write +
+np.abs(...).mean() per channel) with the ring buffer / LevelMeter path.
+
+Usage: python benchmarks/bench_callback.py [--rate 192000] [--blocksize 256]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audiostream import AudioRingBuffer, LevelMeter
+
+
+def legacy_callback(indata, sink, state):
+    """Body of audio_callback before the ring buffer"""
+    state['left'] = np.abs(indata[:, 0]).mean()
+    state['right'] = np.abs(indata[:, 1]).mean()
+    data_bytes = indata.tobytes()
+    sink.write(data_bytes)
+    sink.flush()
+    state['bytes'] += len(data_bytes)
+
+
+def make_ring_callback(sample_rate, blocksize):
+    """Build the current audio_callback body around a ring and level meter"""
+    ring = AudioRingBuffer.from_duration(500, sample_rate)
+    meter = LevelMeter(channels=2, max_frames=blocksize)
+
+    def callback(indata, sink, state):
+        meter.update(indata)
+        ring.write(indata)
+        # Stand-in for the writer thread so the ring never fills during the run
+        ring._read_pos = ring._write_pos
+
+    return callback
+
+
+def measure(callback, blocks, sink, iterations):
+    state = {'left': 0.0, 'right': 0.0, 'bytes': 0}
+
+    # Warm up so one-time allocations are not counted
+    for i in range(50):
+        callback(blocks[i % len(blocks)], sink, state)
+
+    start = time.perf_counter()
+    for i in range(iterations):
+        callback(blocks[i % len(blocks)], sink, state)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    peaks = 0
+    for i in range(200):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        callback(blocks[i % len(blocks)], sink, state)
+        peaks += tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+
+    return {
+        'us_per_callback': elapsed / iterations * 1e6,
+        'transient_bytes_per_callback': peaks / 200,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rate', type=int, default=192000)
+    parser.add_argument('--blocksize', type=int, default=256)
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    blocks = [rng.uniform(-0.5, 0.5, (args.blocksize, 2)).astype(np.float32) for _ in range(16)]
+    callbacks_per_sec = args.rate / args.blocksize
+
+    with open(os.devnull, 'wb', buffering=0) as sink:
+        results = {
+            'before (tobytes + write)': measure(legacy_callback, blocks, sink, args.iterations),
+            'after (ring + LevelMeter)': measure(make_ring_callback(args.rate, args.blocksize),
+                                                 blocks, sink, args.iterations),
+        }
+
+    print(f"{args.rate} Hz stereo, blocksize {args.blocksize} ({callbacks_per_sec:.0f} callbacks/s)")
+    for name, r in results.items():
+        print(f"  {name:28s} {r['us_per_callback']:7.2f} us/callback  "
+              f"{r['transient_bytes_per_callback']:8.0f} B allocated/callback  "
+              f"{r['us_per_callback'] * callbacks_per_sec / 1e4:5.2f}% of one core")
+
+
+if __name__ == '__main__':
+    main()
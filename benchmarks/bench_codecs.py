@@ -0,0 +1,78 @@
+"""Benchmark: end-to-end latency and CPU of each output codec profile
+
+Runs the latency harness (audiostream/latency.py) once per codec at 48 kHz,
+the one rate every profile encodes natively: click markers from a synthetic
+source stream over UDP to a local receiver, which decodes them, and
+capture-to-decode latency is reported per click next to the codec's own
+frame plus encoder delay. CPU is measured over the steady state, as in
+bench_encoders.py; the receiver process is not counted.
+
+Needs FFmpeg in PATH (with libopus for Opus), and PyAV for the default
+receiver.
+
+Usage: python benchmarks/bench_codecs.py [--codecs aac opus pcm] [--seconds 10] [--encoder pyav]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audiostream import StreamSettings
+from audiostream.codecs import CODEC_PROFILES
+from audiostream.latency import RECEIVERS, LatencyHarness
+from audiostream.settings import ENCODER_BACKENDS
+from procstats import ProcessSampler
+
+
+def run(codec, args):
+    """Stream for args.seconds; returns (LatencyReport, CPU usage dict)"""
+    settings = StreamSettings(sample_rate=args.rate, bitrate=args.bitrate, codec=codec,
+                              encoder_backend=args.encoder)
+    harness = LatencyHarness(settings, port=args.port, receiver=args.receiver, interval=args.interval)
+    try:
+        harness.start()
+        proc = getattr(harness.engine.encoder, 'proc', None)
+        sampler = ProcessSampler([proc.pid] if proc else [])
+        time.sleep(1.0)  # Let the encoder settle
+        harness.mark_steady()
+        sampler.start()
+        time.sleep(args.seconds)
+        usage = sampler.stop()
+    finally:
+        report = harness.stop()
+    return report, usage
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--codecs', nargs='+', default=list(CODEC_PROFILES), choices=CODEC_PROFILES)
+    parser.add_argument('--encoder', choices=ENCODER_BACKENDS, default='ffmpeg')
+    parser.add_argument('--receiver', choices=RECEIVERS, default='pyav')
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--interval', type=float, default=0.5, help="seconds between clicks")
+    parser.add_argument('--rate', type=int, default=48000)
+    parser.add_argument('--bitrate', default='192k')
+    parser.add_argument('--port', type=int, default=19300)
+    args = parser.parse_args()
+
+    print(f"{'codec':>10} {'codec ms':>8} {'1st pkt ms':>10} {'lat p50 ms':>10} {'lat p95 ms':>10} "
+          f"{'lat max ms':>10} {'clicks':>7} {'py cpu%':>8} {'ff cpu%':>8} {'kbit/s':>7}")
+    for codec in args.codecs:
+        profile = CODEC_PROFILES[codec]
+        if args.encoder == 'pyav' and not profile.pyav_encoder:
+            print(f"{profile.label:>10} not available with the pyav encoder backend")
+            continue
+        report, usage = run(codec, args)
+        result = report.to_dict()
+        first_packet = result['first_packet_ms']
+        print(f"{profile.label:>10} {profile.latency_ms(args.rate):>8.1f} "
+              f"{first_packet if first_packet is not None else float('nan'):>10.0f} "
+              f"{result['p50_ms']:>10.1f} {report.percentile(95):>10.1f} {result['max_ms']:>10.1f} "
+              f"{result['received']:>3}/{result['clicks']:<3} {usage['python_cpu_pct']:>8.1f} "
+              f"{usage['ffmpeg_cpu_pct']:>8.1f} {args.bitrate if profile.uses_bitrate else 'PCM':>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Benchmark: DSP chain cost per pipe writer batch, and a check that its output stays finite
+
+Times each stage (high-pass, gain, limiter) and the whole chain on 10 ms
+batches of noise, as DspChain runs them on the pipe writer thread, and
+reports microseconds per batch and the share of one core. The high-pass is
+also run at cutoffs up to and above Nyquist, where its closed form takes the
+shortest steps; any NaN or inf in the output is reported and the script
+exits with status 1.
+
+Usage: python benchmarks/bench_dsp.py [--rate 48000] [--channels 2] [--batches 2000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audiostream.dsp import DspChain, Gain, HighPass, Limiter
+
+CHECK_CUTOFFS = (20.0, 1000.0, 10000.0, 0.25, 0.45, 0.5, 0.75)  # Hz, or a fraction of the sample rate below 1
+
+
+def noise_batches(rate, channels, count=16):
+    rng = np.random.default_rng(0)
+    frames = rate // 100
+    return [rng.uniform(-1.0, 1.0, (frames, channels)).astype(np.float32) for _ in range(count)]
+
+
+def time_process(process, batches, iterations):
+    """Microseconds per batch of process(block) on copies of batches"""
+    work = batches[0].copy()
+    for i in range(50):
+        np.copyto(work, batches[i % len(batches)])
+        process(work)
+    elapsed = 0.0
+    for i in range(iterations):
+        np.copyto(work, batches[i % len(batches)])
+        start = time.perf_counter()
+        process(work)
+        elapsed += time.perf_counter() - start
+    return elapsed / iterations * 1e6
+
+
+def check_highpass(rate, channels, batches):
+    """Failure messages for high-pass cutoffs whose output is not finite"""
+    failures = []
+    frames = len(batches[0])
+    for cutoff in CHECK_CUTOFFS:
+        hz = cutoff * rate if cutoff < 1 else cutoff
+        stage = HighPass(rate, channels, frames, hz)
+        work = np.empty_like(batches[0])
+        for batch in batches:
+            np.copyto(work, batch)
+            stage.process(work)
+            if not np.isfinite(work).all():
+                failures.append(f"high-pass at {hz:.0f} Hz: output not finite")
+                break
+        else:
+            print(f"high-pass at {hz:>7.0f} Hz: finite, {stage.chunk}-frame steps")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rate', type=int, default=48000)
+    parser.add_argument('--channels', type=int, default=2)
+    parser.add_argument('--batches', type=int, default=2000, help="batches timed per stage")
+    args = parser.parse_args()
+
+    batches = noise_batches(args.rate, args.channels)
+    frames = len(batches[0])
+    stages = [
+        HighPass(args.rate, args.channels, frames, 20.0),
+        Gain(6.0),
+        Limiter(args.rate, args.channels, frames),
+    ]
+    print(f"{args.rate} Hz, {args.channels} channels, {frames}-frame batches")
+    chain = DspChain(stages)
+    timed = [(stage.name, stage.process) for stage in stages]
+    timed.append(('chain', lambda block: chain.process(block, len(block))))
+    for name, process in timed:
+        us = time_process(process, batches, args.batches)
+        print(f"{name:<9} {us:>8.1f} us/batch  {us / (frames / args.rate * 1e6) * 100:>6.2f}% of a core")
+
+    failures = check_highpass(args.rate, args.channels, batches)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
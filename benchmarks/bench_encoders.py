@@ -0,0 +1,70 @@
+"""Benchmark: end-to-end latency and CPU of the FFmpeg subprocess and PyAV encoder backends
+
+Runs the latency harness (audiostream/latency.py) once per backend: click
+markers from a synthetic source stream over UDP to a local receiver, which
+decodes them, and capture-to-decode latency is reported for each click. The
+receiver's decode delay is included, but it is the same for both backends.
+
+CPU is measured over the steady state, for this process (capture, pipe
+writer and, with PyAV, the encoder) and for the FFmpeg child; the receiver
+process is not counted. Needs PyAV (pip install av), and FFmpeg in PATH for
+the subprocess backend.
+
+Usage: python benchmarks/bench_encoders.py [--seconds 10] [--backends ffmpeg pyav] [--receiver pyav]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audiostream import StreamSettings
+from audiostream.latency import RECEIVERS, LatencyHarness
+from audiostream.settings import ENCODER_BACKENDS
+from procstats import ProcessSampler
+
+
+def run(backend, args):
+    """Stream for args.seconds; returns (LatencyReport, CPU usage dict)"""
+    settings = StreamSettings(sample_rate=args.rate, bitrate=args.bitrate, encoder_backend=backend)
+    harness = LatencyHarness(settings, port=args.port, receiver=args.receiver, interval=args.interval)
+    try:
+        harness.start()
+        proc = getattr(harness.engine.encoder, 'proc', None)
+        sampler = ProcessSampler([proc.pid] if proc else [])
+        time.sleep(1.0)  # Let the encoder settle
+        harness.mark_steady()
+        sampler.start()
+        time.sleep(args.seconds)
+        usage = sampler.stop()
+    finally:
+        report = harness.stop()
+    return report, usage
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backends', nargs='+', default=list(ENCODER_BACKENDS), choices=ENCODER_BACKENDS)
+    parser.add_argument('--receiver', choices=RECEIVERS, default='pyav')
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--interval', type=float, default=1.0, help="seconds between clicks")
+    parser.add_argument('--rate', type=int, default=48000)
+    parser.add_argument('--bitrate', default='192k')
+    parser.add_argument('--port', type=int, default=19100)
+    args = parser.parse_args()
+
+    print(f"{'backend':>8} {'1st pkt ms':>10} {'lat p50 ms':>10} {'lat p95 ms':>10} {'lat max ms':>10} "
+          f"{'clicks':>7} {'py cpu%':>8} {'ff cpu%':>8} {'total cpu%':>10}")
+    for backend in args.backends:
+        report, usage = run(backend, args)
+        result = report.to_dict()
+        first_packet = result['first_packet_ms']
+        print(f"{backend:>8} {first_packet if first_packet is not None else float('nan'):>10.0f} "
+              f"{result['p50_ms']:>10.1f} {report.percentile(95):>10.1f} {result['max_ms']:>10.1f} "
+              f"{result['received']:>3}/{result['clicks']:<3} {usage['python_cpu_pct']:>8.1f} "
+              f"{usage['ffmpeg_cpu_pct']:>8.1f} {usage['python_cpu_pct'] + usage['ffmpeg_cpu_pct']:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""Benchmark: capture callback jitter with the engine in the UI process and in a child process
+
+A SyntheticSource paced at real time stands in for the sound card and each
+of its callbacks is timestamped where the engine runs, while the engine
+streams to a local UDP port. Meanwhile this process plays the GUI: a meter
+thread reads the levels every 33 ms and the stats every second, and
+--load-threads threads run pure-Python work in slices of --load-ms, like Tk
+redraws and event handlers that hold the GIL. In-process the capture
+callback competes with that load for the GIL; with ProcessEngine
+(settings.capture_process) it runs in a child process that shares only
+memory with it.
+
+Per mode it reports the callback interval error against the block period
+(p50, p99, max), the callbacks that came more than one block late (what a
+sound card with two blocks of buffering would have reported as input
+overflows), ring overflows, how much UI work got done and the wall time of
+a meter tick (which includes waiting for the GIL, and for a CPU on a
+machine with fewer cores than busy threads). Needs FFmpeg in PATH (or PyAV
+with --encoder pyav).
+
+Usage: python benchmarks/bench_jitter.py [--seconds 10] [--blocksize 256] [--load-threads 2] [--load-ms 20]
+                                         [--modes in-process child-process]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from time import perf_counter
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audiostream import StreamEngine, StreamSettings, SyntheticSource
+from audiostream.metrics import MetricsRegistry
+from audiostream.process import ProcessEngine
+from audiostream.settings import ENCODER_BACKENDS
+
+MODES = ('in-process', 'child-process')
+
+
+class TimedSourceFactory:
+    """Source factory that timestamps every callback into shared memory, so it works in either process"""
+
+    def __init__(self, capacity, blocksize):
+        context = multiprocessing.get_context('spawn')
+        self.arrivals = context.RawArray('d', capacity)
+        self.count = context.RawValue('q', 0)
+        self.blocksize = blocksize
+
+    def __call__(self, device, sample_rate, channels, callback, blocksize=0, latency=None):
+        arrivals, count = self.arrivals, self.count
+        capacity = len(arrivals)
+
+        def timed(indata, frames, time_info, status):
+            index = count.value
+            if index < capacity:
+                arrivals[index] = perf_counter()
+                count.value = index + 1
+            callback(indata, frames, time_info, status)
+
+        return SyntheticSource(sample_rate, channels, timed, signal='noise', blocksize=self.blocksize, seed=0)
+
+
+def ui_load(stop, slice_ms, done):
+    """Pure-Python work in slices of slice_ms with a short pause between them, like a busy Tk loop"""
+    while not stop.is_set():
+        deadline = perf_counter() + slice_ms / 1000
+        while perf_counter() < deadline:
+            text = ' '.join(str(i * i) for i in range(200))  # Formatting and allocation, as UI code does
+            done[0] += len(text) > 0
+        time.sleep(0.001)
+
+
+def ui_meters(engine, stop, cost):
+    """Read levels at the GUI's full meter rate and the stats once a second"""
+    next_stats = 0.0
+    while not stop.wait(0.033):
+        started = perf_counter()
+        engine.level_meter.snapshot()
+        if started >= next_stats:
+            engine.stats().summary()
+            next_stats = started + 1.0
+        cost.append(perf_counter() - started)
+
+
+def run_mode(mode, args):
+    """Stream for args.seconds under load; returns the result dict of one mode"""
+    period = args.blocksize / args.rate
+    factory = TimedSourceFactory(int(args.seconds / period * 2) + 1000, args.blocksize)
+    settings = StreamSettings(stream_url=f'udp://127.0.0.1:{args.port}', sample_rate=args.rate,
+                              bitrate='192k', buffer_ms=args.buffer_ms, encoder_backend=args.encoder)
+    if mode == 'in-process':
+        engine = StreamEngine(settings, source_factory=factory, metrics=MetricsRegistry(),
+                              labels={'session': 'jitter'})
+    else:
+        engine = ProcessEngine(settings, source_factory=factory, exporters=False)
+    stop = threading.Event()
+    work = [0]
+    meter_cost = []
+    threads = [threading.Thread(target=ui_meters, args=(engine, stop, meter_cost), daemon=True)]
+    threads += [threading.Thread(target=ui_load, args=(stop, args.load_ms, work), daemon=True)
+                for _ in range(args.load_threads)]
+    try:
+        engine.start(None)
+        time.sleep(args.warmup)
+        first = factory.count.value
+        overflows_before = engine.stats().overflows
+        for thread in threads:
+            thread.start()
+        started = perf_counter()
+        time.sleep(args.seconds)
+        elapsed = perf_counter() - started
+        stop.set()
+        for thread in threads:
+            thread.join()
+        last = factory.count.value
+        stats = engine.stats()
+    finally:
+        stop.set()
+        engine.close()
+
+    arrivals = np.frombuffer(factory.arrivals, dtype=np.float64)[first:last]
+    intervals = np.diff(arrivals) * 1000
+    errors = np.abs(intervals - period * 1000)
+    measured = len(errors) > 0
+    return {
+        'mode': mode,
+        'callbacks': len(arrivals),
+        'expected_callbacks': int(elapsed / period),
+        'jitter_p50_ms': float(np.percentile(errors, 50)) if measured else None,
+        'jitter_p99_ms': float(np.percentile(errors, 99)) if measured else None,
+        'max_interval_ms': float(intervals.max()) if measured else None,
+        'late_callbacks': int((intervals > period * 2000).sum()),
+        'ring_overflows': stats.overflows - overflows_before,
+        'ui_work_per_s': work[0] / elapsed,
+        'meter_tick_us': float(np.mean(meter_cost)) * 1e6 if meter_cost else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--warmup', type=float, default=2.0, help="seconds streamed before measuring")
+    parser.add_argument('--rate', type=int, default=48000)
+    parser.add_argument('--blocksize', type=int, default=256)
+    parser.add_argument('--buffer-ms', type=int, default=500)
+    parser.add_argument('--load-threads', type=int, default=2, help="busy UI threads (0 for an idle UI)")
+    parser.add_argument('--load-ms', type=float, default=20.0, help="length of each busy slice")
+    parser.add_argument('--port', type=int, default=23000, help="local UDP port the stream is sent to")
+    parser.add_argument('--encoder', choices=ENCODER_BACKENDS, default='ffmpeg')
+    args = parser.parse_args()
+
+    print(f"{args.rate} Hz, {args.blocksize}-frame blocks ({args.blocksize / args.rate * 1000:.2f} ms), "
+          f"{args.load_threads} UI load thread(s) x {args.load_ms:.0f} ms slices, {args.seconds:.0f} s per mode")
+    print(f"{'mode':<14} {'callbacks':>15} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'late':>6} "
+          f"{'ring ovf':>9} {'UI work/s':>10} {'meter us':>9}")
+    for mode in args.modes:
+        r = run_mode(mode, args)
+        print(f"{r['mode']:<14} {r['callbacks']:>7}/{r['expected_callbacks']:<7} {r['jitter_p50_ms']:>8.3f} "
+              f"{r['jitter_p99_ms']:>8.3f} {r['max_interval_ms']:>8.2f} {r['late_callbacks']:>6} "
+              f"{r['ring_overflows']:>9} {r['ui_work_per_s']:>10.0f} {r['meter_tick_us']:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Benchmark: capture-to-decode latency through the real pipeline to a local receiver
+
+Feeds click markers from a synthetic source through StreamEngine (ring
+buffer, pipe writer, encoder, MPEG-TS, SRT or UDP) to a receiver on
+localhost that decodes the stream, and reports latency percentiles. No
+sound card is needed. Several --srt-latency values run one after another,
+so the SRT latency setting can be chosen from measurements.
+
+The FFmpeg receiver needs FFmpeg in PATH (with libsrt for --protocol srt).
+The PyAV receiver (pip install av) works for UDP only, since PyAV's wheels
+are built without SRT.
+
+Usage: python benchmarks/bench_latency.py [--protocol srt] [--srt-latency 20000 50000 120000]
+                                          [--receiver ffmpeg|pyav] [--seconds 20] [--json]
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audiostream import StreamSettings
+from audiostream.latency import PROTOCOLS, RECEIVERS, measure_latency
+from audiostream.settings import ENCODER_BACKENDS
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--protocol', choices=PROTOCOLS, default='udp')
+    parser.add_argument('--receiver', choices=RECEIVERS, default='ffmpeg')
+    parser.add_argument('--encoder', choices=ENCODER_BACKENDS, default='ffmpeg')
+    parser.add_argument('--srt-latency', type=int, nargs='+', default=[50000],
+                        help="SRT latency in microseconds; several values are measured in turn")
+    parser.add_argument('--seconds', type=float, default=20.0)
+    parser.add_argument('--warmup', type=float, default=2.0)
+    parser.add_argument('--interval', type=float, default=0.5, help="seconds between clicks")
+    parser.add_argument('--rate', type=int, default=48000)
+    parser.add_argument('--bitrate', default='192k')
+    parser.add_argument('--buffer-ms', type=int, default=500)
+    parser.add_argument('--blocksize', type=int, default=512)
+    parser.add_argument('--port', type=int, default=19200)
+    parser.add_argument('--json', action='store_true', help="print one JSON object per run instead of a table")
+    args = parser.parse_args()
+
+    # SRT latency only matters for SRT; measure UDP once
+    srt_latencies = args.srt_latency if args.protocol == 'srt' else [None]
+    if not args.json:
+        print(f"{args.protocol} via {args.encoder} encoder to {args.receiver} receiver, "
+              f"{args.rate} Hz, {args.bitrate}, blocksize {args.blocksize}, buffer {args.buffer_ms} ms")
+        print(f"{'srt latency':>11} {'1st pkt ms':>10} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} "
+              f"{'max ms':>8} {'clicks':>8}")
+    for srt_latency in srt_latencies:
+        settings = StreamSettings(sample_rate=args.rate, bitrate=args.bitrate, buffer_ms=args.buffer_ms,
+                                  encoder_backend=args.encoder)
+        if srt_latency is not None:
+            settings.srt_latency = srt_latency
+        report = measure_latency(settings, seconds=args.seconds, warmup=args.warmup, protocol=args.protocol,
+                                 port=args.port, receiver=args.receiver, interval=args.interval,
+                                 blocksize=args.blocksize)
+        result = report.to_dict()
+        if args.json:
+            print(json.dumps({'protocol': args.protocol, 'encoder': args.encoder, 'receiver': args.receiver,
+                              'srt_latency_us': srt_latency, **result}))
+            continue
+        label = f"{srt_latency / 1000:.0f} ms" if srt_latency is not None else '-'
+        first_packet = result['first_packet_ms']
+        print(f"{label:>11} {first_packet if first_packet is not None else float('nan'):>10.0f} "
+              f"{result['p50_ms']:>8.1f} {result['p90_ms']:>8.1f} {result['p99_ms']:>8.1f} {result['max_ms']:>8.1f} "
+              f"{result['received']:>3}/{result['clicks']:<4}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Benchmark: per-pipeline CPU and memory as the number of sessions grows
+
+Runs N SessionManager pipelines in this process, each with a synthetic source
+at real-time pace and its own FFmpeg encoding to a local UDP port.
+
+Usage: python benchmarks/bench_sessions.py [--counts 1 2 4 8] [--seconds 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audiostream import StreamSettings, SyntheticSource
+from audiostream.sessions import SessionManager
+from procstats import ProcessSampler
+
+
+def synthetic(device, sample_rate, channels, callback, blocksize=0, latency=None):
+    return SyntheticSource(sample_rate, channels, callback, signal='noise', blocksize=blocksize or 512)
+
+
+def run(count, seconds, sample_rate, bitrate, base_port):
+    manager = SessionManager(source_factory=synthetic)
+    for i in range(count):
+        settings = StreamSettings(stream_url=f'udp://127.0.0.1:{base_port + i}',
+                                  sample_rate=sample_rate, bitrate=bitrate)
+        manager.add(f'session{i}', settings)
+
+    errors = manager.start_all()
+    if errors:
+        manager.close()
+        raise SystemExit(f"Failed to start: {errors}")
+
+    pids = [engine.encoder.proc.pid for engine in manager.sessions.values()]
+    sampler = ProcessSampler(pids)
+    time.sleep(1.0)  # Let FFmpeg settle
+    sampler.start()
+    time.sleep(seconds)
+    usage = sampler.stop()
+    overflows = sum(stats.overflows for stats in manager.stats().values())
+    manager.close()
+    usage['overflows'] = overflows
+    return usage
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--counts', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--rate', type=int, default=48000)
+    parser.add_argument('--bitrate', default='192k')
+    parser.add_argument('--port', type=int, default=19000)
+    args = parser.parse_args()
+
+    print(f"{'N':>3} {'py cpu%':>8} {'py cpu%/N':>10} {'py rss MB':>10} "
+          f"{'ff cpu%/N':>10} {'ff rss MB/N':>12} {'overflows':>10}")
+    for count in args.counts:
+        r = run(count, args.seconds, args.rate, args.bitrate, args.port)
+        print(f"{count:>3} {r['python_cpu_pct']:8.1f} {r['python_cpu_pct'] / count:10.2f} "
+              f"{r['python_rss_mb']:10.1f} {r['ffmpeg_cpu_pct'] / count:10.2f} "
+              f"{r['ffmpeg_rss_mb'] / count:12.1f} {r['overflows']:10d}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+"""Benchmark suite: the capture and encode pipeline at every GUI sample rate and bitrate
+
+Each case replaces the sound card with a seeded SyntheticSource (sine, noise
+or silence) that drives the engine's capture callbacks at --speed times real
+time, and pushes --seconds of audio through the ring buffer, pipe writer and
+encoder, with the encoded stream discarded. Per case it reports the capture
+callback's CPU and wall time (all subscribers: VU meter and ring write), throughput, the
+encoder's speed factor, CPU and RSS of Python and FFmpeg, and ring overflows.
+
+--output writes the results as JSON. --baseline compares the callback CPU
+time (the hot path) with an earlier --output file and exits with status 1 if any
+case got slower than --tolerance allows, as does a case that dropped audio
+or exceeded --max-callback-us. Needs FFmpeg in PATH (or PyAV with
+--encoder pyav).
+
+Usage: python benchmarks/bench_suite.py [--output results.json] [--baseline previous.json]
+                                        [--codec opus] [--rates 48000] [--bitrates 192k] [--signals noise]
+                                        [--speed 8]
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from time import perf_counter, thread_time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audiostream import StreamEngine, StreamSettings, SyntheticSource
+from audiostream.codecs import CODEC_PROFILES
+from audiostream.metrics import MetricsRegistry
+from audiostream.settings import BITRATES, ENCODER_BACKENDS, SAMPLE_RATES
+from procstats import ProcessSampler
+
+SIGNALS = ('sine', 'noise', 'silence')
+
+# Results compared against the baseline; higher is worse for all of them. These are the
+# callback's own CPU time: wall time also counts GIL waits behind the writer and encoder
+# threads, which vary from run to run, so the wall-time tail is only held to --max-callback-us
+HOT_PATH_METRICS = ('callback_cpu_mean_us', 'callback_cpu_p50_us')
+
+
+def run_case(rate, bitrate, signal, args):
+    """Stream args.seconds of audio; returns the result dict of one case"""
+    durations = []                     # (wall, CPU) seconds per callback
+    sources = []
+
+    def factory(device, sample_rate, channels, callback, blocksize=0, latency=None):
+        def timed(indata, frames, time_info, status):
+            started, cpu_started = perf_counter(), thread_time()
+            callback(indata, frames, time_info, status)
+            durations.append((perf_counter() - started, thread_time() - cpu_started))
+
+        source = SyntheticSource(sample_rate, channels, timed, signal=signal, blocksize=blocksize or args.blocksize,
+                                 speed=args.speed, seed=0)
+        sources.append(source)
+        return source
+
+    # Ring depth in audio time, scaled so it covers buffer_ms of wall time at any --speed
+    buffer_ms = int(args.buffer_ms * max(args.speed, 1.0))
+    settings = StreamSettings(stream_url=os.devnull, sample_rate=rate, bitrate=bitrate, codec=args.codec,
+                              buffer_ms=buffer_ms, encoder_backend=args.encoder)
+    engine = StreamEngine(settings, source_factory=factory, metrics=MetricsRegistry(),
+                          labels={'session': 'suite'})
+    try:
+        engine.start(None)
+        if not engine.wait_ready(10.0):
+            raise SystemExit(f"{rate} Hz {bitrate} {signal}: encoder produced no output")
+        source = sources[-1]
+        proc = getattr(engine.encoder, 'proc', None)
+        sampler = ProcessSampler([proc.pid] if proc else [])
+        del durations[:]               # Measure the steady state only
+        start_frames = source.frames_generated
+        start_bytes = engine.stats().bytes_sent
+        sampler.start()
+        target = int(args.seconds * rate)
+        while source.frames_generated - start_frames < target:
+            time.sleep(0.01)
+        usage = sampler.stop()
+        stats = engine.stats()
+        frames = source.frames_generated - start_frames
+        sent = stats.bytes_sent - start_bytes
+    finally:
+        engine.close()
+
+    wall_us, cpu_us = np.array(durations).reshape(-1, 2).T * 1e6
+    measured = len(wall_us) > 0
+    return {
+        'codec': args.codec,
+        'sample_rate': rate,
+        'bitrate': bitrate,
+        'signal': signal,
+        'callbacks': len(wall_us),
+        'callback_cpu_mean_us': float(cpu_us.mean()) if measured else None,
+        'callback_cpu_p50_us': float(np.percentile(cpu_us, 50)) if measured else None,
+        'callback_p50_us': float(np.percentile(wall_us, 50)) if measured else None,
+        'callback_p99_us': float(np.percentile(wall_us, 99)) if measured else None,
+        'callback_max_us': float(wall_us.max()) if measured else None,
+        'realtime_factor': frames / rate / usage['seconds'],
+        'pipe_mb_s': sent / usage['seconds'] / 1e6,
+        'encoder_speed': stats.speed,
+        'python_cpu_pct': usage['python_cpu_pct'],
+        'python_rss_mb': usage['python_rss_mb'],
+        'ffmpeg_cpu_pct': usage['ffmpeg_cpu_pct'],
+        'ffmpeg_rss_mb': usage['ffmpeg_rss_mb'],
+        'overflows': stats.overflows,
+        'dropped_frames': stats.dropped_frames,
+    }
+
+
+def case_key(result):
+    return result.get('codec', 'aac'), result['sample_rate'], result['bitrate'], result['signal']
+
+
+def check(results, args):
+    """Failure messages for results over the thresholds (and the baseline, if any)"""
+    failures = []
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {case_key(r): r for r in json.load(f)['results']}
+    for result in results:
+        name = '{} {} Hz {} {}'.format(*case_key(result))
+        if result['dropped_frames']:
+            failures.append(f"{name}: ring dropped {result['dropped_frames']} frames")
+        if args.max_callback_us and (result['callback_p99_us'] or 0) > args.max_callback_us:
+            failures.append(f"{name}: callback p99 {result['callback_p99_us']:.1f} us "
+                            f"> {args.max_callback_us:.1f} us")
+        previous = baseline.get(case_key(result))
+        if not previous:
+            continue
+        for metric in HOT_PATH_METRICS:
+            before, after = previous.get(metric), result.get(metric)
+            if before and after and after > before * (1 + args.tolerance):
+                failures.append(f"{name}: {metric} {after:.1f} vs {before:.1f} baseline "
+                                f"(+{(after / before - 1) * 100:.0f}%)")
+    return failures
+
+
+def describe_tree():
+    """git revision of the checkout being measured, None outside a git tree"""
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--codec', choices=CODEC_PROFILES, default='aac')
+    parser.add_argument('--rates', type=int, nargs='+', help="default: the rates the GUI offers for --codec")
+    parser.add_argument('--bitrates', nargs='+', help="default: all GUI bitrates (one for PCM)")
+    parser.add_argument('--signals', nargs='+', default=list(SIGNALS), choices=SIGNALS)
+    parser.add_argument('--encoder', choices=ENCODER_BACKENDS, default='ffmpeg')
+    parser.add_argument('--seconds', type=float, default=4.0, help="audio per case")
+    parser.add_argument('--speed', type=float, default=8.0, help="multiple of real time (1 = real time)")
+    parser.add_argument('--blocksize', type=int, default=512)
+    parser.add_argument('--buffer-ms', type=int, default=500, help="ring depth in wall time")
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--baseline', help="JSON file of an earlier run to compare callback CPU times with")
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help="allowed callback CPU time increase over the baseline (0.5 = +50%%)")
+    parser.add_argument('--max-callback-us', type=float, default=0.0,
+                        help="fail if any case's callback p99 wall time exceeds this (0 = no limit)")
+    args = parser.parse_args()
+    profile = CODEC_PROFILES[args.codec]
+    if not args.rates:
+        args.rates = profile.native_rates(SAMPLE_RATES.values())
+    if not args.bitrates:
+        args.bitrates = list(BITRATES) if profile.uses_bitrate else [StreamSettings.bitrate]
+
+    print(f"{'rate':>7} {'bitrate':>7} {'signal':>7} {'cb cpu us':>9} {'cb p99 us':>9} {'x realtime':>10} "
+          f"{'enc speed':>9} {'py cpu%':>7} {'ff cpu%':>7} {'py MB':>6} {'ff MB':>6} {'drops':>6}")
+    results = []
+    for rate in args.rates:
+        for bitrate in args.bitrates:
+            for signal in args.signals:
+                r = run_case(rate, bitrate, signal, args)
+                results.append(r)
+                print(f"{rate:>7} {bitrate:>7} {signal:>7} {r['callback_cpu_mean_us'] or 0:>9.1f} "
+                      f"{r['callback_p99_us'] or 0:>9.1f} {r['realtime_factor']:>10.2f} "
+                      f"{r['encoder_speed'] or 0:>9.2f} {r['python_cpu_pct']:>7.1f} {r['ffmpeg_cpu_pct']:>7.1f} "
+                      f"{r['python_rss_mb']:>6.0f} {r['ffmpeg_rss_mb']:>6.0f} {r['dropped_frames']:>6}")
+
+    if args.output:
+        report = {
+            'revision': describe_tree(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'options': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')},
+            'results': results,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    failures = check(results, args)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Benchmark: pipe bandwidth and CPU of each PCM transport format at every sample rate
+
+For f32le, s24le and s16le at each rate offered in the GUI, reports the raw
+pipe bandwidth and the pipe writer's conversion cost per 10 ms batch. With
+--ffmpeg, it also pushes --seconds of audio through a real FFmpeg AAC encode
+(output discarded) as fast as possible, and reports writer CPU and FFmpeg CPU
+per second of audio. That part needs FFmpeg in PATH and a Unix host
+(child CPU comes from getrusage).
+
+Usage: python benchmarks/bench_transport.py [--ffmpeg] [--seconds 20]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audiostream.pcm import TRANSPORT_FORMATS, PcmConverter
+from audiostream.settings import SAMPLE_RATES
+
+
+def make_writer(fmt, batch_frames, channels=2):
+    """Return write(batch) -> bytes, the pipe writer's per-batch work for fmt"""
+    if fmt == 'f32le':
+        return lambda batch: memoryview(batch).cast('B')
+    converter = PcmConverter(fmt, batch_frames, channels, seed=0)
+    return lambda batch: converter.convert(batch, batch_frames)
+
+
+def time_conversion(fmt, rate, iterations):
+    batch_frames = rate // 100
+    rng = np.random.default_rng(0)
+    batch = rng.uniform(-0.5, 0.5, (batch_frames, 2)).astype(np.float32)
+    write = make_writer(fmt, batch_frames)
+    for _ in range(20):
+        write(batch)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        write(batch)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def run_ffmpeg(fmt, rate, seconds):
+    """Encode seconds of audio through FFmpeg; returns (writer CPU s, FFmpeg CPU s)"""
+    import resource
+
+    batch_frames = rate // 100
+    batch = np.random.default_rng(0).uniform(-0.5, 0.5, (batch_frames, 2)).astype(np.float32)
+    write = make_writer(fmt, batch_frames)
+    cmd = ['ffmpeg', '-v', 'error', '-probesize', '32', '-analyzeduration', '0',
+           '-f', fmt, '-ar', str(rate), '-ac', '2', '-i', 'pipe:0',
+           '-c:a', 'aac', '-b:a', '192k', '-f', 'null', '-']
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, bufsize=0)
+    cpu_start = time.process_time()
+    for _ in range(seconds * 100):
+        proc.stdin.write(write(batch))
+    writer_cpu = time.process_time() - cpu_start
+    proc.stdin.close()
+    proc.wait()
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    ffmpeg_cpu = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+    return writer_cpu, ffmpeg_cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--ffmpeg', action='store_true', help="also measure a real FFmpeg encode")
+    parser.add_argument('--seconds', type=int, default=20, help="audio per FFmpeg run")
+    args = parser.parse_args()
+
+    header = f"{'rate':>8} {'format':>6} {'pipe MB/s':>9} {'convert us/10ms':>15}"
+    if args.ffmpeg:
+        header += f" {'writer CPU %':>12} {'FFmpeg CPU %':>12}"
+    print(header)
+    for rate in SAMPLE_RATES.values():
+        for fmt, sample_bytes in TRANSPORT_FORMATS.items():
+            bandwidth = rate * 2 * sample_bytes / 1e6
+            line = f"{rate:>8} {fmt:>6} {bandwidth:>9.2f} {time_conversion(fmt, rate, args.iterations):>15.1f}"
+            if args.ffmpeg:
+                writer_cpu, ffmpeg_cpu = run_ffmpeg(fmt, rate, args.seconds)
+                line += f" {writer_cpu / args.seconds * 100:>12.2f} {ffmpeg_cpu / args.seconds * 100:>12.2f}"
+            print(line)
+
+
+if __name__ == '__main__':
+    main()
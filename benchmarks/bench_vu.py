@@ -0,0 +1,110 @@
+"""Benchmark: VU metering cost in the audio callback and on the Tk main loop
+
+Callback side: the original per-block mean absolute level against the
+LevelMeter peak/RMS accumulators. UI side: Tk main-loop time per meter tick
+for the original immediate-mode redraw (delete('all') + create_rectangle on
+both canvases) against the retained-mode VuChannel (coords/itemconfig on
+existing items). The Tk part needs a display; it is skipped without one.
+
+Usage: python benchmarks/bench_vu.py [--blocksize 512] [--ticks 2000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audiostream import LevelMeter
+
+
+def legacy_levels(indata, state):
+    """Level computation of the original audio_callback (last block only, mean absolute)"""
+    state['left'] = np.abs(indata[:, 0]).mean()
+    state['right'] = np.abs(indata[:, 1]).mean()
+
+
+def time_callback(update, blocks, iterations):
+    for i in range(50):
+        update(blocks[i % len(blocks)])
+    start = time.perf_counter()
+    for i in range(iterations):
+        update(blocks[i % len(blocks)])
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def legacy_tick(canvases, level):
+    """Body of the original update_vu_meters: clear and recreate every item"""
+    for canvas in canvases:
+        canvas.delete('all')
+    width = min(int(level * 350 * 3.1415), 350)
+    for canvas in canvases:
+        if width > 0:
+            canvas.create_rectangle(0, 0, width, 20, fill='green', outline='')
+
+
+def time_tk(ticks):
+    import tkinter as tk
+
+    from audiostream.gui import VuChannel
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"Tk main loop: skipped ({e})")
+        return
+    canvases = [tk.Canvas(root, width=350, height=20, bg='#1e1e1e') for _ in range(2)]
+    for canvas in canvases:
+        canvas.pack()
+    root.update()
+
+    rng = np.random.default_rng(0)
+    levels = rng.uniform(0.0, 0.3, ticks)
+
+    def run(tick):
+        # Each tick includes the idle redraw it causes, as the real main loop would
+        start = time.perf_counter()
+        for i in range(ticks):
+            tick(i)
+            root.update_idletasks()
+        return (time.perf_counter() - start) / ticks * 1e6
+
+    legacy = run(lambda i: legacy_tick(canvases, levels[i]))
+    for canvas in canvases:
+        canvas.delete('all')
+    channels = [VuChannel(canvas) for canvas in canvases]
+
+    def retained_tick(i):
+        for channel in channels:
+            channel.ballistics.update(levels[i] * 1.4, levels[i], 0.033)
+            channel.draw()
+
+    retained = run(retained_tick)
+    root.destroy()
+    print(f"Tk main loop per meter tick (2 canvases, {ticks} ticks):")
+    print(f"  before (delete + create)     {legacy:8.1f} us/tick")
+    print(f"  after  (coords / itemconfig) {retained:8.1f} us/tick")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--blocksize', type=int, default=512)
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--ticks', type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    blocks = [rng.uniform(-0.5, 0.5, (args.blocksize, 2)).astype(np.float32) for _ in range(16)]
+    state = {}
+    meter = LevelMeter(channels=2, max_frames=args.blocksize)
+
+    print(f"Audio callback, stereo blocksize {args.blocksize}:")
+    print(f"  before (mean abs, last block) {time_callback(lambda b: legacy_levels(b, state), blocks, args.iterations):7.2f} us/block")
+    print(f"  after  (peak + RMS, all blocks) {time_callback(meter.update, blocks, args.iterations):5.2f} us/block")
+    time_tk(args.ticks)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""CPU time and resident memory of this process and its FFmpeg children
+
+Uses /proc on Linux; elsewhere only this process' CPU time (os.times) is available.
+"""
+import os
+import time
+
+
+def _proc_stat(pid):
+    """(cpu_seconds, rss_bytes) of a process from /proc, or None"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        ticks = os.sysconf('SC_CLK_TCK')
+        cpu = (int(fields[11]) + int(fields[12])) / ticks
+        rss = int(fields[21]) * os.sysconf('SC_PAGE_SIZE')
+        return cpu, rss
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+class ProcessSampler:
+    """Measures CPU use and RSS of Python and a set of child pids between two points"""
+
+    def __init__(self, child_pids=()):
+        self.child_pids = list(child_pids)
+        self._start = None
+
+    def _sample(self):
+        own = _proc_stat(os.getpid())
+        times = os.times()
+        children = [_proc_stat(pid) for pid in self.child_pids]
+        return {
+            'wall': time.monotonic(),
+            'cpu': times.user + times.system,
+            'rss': own[1] if own else 0,
+            'child_cpu': sum(c[0] for c in children if c),
+            'child_rss': sum(c[1] for c in children if c),
+        }
+
+    def start(self):
+        self._start = self._sample()
+
+    def stop(self):
+        """Return CPU percent of one core and RSS in MB since start()"""
+        end = self._sample()
+        wall = end['wall'] - self._start['wall']
+        return {
+            'seconds': wall,
+            'python_cpu_pct': 100.0 * (end['cpu'] - self._start['cpu']) / wall,
+            'python_rss_mb': end['rss'] / 1e6,
+            'ffmpeg_cpu_pct': 100.0 * (end['child_cpu'] - self._start['child_cpu']) / wall,
+            'ffmpeg_rss_mb': end['child_rss'] / 1e6,
+        }